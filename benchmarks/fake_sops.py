@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Deterministic local stand-in for the `sops` binary, for benchmarks only
+
+It understands the subset of the Sops CLI that cacheguard uses and wraps the
+payload in a Sops-shaped binary document, or wraps each top-level value with
+`--input-type json`. The payload is only base64 encoded, NOT encrypted, so
+never point it at real secrets.
+
+Set `CACHEGUARD_FAKE_SOPS_LATENCY` (seconds) to add a fixed delay per call,
+approximating the key unwrapping cost of a real Sops process.
+
+`keyservice --network unix --address PATH` listens on a Unix socket, and
+commands given `--keyservice unix://PATH` fail unless it is reachable.
+"""
+
+from base64 import b64decode, b64encode
+from json import dumps, loads
+from os import environ, unlink
+from socket import AF_UNIX, SOCK_STREAM, socket
+from sys import argv, exit, stderr, stdin, stdout
+from time import sleep
+
+LATENCY_VARIABLE = "CACHEGUARD_FAKE_SOPS_LATENCY"
+VALUE_FLAGS = {
+    "-a",
+    "--age",
+    "-p",
+    "--pgp",
+    "--input-type",
+    "--output-type",
+    "--extract",
+    "--add-age",
+    "--rm-age",
+    "--add-pgp",
+    "--rm-pgp",
+    "--keyservice",
+    "--network",
+    "--address",
+}
+ACTIONS = {
+    "-e": "encrypt",
+    "--encrypt": "encrypt",
+    "encrypt": "encrypt",
+    "-d": "decrypt",
+    "--decrypt": "decrypt",
+    "decrypt": "decrypt",
+    "set": "set",
+    "rotate": "rotate",
+    "--version": "version",
+    "keyservice": "keyservice",
+}
+
+
+def parse(args: list[str]) -> tuple[str, dict[str, str], list[str]]:
+    """Split a command line into the action, flag values and positionals"""
+    action = ""
+    flags: dict[str, str] = {}
+    positionals: list[str] = []
+    iterator = iter(args)
+    for arg in iterator:
+        if arg in ACTIONS and not action:
+            action = ACTIONS[arg]
+        elif arg in VALUE_FLAGS:
+            flags[arg] = next(iterator, "")
+        elif arg.startswith("-"):
+            continue
+        else:
+            positionals.append(arg)
+    return action, flags, positionals
+
+
+def seal(payload: bytes, data_type: str = "str") -> str:
+    """Stand-in for a Sops encrypted value"""
+    return f"ENC[FAKE,data:{b64encode(payload).decode()},type:{data_type}]"
+
+
+def unseal(value: str) -> bytes:
+    """Reverse `seal`"""
+    return b64decode(value.removeprefix("ENC[FAKE,data:").split(",")[0])
+
+
+def read_input(positionals: list[str]) -> bytes:
+    """Read the file named on the command line, or stdin"""
+    if positionals and positionals[-1] != "/dev/stdin":
+        with open(positionals[-1], "rb") as f:
+            return f.read()
+    return stdin.buffer.read()
+
+
+def recipients(value: str, field: str) -> list[dict]:
+    """Sops metadata entries for a comma separated recipient list"""
+    found = [{field: x, "enc": "fake"} for x in value.split(",") if x]
+    return found or [{}]
+
+
+def serve_keyservice(address: str) -> int:
+    """Accept and drop connections until killed"""
+    with socket(AF_UNIX, SOCK_STREAM) as server:
+        server.bind(address)
+        server.listen()
+        try:
+            while True:
+                server.accept()[0].close()
+        finally:
+            unlink(address)
+
+
+def main() -> int:
+    sleep(float(environ.get(LATENCY_VARIABLE, "0")))
+    action, flags, positionals = parse(argv[1:])
+    structured = flags.get("--input-type") == "json"
+
+    if action == "version":
+        stdout.write("sops 3.10.2 (fake)\n")
+        return 0
+
+    if action == "keyservice":
+        return serve_keyservice(flags["--address"])
+
+    if "--keyservice" in flags:
+        try:
+            with socket(AF_UNIX, SOCK_STREAM) as client:
+                client.connect(flags["--keyservice"].removeprefix("unix://"))
+        except OSError as error:
+            print(f"Could not connect to keyservice: {error}", file=stderr)
+            return 128
+
+    if action == "set":
+        sops_path, index = positionals[0], loads(positionals[1])[0]
+        with open(sops_path) as f:
+            document = loads(f.read())
+        document[index] = seal(dumps(loads(stdin.buffer.read())).encode(), "json")
+        with open(sops_path, "w") as f:
+            f.write(dumps(document, indent="\t") + "\n")
+        return 0
+
+    if action == "rotate":
+        with open(positionals[-1]) as f:
+            document = loads(f.read())
+        for kind, field in (("age", "recipient"), ("pgp", "fp")):
+            keep = [x for x in document["sops"].get(kind, []) if x]
+            removed = set(flags.get(f"--rm-{kind}", "").split(","))
+            keep = [x for x in keep if x.get(field) not in removed]
+            keep += [x for x in recipients(flags.get(f"--add-{kind}", ""), field) if x]
+            document["sops"][kind] = keep or [{}]
+        document["sops"]["lastmodified"] = "1970-01-01T00:00:01Z"
+        stdout.write(dumps(document, indent="\t") + "\n")
+        return 0
+
+    payload = read_input(positionals)
+
+    if action == "encrypt":
+        if structured:
+            values = {k: seal(dumps(v).encode(), "json") for k, v in loads(payload).items()}
+        else:
+            values = {"data": seal(payload)}
+        document = {
+            **values,
+            "sops": {
+                "age": recipients(flags.get("-a", flags.get("--age", "")), "recipient"),
+                "pgp": recipients(flags.get("-p", flags.get("--pgp", "")), "fp"),
+                "lastmodified": "1970-01-01T00:00:00Z",
+                "version": "fake",
+            },
+        }
+        stdout.write(dumps(document, indent="\t") + "\n")
+        return 0
+
+    if action == "decrypt":
+        try:
+            document = loads(payload)
+            if not structured:
+                stdout.buffer.write(unseal(document["data"]))
+                return 0
+        except (ValueError, KeyError):
+            print("Error unmarshalling input", file=stderr)
+            return 1
+
+        values = {k: loads(unseal(v)) for k, v in document.items() if k != "sops"}
+        if "--extract" in flags:
+            index = loads(flags["--extract"])[0]
+            if index not in values:
+                print(f"component [{index!r}] not found", file=stderr)
+                return 1
+            value = values[index]
+            stdout.write(value if isinstance(value, str) else dumps(value))
+            return 0
+        stdout.write(dumps(values, indent="\t") + "\n")
+        return 0
+
+    print(f"Unsupported fake sops command: {argv[1:]}", file=stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the cacheguard hot paths
+
+Measures KeyCache/TextCache load, save, add and append latency and peak
+memory as the entry count and payload size grow. By default Sops is replaced
+by the deterministic stand-in in `fake_sops.py`; `--mode age` uses the real
+`sops` binary with a throwaway age identity instead.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --compare results.json --output current.json
+"""
+
+# Python Modules
+from argparse import ArgumentParser, Namespace
+from json import dump, load
+from os import chmod, environ, pathsep
+from pathlib import Path
+from platform import platform, python_version
+from shutil import which
+from statistics import mean, median
+from subprocess import run  # nosec B404
+from sys import executable, exit, path as sys_path, stdout
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+sys_path.insert(0, str(BENCHMARK_DIR.parent))
+
+
+def install_fake_sops(bin_dir: Path, latency: float) -> None:
+    """Put the stand-in first on the PATH as `sops`"""
+    shim = bin_dir / "sops"
+    shim.write_text(f'#!/bin/sh\nexec "{executable}" "{BENCHMARK_DIR / "fake_sops.py"}" "$@"\n')
+    chmod(shim, 0o755)
+    environ["PATH"] = f"{bin_dir}{pathsep}{environ['PATH']}"
+    environ["CACHEGUARD_FAKE_SOPS_LATENCY"] = str(latency)
+
+
+def install_age_identity(work_dir: Path) -> None:
+    """Generate a throwaway age identity and point Sops at it"""
+    if not (which("sops") and which("age-keygen")):
+        raise SystemExit("--mode age needs both `sops` and `age-keygen` on the PATH")
+    key_file = work_dir / "identity.txt"
+    output = run(["age-keygen", "-o", str(key_file)], capture_output=True, text=True)  # nosec B603 B607
+    public_key = output.stderr.strip().split()[-1]
+    environ["SOPS_AGE_KEY_FILE"] = str(key_file)
+    environ["SOPS_AGE_RECIPIENTS"] = public_key
+
+
+def measure(action, setup=lambda: None, repeat: int = 5) -> dict:
+    """Time an action over several runs, plus its peak traced memory"""
+    timings = []
+    for _ in range(repeat):
+        setup()
+        started = perf_counter()
+        action()
+        timings.append(perf_counter() - started)
+
+    setup()
+    start()
+    action()
+    peak = get_traced_memory()[1]
+    stop()
+
+    return {
+        "min_s": min(timings),
+        "median_s": median(timings),
+        "mean_s": mean(timings),
+        "max_s": max(timings),
+        "peak_bytes": peak,
+    }
+
+
+def run_cases(work_dir: Path, args: Namespace) -> list[dict]:
+    """Run every case across the entry count and payload size grid"""
+    # Imported late so the Sops stand-in is already on the PATH
+    from cacheguard import KeyCache, TextCache
+    from cacheguard.plaintext_cache import PLAINTEXT_CACHE
+
+    results = []
+    for entries in args.entries:
+        for payload in args.payload:
+            value = "x" * payload
+            key_path = str(work_dir / f"bench-{entries}-{payload}.keys.sops")
+            text_path = str(work_dir / f"bench-{entries}-{payload}.text.sops")
+
+            key_cache = KeyCache(key_path, codec=args.codec)
+            key_cache.add({f"KEY_{x}": value for x in range(entries)})
+            text_cache = TextCache(text_path, codec=args.codec)
+            for x in range(entries):
+                text_cache.append(f"{x} {value}")
+
+            counter = iter(range(10**9))
+            cases = {
+                "key_cache.add": (lambda: key_cache.add({f"NEW_{next(counter)}": value}), lambda: None),
+                "key_cache.save": (key_cache.save, key_cache.mark_dirty),
+                "key_cache.load": (lambda: KeyCache(key_path, codec=args.codec), PLAINTEXT_CACHE.clear),
+                "text_cache.append": (lambda: text_cache.append(value), lambda: None),
+                "text_cache.save": (text_cache.save, text_cache.mark_dirty),
+                "text_cache.load": (lambda: TextCache(text_path, codec=args.codec), PLAINTEXT_CACHE.clear),
+            }
+            for name, (action, setup) in cases.items():
+                if args.case and not any(x in name for x in args.case):
+                    continue
+                result = measure(action, setup, args.repeat)
+                results.append({"case": name, "entries": entries, "payload": payload, **result})
+                print(
+                    f"{name:<20} entries={entries:<6} payload={payload:<6} "
+                    f"median={result['median_s'] * 1000:9.3f}ms peak={result['peak_bytes']:>10}B",
+                    flush=True,
+                )
+    return results
+
+
+def compare(results: list[dict], baseline_path: str, threshold: float) -> bool:
+    """Report median changes against a previous run, False on any regression"""
+    with open(baseline_path) as f:
+        baseline = {
+            (x["case"], x["entries"], x["payload"]): x for x in load(f)["results"]
+        }
+
+    passed = True
+    for result in results:
+        if (previous := baseline.get((result["case"], result["entries"], result["payload"]))) is None:
+            continue
+        ratio = result["median_s"] / previous["median_s"] if previous["median_s"] else 1.0
+        regressed = ratio > 1 + threshold
+        passed &= not regressed
+        print(
+            f"{'REGRESSION' if regressed else 'ok':<10} {result['case']:<20} "
+            f"entries={result['entries']:<6} payload={result['payload']:<6} x{ratio:.2f}"
+        )
+    return passed
+
+
+def main() -> int:
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mode", choices=["fake", "age"], default="fake")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every fake Sops call")
+    parser.add_argument("--entries", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--payload", type=int, nargs="+", default=[32, 1024])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--codec", choices=["zlib", "lzma"], help="Compress payloads before encryption")
+    parser.add_argument("--case", nargs="*", help="Only run cases containing these names")
+    parser.add_argument("--output", help="Write machine-readable results to this file")
+    parser.add_argument("--compare", help="Previous results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed median slowdown, as a fraction")
+    args = parser.parse_args()
+
+    with TemporaryDirectory(prefix="cacheguard-bench-") as work:
+        work_dir = Path(work)
+        if args.mode == "fake":
+            (work_dir / "bin").mkdir()
+            install_fake_sops(work_dir / "bin", args.latency)
+        else:
+            install_age_identity(work_dir)
+        results = run_cases(work_dir, args)
+
+    report = {
+        "meta": {
+            "mode": args.mode,
+            "latency": args.latency,
+            "repeat": args.repeat,
+            "codec": args.codec,
+            "python": python_version(),
+            "platform": platform(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            dump(report, f, indent=2)
+    elif not args.compare:
+        dump(report, stdout, indent=2)
+        print()
+
+    if args.compare and not compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
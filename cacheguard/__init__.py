@@ -1,2 +1,7 @@
+from cacheguard.blob_cache import BlobCache
 from cacheguard.key_cache import KeyCache
 from cacheguard.text_cache import TextCache
+from cacheguard.segmented_cache import SegmentedTextCache
+from cacheguard.sharded_cache import ShardedKeyCache
+from cacheguard.snapshot import Snapshot
+from cacheguard.transactions import transaction
@@ -0,0 +1,4 @@
+# Project Modules
+from cacheguard.cli import main
+
+raise SystemExit(main())
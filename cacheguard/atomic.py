@@ -0,0 +1,74 @@
+# Python Modules
+from collections.abc import Iterator
+from contextlib import contextmanager
+from os import O_RDONLY, PathLike, close, fsync, name as os_name, open as os_open, replace
+from pathlib import Path
+from shutil import copymode
+from tempfile import NamedTemporaryFile
+
+
+def fsync_directory(directory: str | PathLike) -> None:
+    """Persist a rename in a directory, where the platform allows it"""
+    if os_name != "posix":
+        return
+    descriptor = os_open(directory, O_RDONLY)
+    try:
+        fsync(descriptor)
+    finally:
+        close(descriptor)
+
+
+def write_temporary(sops_path: str | PathLike, data: str | bytes | bytearray) -> Path:
+    """Write data beside a file, flushed to disk, ready to be renamed over it
+
+    The temporary file takes the permissions of the file it will replace.
+    """
+    target = Path(sops_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    mode = "w" if isinstance(data, str) else "wb"
+    with NamedTemporaryFile(
+        mode, dir=target.parent, prefix=f".{target.name}.", suffix=".tmp", delete=False
+    ) as f:
+        try:
+            f.write(data)
+            f.flush()
+            fsync(f.fileno())
+            if target.exists():
+                copymode(target, f.name)
+        except BaseException:
+            Path(f.name).unlink(missing_ok=True)
+            raise
+    return Path(f.name)
+
+
+def atomic_write(sops_path: str | PathLike, data: str | bytes | bytearray) -> None:
+    """Replace a file so readers see either the old or the new contents
+
+    The data goes to a temporary file in the same directory, is flushed to
+    disk, then renamed over the original, keeping its permissions.
+    """
+    temporary = write_temporary(sops_path, data)
+    replace(temporary, sops_path)
+    fsync_directory(Path(sops_path).parent)
+
+
+@contextmanager
+def file_lock(sops_path: str | PathLike) -> Iterator[None]:
+    """Hold an exclusive advisory lock shared by every process using a file
+
+    The lock is taken on a `.lock` file beside it, so the file itself can be
+    replaced while the lock is held.
+    """
+    try:
+        from fcntl import LOCK_EX, LOCK_UN, flock
+    except ImportError:
+        raise RuntimeError("File locks need fcntl, which this platform does not provide") from None
+
+    lock_path = Path(f"{sops_path}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as f:
+        flock(f.fileno(), LOCK_EX)
+        try:
+            yield
+        finally:
+            flock(f.fileno(), LOCK_UN)
@@ -1,15 +1,70 @@
 # Python Modules
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-from os import path
+from hashlib import sha256
+from mmap import ACCESS_READ, mmap
+from os import fstat, path
 from pathlib import Path
 from shutil import move
 
 # Local Modules
-from cacheguard.sops import encrypt, decrypt
+from cacheguard.atomic import atomic_write, file_lock
+from cacheguard.envelope import (
+    Envelope,
+    aunwrap,
+    awrap,
+    is_envelope,
+    open_document,
+    parse,
+    require_cipher,
+    seal,
+    unwrap,
+    wrap,
+)
+from cacheguard.instrumentation import span
+from cacheguard.payload import CODECS, decode_payload, encode_payload
+from cacheguard.plaintext_cache import PLAINTEXT_CACHE, file_identity
+from cacheguard.sops import encrypt, decrypt, aencrypt, adecrypt
+from cacheguard.transactions import active_transaction
 
 
 class BaseCache:
-    """Mechanism for sealing and protecting a dataset at rest"""
+    """Mechanism for sealing and protecting a dataset at rest
+
+    With `codec` set to "zlib" or "lzma" the plaintext is compressed before
+    it is handed to Sops. Files are readable whatever codec wrote them.
+
+    With `multi_writer=True` several processes can save to the same file.
+    Each save holds a file lock, merges in whatever other writers sealed
+    since this cache last loaded or saved, and replaces the file atomically.
+
+    With `envelope=True` Sops only wraps a random data key, once per process,
+    and payloads are sealed in-process with AES-GCM. This needs the optional
+    `cryptography` package; see `cacheguard.envelope` for the file layout.
+    """
+
+    __slots__ = (
+        "codec",
+        "age_pubkeys",
+        "pgp_fingerprints",
+        "sops_path",
+        "multi_writer",
+        "envelope",
+        "_envelope",
+        "_digest",
+        "_identity",
+        "_base",
+        "_pending_load",
+        "_data",
+        "_read_buffer",
+    )
+
+    # Extra arguments for the Sops helpers, such as the document type
+    sops_options: dict = {}
+
+    # Ciphertext at least this large is memory-mapped rather than copied into a buffer
+    MMAP_THRESHOLD = 1024 * 1024
 
     def __init__(
         self,
@@ -17,42 +72,318 @@ class BaseCache:
         age_pubkeys: list[str] = [],
         pgp_fingerprints: list[str] = [],
         *args,
+        autoload: bool = True,
+        lazy: bool = False,
+        codec: str | None = None,
+        multi_writer: bool = False,
+        envelope: bool = False,
         **kwargs,
     ) -> None:
+        if codec is not None and codec not in CODECS:
+            raise ValueError(f"Unknown payload codec: {codec!r}, expected one of {CODECS}")
+        if envelope:
+            require_cipher()
+        self.envelope = envelope
+        self._envelope: Envelope | None = None  # Data key of the last envelope read or written
+        self.codec = codec
         self.age_pubkeys = age_pubkeys
         self.pgp_fingerprints = pgp_fingerprints
         self.sops_path = sops_path
+        self._digest: bytes | None = None  # Digest of the plaintext last loaded or saved
+        self.multi_writer = multi_writer
+        self._identity = None  # Identity of the file when last loaded or saved
+        self._base = None  # Multi-writer only: the plaintext last loaded or saved
 
-        self.data = self.load() if path.exists(sops_path) else ""
+        exists = autoload and path.exists(sops_path)
+        self._pending_load = exists and lazy  # Lazy caches unseal on first access
+        self._data = ""
+        if exists and not lazy:
+            self.data = self.load()
 
-    def load(self) -> str:
-        """Unseal the dataset"""
-        try:
-            with open(self.sops_path) as f:
-                contents = f.read()
-            data = decrypt(contents)
-        except OSError:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            new_file_name = f"archive-{timestamp}-{Path(self.sops_path).name}"
-            new_path = Path(self.sops_path).parent / new_file_name
-            move(self.sops_path, new_path)
-            print(
-                f"[CacheGuard] Warning: Cache JSON error - old cache potentially corrupt or empty.\n - Created new one and archived original at: {new_path}"
-            )
-            return ""  # The file was not valid and was empty or corrupt
+    @property
+    def data(self):
+        """The unsealed dataset, decrypted on first access for lazy caches"""
+        if self._pending_load:
+            self._ensure_loaded()
+        return self._data
+
+    @data.setter
+    def data(self, value) -> None:
+        self._pending_load = False
+        self._data = value
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the dataset has been unsealed yet"""
+        return not self._pending_load
+
+    def _ensure_loaded(self) -> None:
+        """Run the deferred load of a lazy cache"""
+        if self._pending_load:
+            self._pending_load = False
+            self.data = self.load()
+
+    @classmethod
+    async def aopen(cls, sops_path: str, *args, **kwargs):
+        """Build a cache and unseal it without blocking the event loop"""
+        cache = cls(sops_path, *args, autoload=False, **kwargs)
+        if path.exists(sops_path):
+            cache.data = await cache.aload()
+        return cache
+
+    @classmethod
+    def from_snapshot(cls, snapshot, *args, **kwargs):
+        """Build a cache from plaintext another process published, without Sops
+
+        See `cacheguard.snapshot.Snapshot`.
+        """
+        cache = cls(snapshot.sops_path, *args, autoload=False, **kwargs)
+        cache._restore(snapshot)
+        return cache
+
+    def _restore(self, snapshot) -> None:
+        """Take the dataset from a snapshot, as if it had just been loaded"""
+        with snapshot.view() as view:
+            self.data = self._deserialize(str(view, "utf-8"))
+        self._mark_clean(self._serialize())
+
+    @property
+    def is_dirty(self) -> bool:
+        """Whether the dataset differs from what is sealed on disk"""
+        if self._pending_load:
+            return False  # Never unsealed, so nothing can have changed
+        return self._digest != self._hash(self._serialize())
+
+    def mark_dirty(self) -> None:
+        """Force the next save to re-encrypt even if nothing changed"""
+        self._ensure_loaded()
+        self._digest = None
+
+    def _mark_clean(self, data_string: str, digest: bytes | None = None) -> None:
+        """Record the plaintext that now matches the sealed file"""
+        self._digest = digest or self._hash(data_string)
+        if self.multi_writer:
+            self._base = data_string
+
+    @staticmethod
+    def _hash(data_string: str | bytes) -> bytes:
+        """Digest used for dirty tracking"""
+        if isinstance(data_string, str):
+            data_string = data_string.encode()
+        return sha256(data_string).digest()
+
+    def _serialize(self) -> str:
+        """Plaintext form of the dataset, as it would be saved"""
+        return self.data
+
+    def _deserialize(self, data_string: str):
+        """Dataset from its plaintext form, the reverse of `_serialize`"""
+        return data_string
+
+    def _read(self) -> str:
+        """Read the sealed contents from disk"""
+        with open(self.sops_path) as f:
+            return f.read()
+
+    @contextmanager
+    def _ciphertext(self) -> Iterator[str | memoryview]:
+        """The sealed contents, only valid inside the block"""
+        yield self._read()
+
+    @contextmanager
+    def _read_bytes(self) -> Iterator[memoryview]:
+        """The sealed contents as bytes, without a decode or an extra copy
+
+        Large files are memory-mapped, smaller ones read into a buffer that is
+        reused between loads. The view is only valid inside the block.
+        """
+        with open(self.sops_path, "rb") as f:
+            size = fstat(f.fileno()).st_size
+            if size >= self.MMAP_THRESHOLD:
+                with mmap(f.fileno(), 0, access=ACCESS_READ) as mapped, memoryview(mapped) as view:
+                    yield view
+                return
+            if len(buffer := getattr(self, "_read_buffer", b"")) < size:
+                buffer = self._read_buffer = bytearray(size)
+            with memoryview(buffer) as whole, whole[:size] as view:
+                with view[: f.readinto(view)] as contents:
+                    yield contents
+
+    def _merge(self, data_string: str, sealed: str) -> str:
+        """Combine local changes with plaintext another writer sealed meanwhile
+
+        The whole dataset is replaced by default, so the last writer wins.
+        """
+        return data_string
+
+    def _open_envelope(self, contents) -> bytes:
+        """Decrypt an envelope in-process, unwrapping its data key once per process"""
+        document = parse(contents)
+        self._envelope = unwrap(document["key"])
+        return open_document(document, self._envelope)
+
+    async def _aopen_envelope(self, contents) -> bytes:
+        """Async edition of `_open_envelope`"""
+        document = parse(contents)
+        self._envelope = await aunwrap(document["key"])
+        return open_document(document, self._envelope)
+
+    def _session_envelope(self) -> Envelope:
+        """Data key for new envelopes, wrapped anew if the recipients changed"""
+        if self._envelope is None or not self._envelope.matches(self.age_pubkeys, self.pgp_fingerprints):
+            self._envelope = wrap(self.age_pubkeys, self.pgp_fingerprints)
+        return self._envelope
+
+    async def _asession_envelope(self) -> Envelope:
+        """Async edition of `_session_envelope`"""
+        if self._envelope is None or not self._envelope.matches(self.age_pubkeys, self.pgp_fingerprints):
+            self._envelope = await awrap(self.age_pubkeys, self.pgp_fingerprints)
+        return self._envelope
+
+    def _unseal(self, contents: str) -> str:
+        """Decrypt and decode the sealed contents"""
+        if is_envelope(contents):
+            return decode_payload(self._open_envelope(contents).decode())
+        return decode_payload(decrypt(contents, **self.sops_options))
+
+    async def _aunseal(self, contents: str) -> str:
+        """Async edition of `_unseal`"""
+        if is_envelope(contents):
+            return decode_payload((await self._aopen_envelope(contents)).decode())
+        return decode_payload(await adecrypt(contents, **self.sops_options))
+
+    def _seal(self, data_string: str) -> str:
+        """Encode and encrypt the plaintext"""
+        if self.envelope:
+            return seal(encode_payload(data_string, self.codec).encode(), self._session_envelope())
+        return encrypt(encode_payload(data_string, self.codec), **self.sops_options)
+
+    async def _aseal(self, data_string: str) -> str:
+        """Async edition of `_seal`"""
+        if self.envelope:
+            return seal(encode_payload(data_string, self.codec).encode(), await self._asession_envelope())
+        return await aencrypt(encode_payload(data_string, self.codec), **self.sops_options)
+
+    def _archive(self) -> str:
+        """Move an unreadable cache aside so a new one can be created"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        new_file_name = f"archive-{timestamp}-{Path(self.sops_path).name}"
+        new_path = Path(self.sops_path).parent / new_file_name
+        move(self.sops_path, new_path)
+        print(
+            f"[CacheGuard] Warning: Cache JSON error - old cache potentially corrupt or empty.\n - Created new one and archived original at: {new_path}"
+        )
+        return ""  # The file was not valid and was empty or corrupt
+
+    def _write(self, encrypted_data: str, data_string: str) -> None:
+        """Write the sealed contents to disk, or stage them in a transaction"""
+        if (transaction := active_transaction()) is not None:
+            transaction.stage(self, encrypted_data, data_string)
+            return
+        if self.multi_writer:
+            atomic_write(self.sops_path, encrypted_data)  # Other writers may be reading
         else:
+            if not path.exists(self.sops_path):
+                # make it
+                Path(self.sops_path).parent.mkdir(parents=True, exist_ok=True)
+                Path(self.sops_path).touch(exist_ok=True)
+            with open(self.sops_path, "w" if isinstance(encrypted_data, str) else "wb") as f:
+                f.write(encrypted_data)
+        self._committed(data_string)
+
+    def _committed(self, data_string: str) -> None:
+        """Record plaintext that has just been sealed to disk"""
+        self._identity = file_identity(self.sops_path)
+        # Later loads of this file in the process can skip the decrypt
+        PLAINTEXT_CACHE.put(self.sops_path, self._identity, data_string)
+        self._mark_clean(data_string)
+
+    def load(self) -> str:
+        """Unseal the dataset, reusing the process-wide plaintext if unchanged"""
+        with span("load", self.sops_path) as event:
+            identity = file_identity(self.sops_path)
+            try:
+                if (data := PLAINTEXT_CACHE.get(self.sops_path, identity)) is None:
+                    with self._ciphertext() as contents:
+                        event.input_bytes = len(contents)
+                        # A touched but never saved file has nothing to unseal
+                        data = self._unseal(contents) if len(contents) else ""
+                    PLAINTEXT_CACHE.put(self.sops_path, identity, data)
+                self._identity = identity
+            except OSError:
+                PLAINTEXT_CACHE.invalidate(self.sops_path)
+                return self._archive()
+
+            event.output_bytes = len(data)
+            self._mark_clean(data)
+            return data
+
+    async def aload(self) -> str:
+        """Unseal the dataset without blocking the event loop"""
+        with span("load", self.sops_path) as event:
+            identity = file_identity(self.sops_path)
+            try:
+                if (data := PLAINTEXT_CACHE.get(self.sops_path, identity)) is None:
+                    with self._ciphertext() as contents:
+                        event.input_bytes = len(contents)
+                        # A touched but never saved file has nothing to unseal
+                        data = await self._aunseal(contents) if len(contents) else ""
+                    PLAINTEXT_CACHE.put(self.sops_path, identity, data)
+                self._identity = identity
+            except OSError:
+                PLAINTEXT_CACHE.invalidate(self.sops_path)
+                return self._archive()
+
+            event.output_bytes = len(data)
+            self._mark_clean(data)
             return data
 
     def save(self, data_string) -> None:
-        """Write the dataset to the encrypted at-rest state"""
-        encrypted_data = encrypt(data_string)
-
-        if not path.exists(self.sops_path):
-            # make it
-            Path(self.sops_path).parent.mkdir(parents=True, exist_ok=True)
-            Path(self.sops_path).touch(exist_ok=True)
-        with open(self.sops_path, "w") as f:
-            f.write(encrypted_data)
+        """Write the dataset to the encrypted at-rest state, skipped if unchanged"""
+        if (digest := self._hash(data_string)) == self._digest:
+            # Nothing to write, but changes made and undone since are forgotten
+            return self._mark_clean(data_string, digest)
+        if self.multi_writer:
+            return self._save_shared(data_string)
+        with span("save", self.sops_path) as event:
+            event.input_bytes = len(data_string)
+            encrypted_data = self._seal(data_string)
+            event.output_bytes = len(encrypted_data)
+            self._write(encrypted_data, data_string)
+
+    async def asave(self, data_string) -> None:
+        """Write the dataset to the encrypted at-rest state without blocking the event loop"""
+        if (digest := self._hash(data_string)) == self._digest:
+            # Nothing to write, but changes made and undone since are forgotten
+            return self._mark_clean(data_string, digest)
+        if self.multi_writer:
+            from asyncio import to_thread
+
+            return await to_thread(self._save_shared, data_string)
+        with span("save", self.sops_path) as event:
+            event.input_bytes = len(data_string)
+            encrypted_data = await self._aseal(data_string)
+            event.output_bytes = len(encrypted_data)
+            self._write(encrypted_data, data_string)
+
+    def _save_shared(self, data_string) -> None:
+        """Save under the file lock, first merging in other writers' changes"""
+        if (transaction := active_transaction()) is not None:
+            # The lock must outlive this call, until the staged file is renamed
+            transaction.hold_lock(self.sops_path)
+            lock = nullcontext()
+        else:
+            lock = file_lock(self.sops_path)
+        with lock, span("save", self.sops_path) as event:
+            identity = file_identity(self.sops_path)
+            if identity is not None and identity != self._identity:
+                with self._ciphertext() as contents:
+                    sealed = self._unseal(contents) if len(contents) else ""
+                data_string = self._merge(data_string, sealed)
+            event.input_bytes = len(data_string)
+            encrypted_data = self._seal(data_string)
+            event.output_bytes = len(encrypted_data)
+            self._write(encrypted_data, data_string)
 
     def add(self, *args, **kwargs):
         """"""
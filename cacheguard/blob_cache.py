@@ -0,0 +1,85 @@
+# Project Modules
+from cacheguard.base_cache import BaseCache
+from cacheguard.envelope import is_envelope, seal
+from cacheguard.payload import decode_payload_bytes, encode_payload_bytes
+from cacheguard.sops import adecrypt_bytes, aencrypt_bytes, decrypt_bytes, encrypt_bytes
+
+
+class BlobCache(BaseCache):
+    """Binary edition of the cache
+
+    The dataset is `bytes` and goes to and from Sops without being decoded:
+    the ciphertext is read into a reused buffer, or memory-mapped when large,
+    and handed to the Sops pipe as a view.
+    """
+
+    __slots__ = ("_snapshot",)
+
+    def __init__(
+        self,
+        sops_path: str,
+        age_pubkeys: list[str] = [],
+        pgp_fingerprints: list[str] = [],
+        **kwargs,
+    ) -> None:
+        super().__init__(sops_path, age_pubkeys, pgp_fingerprints, **kwargs)
+        if self.is_loaded and not self.data:
+            self.data = b""
+
+    def load(self) -> bytes:  # type: ignore[override]
+        """Unseal the binary dataset"""
+        return super().load() or b""
+
+    async def aload(self) -> bytes:  # type: ignore[override]
+        """Async edition of `load`"""
+        return await super().aload() or b""
+
+    def save(self, data: bytes | None = None) -> None:  # type: ignore[override]
+        """Write the dataset to the encrypted at-rest state"""
+        if data is None:
+            if not self.is_loaded:
+                return  # Never unsealed, so there is nothing new to write
+            data = self.data
+        super().save(bytes(data) if not isinstance(data, bytes) else data)
+
+    async def asave(self, data: bytes | None = None) -> None:  # type: ignore[override]
+        """Async edition of `save`"""
+        if data is None:
+            if not self.is_loaded:
+                return
+            data = self.data
+        await super().asave(bytes(data) if not isinstance(data, bytes) else data)
+
+    def _restore(self, snapshot) -> None:
+        """Use the snapshot's shared memory as the dataset, a read-only memoryview"""
+        self._snapshot = snapshot  # Keeps the segment mapped while the view is in use
+        self.data = snapshot.view()
+        self._mark_clean(self.data)
+
+    def _ciphertext(self):
+        """The sealed contents as a view over the file, see `_read_bytes`"""
+        return self._read_bytes()
+
+    def _unseal(self, contents: memoryview) -> bytes:  # type: ignore[override]
+        """Decrypt and decode the sealed contents"""
+        if is_envelope(contents):
+            return decode_payload_bytes(self._open_envelope(contents))
+        return decode_payload_bytes(decrypt_bytes(contents))
+
+    async def _aunseal(self, contents: memoryview) -> bytes:  # type: ignore[override]
+        """Async edition of `_unseal`"""
+        if is_envelope(contents):
+            return decode_payload_bytes(await self._aopen_envelope(contents))
+        return decode_payload_bytes(await adecrypt_bytes(contents))
+
+    def _seal(self, data: bytes) -> bytes | str:  # type: ignore[override]
+        """Encode and encrypt the binary dataset"""
+        if self.envelope:
+            return seal(encode_payload_bytes(data, self.codec), self._session_envelope())
+        return encrypt_bytes(encode_payload_bytes(data, self.codec))
+
+    async def _aseal(self, data: bytes) -> bytes | str:  # type: ignore[override]
+        """Async edition of `_seal`"""
+        if self.envelope:
+            return seal(encode_payload_bytes(data, self.codec), await self._asession_envelope())
+        return await aencrypt_bytes(encode_payload_bytes(data, self.codec))
@@ -0,0 +1,115 @@
+# Python Modules
+from collections.abc import Iterable, Mapping
+from json import dumps
+from os import PathLike, environ
+from pathlib import Path
+
+# Project Modules
+from cacheguard.base_cache import BaseCache
+from cacheguard.blob_cache import BlobCache
+from cacheguard.key_cache import KeyCache
+from cacheguard.text_cache import TextCache
+
+# Default file extensions per RFC 1
+CACHE_TYPES: dict[str, type[BaseCache]] = {
+    ".keys.sops": KeyCache,
+    ".text.sops": TextCache,
+    ".blob.sops": BlobCache,
+}
+
+# Sops does the heavy lifting in a subprocess, so threads are enough to overlap it
+DEFAULT_WORKERS = 8
+
+
+def cache_type(sops_path: str | PathLike) -> type[BaseCache]:
+    """Pick the cache class for a file from its extension"""
+    name = Path(sops_path).name
+    for extension, cls in CACHE_TYPES.items():
+        if name.endswith(extension):
+            return cls
+    raise ValueError(f"Unrecognized cache extension: {name}")
+
+
+def discover(directory: str | PathLike, recursive: bool = False) -> list[Path]:
+    """Find every cache file in a directory by its extension"""
+    pattern = "**/*" if recursive else "*"
+    return sorted(
+        found
+        for extension in CACHE_TYPES
+        for found in Path(directory).glob(pattern + extension)
+        if found.is_file()
+    )
+
+
+def load_many(
+    sources: str | PathLike | Iterable[str | PathLike],
+    max_workers: int = DEFAULT_WORKERS,
+    recursive: bool = False,
+    cache_class: type[BaseCache] | None = None,
+    **kwargs,
+) -> dict[Path, BaseCache]:
+    """Open many caches at once, from a directory or a list of paths
+
+    Decryption runs on a bounded thread pool so the total time tracks the
+    slowest single decrypt. The cache class is picked by extension unless
+    `cache_class` is given. Extra keyword arguments go to every cache.
+    """
+    if isinstance(sources, (str, PathLike)) and Path(sources).is_dir():
+        paths = discover(sources, recursive)
+    elif isinstance(sources, (str, PathLike)):
+        paths = [Path(sources)]
+    else:
+        paths = [Path(x) for x in sources]
+
+    def open_cache(sops_path: Path) -> BaseCache:
+        cls = cache_class or cache_type(sops_path)
+        return cls(str(sops_path), **kwargs)
+
+    # Imported here to keep `concurrent.futures` out of `import cacheguard`
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(zip(paths, pool.map(open_cache, paths)))
+
+
+def save_many(
+    caches: Mapping[Path, BaseCache] | Iterable[BaseCache],
+    max_workers: int = DEFAULT_WORKERS,
+) -> None:
+    """Save many caches at once on a bounded thread pool
+
+    Every save is attempted; the first failure is raised once all are done.
+    """
+    if isinstance(caches, Mapping):
+        caches = caches.values()
+
+    from concurrent.futures import ThreadPoolExecutor
+    from contextvars import copy_context
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Carry the caller's context so saves inside a transaction are staged
+        futures = [pool.submit(copy_context().run, cache.save) for cache in caches]
+
+    for future in futures:
+        future.result()
+
+
+def merge_environment(
+    sources: Iterable[str | PathLike],
+    base: Mapping[str, str] | None = None,
+    override: bool = True,
+    max_workers: int = DEFAULT_WORKERS,
+) -> dict[str, str]:
+    """Environment built from many Key Caches, decrypted concurrently
+
+    Caches are applied in the order given, so later ones win over earlier
+    ones. They also win over `base` (the current environment by default)
+    unless `override` is False. Values that are not strings become JSON.
+    """
+    merged: dict[str, str] = {}
+    for cache in load_many(sources, max_workers, cache_class=KeyCache).values():
+        for key, value in cache.data.items():
+            merged[key] = value if isinstance(value, str) else dumps(value)
+
+    base = dict(environ if base is None else base)
+    return {**base, **merged} if override else {**merged, **base}
@@ -0,0 +1,99 @@
+"""
+Command line interface, installed as `cacheguard`
+"""
+
+# Python Modules
+from argparse import REMAINDER, ArgumentParser, Namespace
+from os import execvpe
+from pathlib import Path
+import sys
+
+# Project Modules
+from cacheguard.bulk import DEFAULT_WORKERS
+
+
+def rotate_command(args: Namespace) -> int:
+    """Rotate the data key and recipients of many sops files"""
+    from cacheguard.rotate import rotate_many
+
+    def progress(finished: int, total: int, sops_path: Path, status: str) -> None:
+        if not args.quiet:
+            print(f"[{finished}/{total}] {status} {sops_path}", file=sys.stderr, flush=True)
+
+    report = rotate_many(
+        args.sources,
+        add_age=args.add_age,
+        remove_age=args.rm_age,
+        add_pgp=args.add_pgp,
+        remove_pgp=args.rm_pgp,
+        max_workers=args.jobs,
+        recursive=args.recursive,
+        state_file=args.state,
+        progress=progress,
+    )
+    for sops_path, error in report.failed.items():
+        print(f"[CacheGuard] Failed to rotate {sops_path}: {error}", file=sys.stderr)
+    print(
+        f"Rotated {len(report.rotated)}, skipped {len(report.skipped)}, failed {len(report.failed)}",
+        file=sys.stderr,
+    )
+    return 0 if report.ok else 1
+
+
+def exec_command(args: Namespace) -> int:
+    """Run a command with the contents of Key Caches in its environment"""
+    from cacheguard.bulk import merge_environment
+
+    command = args.command_line[1:] if args.command_line[:1] == ["--"] else args.command_line
+    if not command:
+        print("[CacheGuard] exec needs a command to run after --", file=sys.stderr)
+        return 2
+
+    if missing := [x for x in args.key_cache if not Path(x).is_file()]:
+        print(f"[CacheGuard] Key Cache not found: {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    env = merge_environment(args.key_cache, override=not args.no_override, max_workers=args.jobs)
+    try:
+        execvpe(command[0], command, env)
+    except OSError as error:
+        print(f"[CacheGuard] Failed to run {command[0]}: {error}", file=sys.stderr)
+        return 127
+    return 0  # Only reached when execvpe is replaced, as in tests
+
+
+def build_parser() -> ArgumentParser:
+    """Parser for every subcommand"""
+    parser = ArgumentParser(prog="cacheguard", description="A simple, secure Python datastore protected by Sops")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rotate = commands.add_parser("rotate", help="Rotate data keys and recipients across many sops files")
+    rotate.add_argument("sources", nargs="+", help="Sops files, or directories to search for them")
+    rotate.add_argument("--add-age", action="append", default=[], metavar="RECIPIENT")
+    rotate.add_argument("--rm-age", action="append", default=[], metavar="RECIPIENT")
+    rotate.add_argument("--add-pgp", action="append", default=[], metavar="FINGERPRINT")
+    rotate.add_argument("--rm-pgp", action="append", default=[], metavar="FINGERPRINT")
+    rotate.add_argument("-j", "--jobs", type=int, default=DEFAULT_WORKERS, help="Files to rotate at once")
+    rotate.add_argument("-r", "--recursive", action="store_true", help="Search directories recursively")
+    rotate.add_argument("--state", help="Record progress here so an interrupted run can resume")
+    rotate.add_argument("-q", "--quiet", action="store_true", help="Only report the summary")
+    rotate.set_defaults(handler=rotate_command)
+
+    run = commands.add_parser("exec", help="Run a command with Key Caches loaded into its environment")
+    run.add_argument(
+        "-k", "--key-cache", action="append", default=[], metavar="PATH",
+        help="Key Cache to load, repeatable; later caches win",
+    )
+    run.add_argument(
+        "--no-override", action="store_true", help="Keep variables already set in the environment"
+    )
+    run.add_argument("-j", "--jobs", type=int, default=DEFAULT_WORKERS, help="Caches to decrypt at once")
+    run.add_argument("command_line", nargs=REMAINDER, metavar="-- COMMAND", help="Command and its arguments")
+    run.set_defaults(handler=exec_command)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
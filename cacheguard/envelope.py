@@ -0,0 +1,160 @@
+# Python Modules
+from base64 import b64decode, b64encode
+from hashlib import sha256
+from json import dumps, loads
+from os import PathLike, urandom
+from pathlib import Path
+
+# Project Modules
+from cacheguard.sops import (
+    adecrypt_bytes,
+    aencrypt_bytes,
+    decrypt_bytes,
+    encrypt_bytes,
+    get_recipients,
+)
+
+# Field that marks an envelope document, holding the layout version (RFC 1)
+MARKER = "cacheguard_envelope"
+ENVELOPE_VERSION = 1
+CIPHER = "AES256_GCM"
+KEY_SIZE = 32
+NONCE_SIZE = 12
+
+# Authenticated with every payload, so a ciphertext cannot pass as another layout
+_AAD = f"{MARKER}:{ENVELOPE_VERSION}:{CIPHER}".encode()
+
+# Data keys unwrapped in this process, by the digest of their wrapped form
+_session_keys: dict[bytes, bytes] = {}
+
+
+def _aesgcm(key: bytes):
+    """AES-GCM cipher from the optional `cryptography` package"""
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except ImportError:
+        raise ImportError(
+            "Envelope mode needs the 'cryptography' package, install it with 'pip install cacheguard[envelope]'"
+        ) from None
+    return AESGCM(key)
+
+
+def require_cipher() -> None:
+    """Fail early, with installation advice, if envelope mode cannot work"""
+    _aesgcm(bytes(KEY_SIZE))
+
+
+def is_envelope(contents: str | bytes | memoryview) -> bool:
+    """Whether sealed contents use the envelope layout rather than plain Sops"""
+    head = contents[:64]
+    if isinstance(head, str):
+        return f'"{MARKER}"' in head
+    return f'"{MARKER}"'.encode() in bytes(head)
+
+
+class Envelope:
+    """A cache's data key, with the Sops document that wraps it"""
+
+    __slots__ = ("key", "wrapped", "recipients")
+
+    def __init__(self, key: bytes, wrapped: dict) -> None:
+        self.key = key
+        self.wrapped = wrapped
+        found = get_recipients(dumps(wrapped))
+        self.recipients = (frozenset(found.get("age_pubkeys", [])), frozenset(found.get("pgp_fingerprints", [])))
+
+    def matches(self, age_pubkeys: list[str], pgp_fingerprints: list[str]) -> bool:
+        """Whether the data key is wrapped for exactly these recipients"""
+        return self.recipients == (frozenset(age_pubkeys), frozenset(pgp_fingerprints))
+
+
+def _digest(wrapped: dict) -> bytes:
+    """Session cache key for a wrapped data key"""
+    return sha256(dumps(wrapped, sort_keys=True).encode()).digest()
+
+
+def _remember(key: bytes, wrapped: dict) -> Envelope:
+    _session_keys[_digest(wrapped)] = key
+    return Envelope(key, wrapped)
+
+
+def wrap(age_pubkeys: list[str], pgp_fingerprints: list[str]) -> Envelope:
+    """Create a random data key and seal it with Sops for the recipients"""
+    key = urandom(KEY_SIZE)
+    return _remember(key, loads(encrypt_bytes(key, age_pubkeys, pgp_fingerprints)))
+
+
+async def awrap(age_pubkeys: list[str], pgp_fingerprints: list[str]) -> Envelope:
+    """Async edition of `wrap`"""
+    key = urandom(KEY_SIZE)
+    return _remember(key, loads(await aencrypt_bytes(key, age_pubkeys, pgp_fingerprints)))
+
+
+def unwrap(wrapped: dict) -> Envelope:
+    """Recover a data key, running Sops only the first time in this process"""
+    if (key := _session_keys.get(_digest(wrapped))) is None:
+        key = decrypt_bytes(dumps(wrapped).encode())
+    return _remember(key, wrapped)
+
+
+async def aunwrap(wrapped: dict) -> Envelope:
+    """Async edition of `unwrap`"""
+    if (key := _session_keys.get(_digest(wrapped))) is None:
+        key = await adecrypt_bytes(dumps(wrapped).encode())
+    return _remember(key, wrapped)
+
+
+def forget_keys() -> None:
+    """Drop every data key unwrapped in this process"""
+    _session_keys.clear()
+
+
+def parse(contents: str | bytes | memoryview) -> dict:
+    """Read and check an envelope document"""
+    document = loads(contents if isinstance(contents, str) else bytes(contents))
+    if document.get(MARKER) != ENVELOPE_VERSION or document.get("cipher") != CIPHER:
+        raise ValueError(f"Unsupported envelope: version {document.get(MARKER)!r}, cipher {document.get('cipher')!r}")
+    return document
+
+
+def seal(plaintext: bytes, envelope: Envelope) -> str:
+    """Encrypt a payload in-process into an envelope document"""
+    nonce = urandom(NONCE_SIZE)
+    ciphertext = _aesgcm(envelope.key).encrypt(nonce, plaintext, _AAD)
+    document = {
+        MARKER: ENVELOPE_VERSION,
+        "cipher": CIPHER,
+        "iv": b64encode(nonce).decode(),
+        "data": b64encode(ciphertext).decode(),
+        "key": envelope.wrapped,
+    }
+    return dumps(document, indent="\t") + "\n"
+
+
+def open_document(document: dict, envelope: Envelope) -> bytes:
+    """Decrypt the payload of an envelope document in-process"""
+    nonce, ciphertext = b64decode(document["iv"]), b64decode(document["data"])
+    return _aesgcm(envelope.key).decrypt(nonce, ciphertext, _AAD)
+
+
+def rotate_envelope(
+    sops_path: str | PathLike,
+    add_age: list[str] = [],
+    remove_age: list[str] = [],
+    add_pgp: list[str] = [],
+    remove_pgp: list[str] = [],
+) -> str:
+    """Reseal an envelope file under a fresh data key, returning the new document
+
+    As with `sops rotate`, recipients that are removed lose access to the
+    payload, not only to the key. The new key is wrapped for the age and PGP
+    recipients of the old one, with the changes applied.
+    """
+    document = parse(Path(sops_path).read_text())
+    old = unwrap(document["key"])
+    age, pgp = old.recipients
+    new = wrap(
+        [*sorted(age - set(remove_age)), *(x for x in add_age if x not in age)],
+        [*sorted(pgp - set(remove_pgp)), *(x for x in add_pgp if x not in pgp)],
+    )
+    return seal(open_document(document, old), new)
@@ -0,0 +1,58 @@
+# Python Modules
+from subprocess import TimeoutExpired  # nosec B404
+
+
+class SopsError(RuntimeError):
+    """Sops exited with an error"""
+
+    def __init__(
+        self,
+        message: str,
+        command: list[str] | None = None,
+        returncode: int | None = None,
+        stderr: str = "",
+    ) -> None:
+        super().__init__(message)
+        self.command = command
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class SopsTimeoutError(SopsError, TimeoutExpired):
+    """Sops did not finish within the timeout of the execution policy"""
+
+    def __init__(self, command: list[str], timeout: float) -> None:
+        SopsError.__init__(self, f"Sops did not finish within {timeout:g} seconds", command)
+        # Keep the attributes callers of subprocess expect from a timeout
+        self.cmd = command
+        self.timeout = timeout
+        self.output = None
+
+    def __str__(self) -> str:
+        return str(self.args[0])
+
+
+class SopsKeyError(SopsError):
+    """Sops could not retrieve a key to decrypt the data key, such as a busy GPG agent"""
+
+
+class SopsIntegrityError(SopsError):
+    """The sealed data failed its MAC check or has no MAC"""
+
+
+class SopsInterruptedError(SopsError):
+    """Sops was killed by a signal, such as from the OOM killer, before it finished"""
+
+
+# Sops exit codes with their own error type
+EXIT_CODE_ERRORS: dict[int, type[SopsError]] = {
+    51: SopsIntegrityError,  # MAC mismatch
+    52: SopsIntegrityError,  # MAC not found
+    128: SopsKeyError,  # Could not retrieve key
+}
+
+
+def sops_error(message: str, command: list[str], returncode: int, stderr: str) -> SopsError:
+    """Typed error for a failed Sops process"""
+    error_type = SopsInterruptedError if returncode < 0 else EXIT_CODE_ERRORS.get(returncode, SopsError)
+    return error_type(f"{message}: {stderr.strip()}", command, returncode, stderr)
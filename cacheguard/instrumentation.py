@@ -0,0 +1,207 @@
+# Python Modules
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from subprocess import TimeoutExpired  # nosec B404
+from threading import Lock
+from time import perf_counter, time_ns
+from warnings import warn
+
+
+class SopsEvent:
+    """Report of a single cacheguard operation
+
+    Events with `subprocess` set cover one Sops process, such as `encrypt` or
+    `decrypt`. Others, such as `load` and `save`, cover a whole cache operation
+    with `subprocess_time` summing the Sops processes it ran.
+    """
+
+    # A plain class rather than a dataclass keeps `dataclasses` out of import time
+    __slots__ = (
+        "operation",
+        "path",
+        "subprocess",
+        "start_ns",
+        "wall_time",
+        "subprocess_time",
+        "input_bytes",
+        "output_bytes",
+        "exit_code",
+        "timed_out",
+        "error",
+    )
+
+    def __init__(
+        self,
+        operation: str,
+        path: str | None = None,
+        subprocess: bool = False,
+        start_ns: int | None = None,
+        wall_time: float = 0.0,
+        subprocess_time: float = 0.0,
+        input_bytes: int = 0,
+        output_bytes: int = 0,
+        exit_code: int | None = None,
+        timed_out: bool = False,
+        error: BaseException | None = None,
+    ) -> None:
+        self.operation = operation
+        self.path = path
+        self.subprocess = subprocess
+        self.start_ns = time_ns() if start_ns is None else start_ns
+        self.wall_time = wall_time
+        self.subprocess_time = subprocess_time
+        self.input_bytes = input_bytes
+        self.output_bytes = output_bytes
+        self.exit_code = exit_code
+        self.timed_out = timed_out
+        self.error = error
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{x}={getattr(self, x)!r}" for x in self.__slots__)
+        return f"SopsEvent({fields})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SopsEvent):
+            return NotImplemented
+        return all(getattr(self, x) == getattr(other, x) for x in self.__slots__)
+
+
+Hook = Callable[[SopsEvent], None]
+
+_hooks: list[Hook] = []
+_current: ContextVar[SopsEvent | None] = ContextVar("cacheguard_event", default=None)
+
+
+class Counters:
+    """Cumulative in-process totals per operation, safe to scrape from any thread"""
+
+    FIELDS = ("calls", "errors", "timeouts", "wall_time", "subprocess_time", "input_bytes", "output_bytes")
+
+    def __init__(self) -> None:
+        self._totals: dict[str, dict[str, float]] = {}
+        self._lock = Lock()
+
+    def record(self, event: SopsEvent) -> None:
+        """Add an event to the totals"""
+        with self._lock:
+            totals = self._totals.setdefault(event.operation, dict.fromkeys(self.FIELDS, 0))
+            totals["calls"] += 1
+            totals["errors"] += event.error is not None
+            totals["timeouts"] += event.timed_out
+            totals["wall_time"] += event.wall_time
+            totals["subprocess_time"] += event.subprocess_time
+            totals["input_bytes"] += event.input_bytes
+            totals["output_bytes"] += event.output_bytes
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """Copy of the totals, keyed by operation"""
+        with self._lock:
+            return {key: dict(value) for key, value in self._totals.items()}
+
+    def reset(self) -> None:
+        """Zero every total"""
+        with self._lock:
+            self._totals.clear()
+
+
+COUNTERS = Counters()
+
+
+def add_hook(hook: Hook) -> None:
+    """Call `hook` with every finished SopsEvent"""
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:
+    """Stop calling a hook added with `add_hook`"""
+    _hooks.remove(hook)
+
+
+def get_counters() -> dict[str, dict[str, float]]:
+    """Cumulative totals per operation"""
+    return COUNTERS.snapshot()
+
+
+def reset_counters() -> None:
+    """Zero the cumulative totals"""
+    COUNTERS.reset()
+
+
+def current_path() -> str | None:
+    """Cache path of the operation running in this context, if any"""
+    return event.path if (event := _current.get()) is not None else None
+
+
+def record(event: SopsEvent) -> None:
+    """Finish an event: roll it into its parent, the counters and the hooks"""
+    if event.subprocess:
+        event.subprocess_time = event.wall_time
+        if (parent := _current.get()) is not None:
+            parent.subprocess_time += event.wall_time
+            parent.exit_code = event.exit_code
+            parent.timed_out |= event.timed_out
+
+    COUNTERS.record(event)
+    for hook in list(_hooks):
+        try:
+            hook(event)
+        except Exception as error:
+            # Instrumentation must never break the operation being measured
+            warn(f"[CacheGuard] Instrumentation hook {hook!r} failed: {error!r}")
+
+
+@contextmanager
+def span(
+    operation: str, path: str | None = None, subprocess: bool = False
+) -> Iterator[SopsEvent]:
+    """Time the enclosed block and report it as an event"""
+    event = SopsEvent(operation, path or current_path(), subprocess)
+    token = _current.set(event)
+    started = perf_counter()
+    try:
+        yield event
+    except TimeoutExpired as error:
+        event.timed_out = True
+        event.error = error
+        raise
+    except BaseException as error:
+        event.error = error
+        raise
+    finally:
+        event.wall_time = perf_counter() - started
+        _current.reset(token)
+        record(event)
+
+
+class OpenTelemetryHook:
+    """Adapter turning events into spans on an OpenTelemetry-style tracer
+
+    Duck-typed so cacheguard does not depend on OpenTelemetry: any tracer
+    with `start_span(name, start_time=...)` returning a span that supports
+    `set_attribute` and `end(end_time=...)` works.
+
+        add_hook(OpenTelemetryHook(trace.get_tracer("cacheguard")))
+    """
+
+    def __init__(self, tracer, prefix: str = "cacheguard") -> None:
+        self.tracer = tracer
+        self.prefix = prefix
+
+    def __call__(self, event: SopsEvent) -> None:
+        otel_span = self.tracer.start_span(
+            f"{self.prefix}.{event.operation}", start_time=event.start_ns
+        )
+        attributes = {
+            "cacheguard.path": event.path,
+            "cacheguard.subprocess_time": event.subprocess_time,
+            "cacheguard.input_bytes": event.input_bytes,
+            "cacheguard.output_bytes": event.output_bytes,
+            "cacheguard.exit_code": event.exit_code,
+            "cacheguard.timed_out": event.timed_out,
+            "cacheguard.error": repr(event.error) if event.error else None,
+        }
+        for key, value in attributes.items():
+            if value is not None:
+                otel_span.set_attribute(key, value)
+        otel_span.end(end_time=event.start_ns + int(event.wall_time * 1e9))
@@ -1,46 +1,177 @@
 # Python Modules
+from collections.abc import Iterator, MutableMapping
 from json import dumps, loads
 from os import environ
 
 # Project Modules
 from cacheguard.base_cache import BaseCache
+from cacheguard.sops import SET_VALUE_STDIN_VERSION, extract, set_value, sops_version
 
 
-class KeyCache(BaseCache):
-    """Key-Value edition of the Cache"""
+class KeyCache(BaseCache, MutableMapping):
+    """Key-Value edition of the Cache
+
+    The cache is itself a mutable mapping over its key-values, updated in
+    place. Keys set or deleted through it are tracked in `changed_keys`
+    until the next load or save. It still compares, hashes and tests true
+    as the object it is, not by its contents.
+
+    With `structured=True` the cache is sealed as a Sops JSON document, with
+    each value encrypted separately. A lazy structured cache can then `get`
+    and `set` single keys without decrypting the whole store; lookups through
+    the mapping decrypt it all, so they return the same values either way.
+    """
+
+    __slots__ = ("structured", "_changed")
 
     def __init__(
         self,
         sops_path: str,
         age_pubkeys: list[str] = [],
         pgp_fingerprints: list[str] = [],
+        structured: bool = False,
+        **kwargs,
     ) -> None:
-        super().__init__(sops_path, age_pubkeys, pgp_fingerprints)
-        if not self.data:
+        self.structured = structured
+        self._changed: set[str] = set()
+        if structured and kwargs.get("codec"):
+            raise ValueError("Structured Key Caches cannot use a payload codec")
+        if structured and kwargs.get("envelope"):
+            raise ValueError("Structured Key Caches cannot use envelope mode")
+        super().__init__(sops_path, age_pubkeys, pgp_fingerprints, **kwargs)
+        if self.is_loaded and not self.data:
             self.data = {}
 
+    @property
+    def sops_options(self) -> dict:  # type: ignore[override]
+        """Structured caches are sealed as Sops JSON documents"""
+        return {"data_type": "json"} if self.structured else {}
+
+    def __getitem__(self, key: str):
+        return self.data[key]
+
+    def __setitem__(self, key: str, value) -> None:
+        data = self.data
+        if key not in data or data[key] != value:
+            data[key] = value
+            self._changed.add(key)
+
+    def __delitem__(self, key: str) -> None:
+        del self.data[key]
+        self._changed.add(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.sops_path!r})"
+
+    # Caches are handles on files, so the Mapping mixin's value semantics do not apply
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def __bool__(self) -> bool:
+        return True
+
+    @property
+    def changed_keys(self) -> frozenset[str]:
+        """Keys set or deleted through the mapping since the last load or save"""
+        return frozenset(self._changed)
+
+    def _mark_clean(self, data_string: str, digest: bytes | None = None) -> None:
+        """Record the plaintext that now matches the sealed file"""
+        super()._mark_clean(data_string, digest)
+        self._changed.clear()
+
     def load(self)  -> dict:  # type: ignore[override]
         """Handle the data for key-values by loading with JSON"""
         if obtained_data := super().load():
             self.data = loads(obtained_data)
+            self._mark_clean(self._serialize())
         else:
             self.data = {}
         return self.data
 
+    async def aload(self) -> dict:  # type: ignore[override]
+        """Async edition of `load`"""
+        obtained_data = await super().aload()
+        if obtained_data:
+            self.data = loads(obtained_data)
+            self._mark_clean(self._serialize())
+        else:
+            self.data = {}
+        return self.data
+
+    def _serialize(self) -> str:
+        """JSON form of the key-values, without whitespace when a codec is set"""
+        if self.codec:
+            return dumps(self.data, separators=(",", ":"))
+        return dumps(self.data)
+
+    def _merge(self, data_string: str, sealed: str) -> str:
+        """Apply the keys changed here on top of another writer's key-values"""
+        base = loads(self._base) if self._base else {}
+        merged = loads(sealed) if sealed else {}
+        merged.update((k, v) for k, v in self.data.items() if k not in base or base[k] != v)
+        for key in base.keys() - self.data.keys():
+            merged.pop(key, None)  # Removed here since the last sync
+        self.data = merged
+        return self._serialize()
+
+    def _deserialize(self, data_string: str) -> dict:
+        """Key-values from their JSON form"""
+        return loads(data_string) if data_string else {}
+
     def save(self, *args, **kwargs) -> None:
         """Write the dataset to the encrypted at-rest state"""
-        converted_string = dumps(self.data)
+        if not self.is_loaded:
+            return  # Never unsealed, so there is nothing new to write
+        converted_string = self._serialize()
         super().save(converted_string)
 
+    async def asave(self, *args, **kwargs) -> None:
+        """Async edition of `save`"""
+        if not self.is_loaded:
+            return
+        await super().asave(self._serialize())
+
     def add(self, entry: dict) -> None:
-        """Add new entries"""
-        self.data = {**self.data, **entry}
+        """Add new entries, updating the key-values in place"""
+        self.update(entry)
+
+    def get(self, key: str, default=None):
+        """Look up one value, decrypting only that value if still sealed
+
+        Single-value lookups need a structured cache opened with `lazy=True`,
+        and return non-string values as JSON text.
+        """
+        if self.structured and not self.is_loaded:
+            try:
+                return extract(self.sops_path, key)
+            except KeyError:
+                return default
+        return self.data.get(key, default)
+
+    def set(self, key: str, value) -> None:
+        """Update one key and seal it straight away
+
+        A structured cache that is still sealed re-encrypts only that value;
+        otherwise this is `add` followed by `save`.
+        """
+        if self.structured and not self.is_loaded and sops_version() >= SET_VALUE_STDIN_VERSION:
+            set_value(self.sops_path, key, value)
+            return
+        self.add({key: value})
+        self.save()
 
     def load_env_var(self, env_var) -> None:
         """Load a key-value pair into the environment from the cache"""
-        if not self.data.get(env_var):
+        if not (value := self.get(env_var)):
             raise KeyError("Key does not exist in Key Cache")
-        environ[env_var] = self.data[env_var]
+        environ[env_var] = value
 
     def deploy(self) -> None:
         """Load every key-value pair in this cache into the environment"""
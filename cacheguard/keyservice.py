@@ -0,0 +1,145 @@
+# Python Modules
+from atexit import register
+from os import getpid
+from pathlib import Path
+from shutil import rmtree
+from socket import AF_UNIX, SOCK_STREAM, socket
+from subprocess import DEVNULL, Popen, TimeoutExpired  # nosec B404
+from tempfile import mkdtemp
+from threading import Lock
+from time import monotonic, sleep
+
+# Project Modules
+from cacheguard.errors import SopsError
+from cacheguard.instrumentation import span
+from cacheguard.sops import get_keyservice, get_sops_binary, use_keyservice
+
+
+class KeyService:
+    """A long-lived `sops keyservice` listening on a Unix socket
+
+    Sops calls routed through it skip the local key service, so age
+    identities and the GPG agent connection are set up once rather than
+    by every Sops process. The service is checked before each call and
+    restarted if it has died. Other processes, such as forked workers,
+    use it while it is reachable but never restart or stop it.
+    """
+
+    __slots__ = ("socket_path", "startup_timeout", "restarts", "_process", "_directory", "_owner", "_lock")
+
+    def __init__(self, socket_path: str | None = None, startup_timeout: float = 5.0) -> None:
+        self._directory = None if socket_path else mkdtemp(prefix="cacheguard-keyservice-")
+        self.socket_path = socket_path or str(Path(self._directory) / "sops.sock")  # type: ignore[arg-type]
+        self.startup_timeout = startup_timeout
+        self.restarts = 0
+        self._process: Popen | None = None
+        self._owner = getpid()
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return f"KeyService({self.socket_path!r})"
+
+    @property
+    def address(self) -> str:
+        """Address Sops is given with `--keyservice`"""
+        return f"unix://{self.socket_path}"
+
+    def _reachable(self) -> bool:
+        """Whether the socket accepts connections"""
+        with socket(AF_UNIX, SOCK_STREAM) as client:
+            try:
+                client.connect(self.socket_path)
+            except OSError:
+                return False
+        return True
+
+    @property
+    def is_healthy(self) -> bool:
+        """Whether the service is running and accepting connections"""
+        if getpid() == self._owner and (self._process is None or self._process.poll() is not None):
+            return False
+        return self._reachable()
+
+    def start(self) -> None:
+        """Launch the keyservice and wait until it accepts connections"""
+        with span("keyservice", self.socket_path, subprocess=True):
+            Path(self.socket_path).unlink(missing_ok=True)
+            self._process = Popen(  # nosec B603
+                [get_sops_binary(), "keyservice", "--network", "unix", "--address", self.socket_path],
+                stdin=DEVNULL,
+                stdout=DEVNULL,
+                stderr=DEVNULL,
+            )
+            deadline = monotonic() + self.startup_timeout
+            while not self._reachable():
+                if self._process.poll() is not None or monotonic() > deadline:
+                    self._terminate()
+                    raise SopsError(f"Sops keyservice did not start on {self.socket_path}")
+                sleep(0.01)
+
+    def ensure_running(self) -> bool:
+        """Restart the service if it has died, returning whether it can be used"""
+        if self.is_healthy:
+            return True
+        if getpid() != self._owner:
+            return False  # Only the process that started it manages it
+        with self._lock:
+            if not self.is_healthy:
+                self._terminate()
+                self.start()
+                self.restarts += 1
+        return True
+
+    def flags(self) -> list[str]:
+        """Sops flags routing a call through this service, none if it is unusable"""
+        if not self.ensure_running():
+            return []
+        return ["--keyservice", self.address, "--enable-local-keyservice=false"]
+
+    def _terminate(self) -> None:
+        """End the keyservice process, if this process started one"""
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        process.terminate()
+        try:
+            process.wait(2)
+        except TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def stop(self) -> None:
+        """End the keyservice and remove its socket"""
+        if getpid() != self._owner:
+            return
+        self._terminate()
+        Path(self.socket_path).unlink(missing_ok=True)
+        if self._directory is not None:
+            rmtree(self._directory, ignore_errors=True)
+
+
+_registered = False
+
+
+def start_keyservice(socket_path: str | None = None, startup_timeout: float = 5.0) -> KeyService:
+    """Start a managed keyservice and route every Sops call through it
+
+    It replaces any keyservice started before, and is stopped when the
+    interpreter exits.
+    """
+    global _registered
+    service = KeyService(socket_path, startup_timeout)
+    service.start()
+    stop_keyservice()
+    use_keyservice(service)
+    if not _registered:
+        register(stop_keyservice)
+        _registered = True
+    return service
+
+
+def stop_keyservice() -> None:
+    """Stop the managed keyservice and go back to plain Sops calls"""
+    if (service := get_keyservice()) is not None:
+        use_keyservice(None)
+        service.stop()
@@ -0,0 +1,76 @@
+# Python Modules
+from base64 import b64decode, b64encode
+from re import compile
+
+# Marks a plaintext that was encoded before encryption, e.g. `cacheguard:1:zlib`
+HEADER_PREFIX = "cacheguard:"
+FORMAT_VERSION = 1
+
+CODECS = ("zlib", "lzma")
+
+_HEADER = compile(rf"{HEADER_PREFIX}\d+:\w+")
+
+
+def _compressor(codec: str):
+    """Module providing `compress` and `decompress` for a codec"""
+    # Imported on demand, lzma in particular is slow to import
+    if codec == "zlib":
+        import zlib
+
+        return zlib
+    if codec == "lzma":
+        import lzma
+
+        return lzma
+    raise ValueError(f"Unknown payload codec: {codec!r}, expected one of {CODECS}")
+
+
+def encode_payload(data: str, codec: str | None = None) -> str:
+    """Compress plaintext ahead of encryption, unchanged when `codec` is None
+
+    The result is a one line header naming the format version and codec,
+    followed by the compressed data in base64.
+    """
+    if codec is None:
+        return data
+    compressed = _compressor(codec).compress(data.encode())
+    return f"{HEADER_PREFIX}{FORMAT_VERSION}:{codec}\n{b64encode(compressed).decode()}"
+
+
+def decode_payload(payload: str) -> str:
+    """Reverse `encode_payload`, passing plaintext without a header through"""
+    if not is_encoded(payload):
+        return payload  # Written before codecs, or without one
+    header, _, body = payload.partition("\n")
+    _, version, codec = header.split(":", 2)
+    if version != str(FORMAT_VERSION):
+        raise ValueError(f"Unsupported payload format version: {version}")
+    return _compressor(codec).decompress(b64decode(body)).decode()
+
+
+def encode_payload_bytes(data: bytes | memoryview, codec: str | None = None) -> bytes | memoryview:
+    """Binary edition of `encode_payload`, with no base64 step"""
+    if codec is None:
+        return data
+    header = f"{HEADER_PREFIX}{FORMAT_VERSION}:{codec}\n".encode()
+    return header + _compressor(codec).compress(data)
+
+
+def decode_payload_bytes(payload: bytes) -> bytes:
+    """Binary edition of `decode_payload`"""
+    if not payload.startswith(HEADER_PREFIX.encode()):
+        return payload
+    header, _, body = payload.partition(b"\n")
+    if not is_encoded(header.decode(errors="replace")):
+        return payload
+    _, version, codec = header.decode().split(":", 2)
+    if version != str(FORMAT_VERSION):
+        raise ValueError(f"Unsupported payload format version: {version}")
+    return _compressor(codec).decompress(body)
+
+
+def is_encoded(payload: str) -> bool:
+    """Whether a decrypted plaintext starts with a payload header"""
+    if not payload.startswith(HEADER_PREFIX):
+        return False
+    return _HEADER.fullmatch(payload.partition("\n")[0]) is not None
@@ -0,0 +1,95 @@
+# Python Modules
+from collections import OrderedDict
+from os import stat
+from os.path import abspath
+from threading import Lock
+from time import monotonic
+
+# A file is considered unchanged while all of these stat fields match
+FileIdentity = tuple[int, int, int, int]
+
+
+def file_identity(sops_path: str) -> FileIdentity | None:
+    """Stat fields that change whenever a file is rewritten, None if missing"""
+    try:
+        result = stat(sops_path)
+    except OSError:
+        return None
+    return (result.st_ino, result.st_size, result.st_mtime_ns, result.st_ctime_ns)
+
+
+class PlaintextCache:
+    """Process-wide LRU of decrypted file contents, keyed by file identity
+
+    Lets separate cache objects over the same unchanged file skip the Sops
+    subprocess. Entries are dropped when the file changes on disk, when they
+    outlive `ttl` seconds, or to stay within `max_bytes` (measured by length).
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: float | None = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries: OrderedDict[str, tuple[FileIdentity, float, str]] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, sops_path: str, identity: FileIdentity | None) -> str | None:
+        """Plaintext for a file, if stored while it had the same identity"""
+        if self.max_bytes <= 0 or identity is None:
+            return None
+        key = abspath(sops_path)
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                return None
+            stored_identity, stored_at, data = entry
+            expired = self.ttl is not None and monotonic() - stored_at > self.ttl
+            if stored_identity != identity or expired:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def put(self, sops_path: str, identity: FileIdentity | None, data: str) -> None:
+        """Remember the plaintext of a file as of the given identity"""
+        if identity is None or len(data) > self.max_bytes:
+            self.invalidate(sops_path)
+            return
+        key = abspath(sops_path)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (identity, monotonic(), data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, sops_path: str) -> None:
+        """Forget a file"""
+        with self._lock:
+            self._drop(abspath(sops_path))
+
+    def clear(self) -> None:
+        """Forget every file"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _drop(self, key: str) -> None:
+        """Remove an entry, the lock must be held"""
+        if (entry := self._entries.pop(key, None)) is not None:
+            self.size -= len(entry[2])
+
+
+PLAINTEXT_CACHE = PlaintextCache()
+
+
+def configure_plaintext_cache(
+    max_bytes: int | None = None, ttl: float | None = None
+) -> None:
+    """Adjust the process-wide cache; a `max_bytes` of 0 disables it"""
+    if max_bytes is not None:
+        PLAINTEXT_CACHE.max_bytes = max_bytes
+    PLAINTEXT_CACHE.ttl = ttl
+    PLAINTEXT_CACHE.clear()
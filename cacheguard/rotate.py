@@ -0,0 +1,166 @@
+# Python Modules
+from collections.abc import Callable, Iterable
+from json import dumps, loads
+from os import PathLike
+from pathlib import Path
+
+# Project Modules
+from cacheguard.atomic import atomic_write
+from cacheguard.bulk import DEFAULT_WORKERS
+from cacheguard.envelope import is_envelope, rotate_envelope
+from cacheguard.sops import get_recipients, rotate
+
+# Called as each file finishes with (finished, total, path, status)
+Progress = Callable[[int, int, Path, str], None]
+
+
+class RotationReport:
+    """Outcome of a bulk rotation, per file"""
+
+    __slots__ = ("rotated", "skipped", "failed")
+
+    def __init__(self) -> None:
+        self.rotated: list[Path] = []
+        self.skipped: list[Path] = []
+        self.failed: dict[Path, BaseException] = {}
+
+    def __repr__(self) -> str:
+        return (
+            f"RotationReport(rotated={len(self.rotated)}, "
+            f"skipped={len(self.skipped)}, failed={len(self.failed)})"
+        )
+
+    @property
+    def ok(self) -> bool:
+        """Whether every file was rotated or already up to date"""
+        return not self.failed
+
+
+def discover_sealed(directory: str | PathLike, recursive: bool = False) -> list[Path]:
+    """Every sops file in a directory, including segment and shard sidecars"""
+    root = Path(directory)
+    found = set(root.glob("**/*.sops" if recursive else "*.sops"))
+    if not recursive:
+        for sidecar in (*root.glob("*.sops.segments"), *root.glob("*.sops.shards")):
+            found.update(sidecar.glob("*.sops"))
+    return sorted(x for x in found if x.is_file())
+
+
+def _resolve(sources: str | PathLike | Iterable[str | PathLike], recursive: bool) -> list[Path]:
+    """Expand directories among the sources into the files inside them"""
+    if isinstance(sources, (str, PathLike)):
+        sources = [sources]
+    paths: list[Path] = []
+    for source in map(Path, sources):
+        paths += discover_sealed(source, recursive) if source.is_dir() else [source]
+    return paths
+
+
+class _State:
+    """Append-only record of finished files, so an interrupted run can resume"""
+
+    def __init__(self, state_file: str | PathLike | None, change: dict) -> None:
+        self.path = Path(state_file) if state_file else None
+        self.done: set[str] = set()
+        if self.path is None:
+            return
+
+        header = "# " + dumps(change, sort_keys=True)
+        if self.path.exists():
+            lines = self.path.read_text().splitlines()
+            if lines and lines[0] != header:
+                raise ValueError(f"State file {self.path} was written for a different rotation")
+            self.done.update(lines[1:])
+        else:
+            self.path.write_text(header + "\n")
+
+    def __contains__(self, sops_path: Path) -> bool:
+        return str(sops_path.resolve()) in self.done
+
+    def record(self, sops_path: Path) -> None:
+        """Mark a file as finished"""
+        if self.path is not None:
+            with open(self.path, "a") as f:
+                f.write(f"{sops_path.resolve()}\n")
+
+    def finish(self) -> None:
+        """Forget the state once every file is done"""
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+
+
+def rotate_many(
+    sources: str | PathLike | Iterable[str | PathLike],
+    add_age: list[str] = [],
+    remove_age: list[str] = [],
+    add_pgp: list[str] = [],
+    remove_pgp: list[str] = [],
+    max_workers: int = DEFAULT_WORKERS,
+    recursive: bool = False,
+    state_file: str | PathLike | None = None,
+    progress: Progress | None = None,
+) -> RotationReport:
+    """Rotate the data key of many sops files, optionally changing recipients
+
+    Sops does the work in `rotate` on a bounded thread pool and each result
+    replaces its file atomically. Envelope files are resealed in-process
+    under a new data key. Files that already have the requested
+    recipients are skipped. With `state_file`, finished files are recorded
+    so that rerunning an interrupted rotation picks up where it stopped; the
+    state is removed once every file succeeds.
+    """
+    change = {"add_age": add_age, "remove_age": remove_age, "add_pgp": add_pgp, "remove_pgp": remove_pgp}
+    changing = any(change.values())
+    state = _State(state_file, change)
+    paths = _resolve(sources, recursive)
+    report = RotationReport()
+
+    def rotate_file(sops_path: Path) -> str:
+        if sops_path in state:
+            return "skipped"
+        contents = sops_path.read_text()
+        envelope = is_envelope(contents)
+        # Envelopes carry their wrapped data key as a Sops document of its own
+        recipients = get_recipients(dumps(loads(contents)["key"]) if envelope else contents)
+        age = recipients.get("age_pubkeys", [])
+        pgp = recipients.get("pgp_fingerprints", [])
+        needed = {
+            "add_age": [x for x in add_age if x not in age],
+            "remove_age": [x for x in remove_age if x in age],
+            "add_pgp": [x for x in add_pgp if x not in pgp],
+            "remove_pgp": [x for x in remove_pgp if x in pgp],
+        }
+        if changing and not any(needed.values()):
+            return "skipped"  # Already has the requested recipients
+
+        if envelope:
+            atomic_write(sops_path, rotate_envelope(sops_path, **needed))
+            return "rotated"
+
+        # Structured Key Caches are JSON documents, everything else a binary blob
+        data_type = None if set(loads(contents)) == {"data", "sops"} else "json"
+        atomic_write(sops_path, rotate(str(sops_path), **needed, data_type=data_type))
+        return "rotated"
+
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(rotate_file, x): x for x in paths}
+        for finished, future in enumerate(as_completed(futures), 1):
+            sops_path = futures[future]
+            try:
+                status = future.result()
+            except Exception as error:
+                report.failed[sops_path] = error
+                status = "failed"
+            else:
+                (report.rotated if status == "rotated" else report.skipped).append(sops_path)
+                state.record(sops_path)
+            if progress is not None:
+                progress(finished, len(paths), sops_path, status)
+
+    report.rotated.sort()
+    report.skipped.sort()
+    if report.ok:
+        state.finish()
+    return report
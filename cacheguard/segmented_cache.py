@@ -0,0 +1,220 @@
+# Python Modules
+from collections.abc import Iterator
+from pathlib import Path
+
+# Project Modules
+from cacheguard.base_cache import BaseCache
+from cacheguard.key_cache import KeyCache
+from cacheguard.text_cache import TextCache
+from cacheguard.transactions import active_transaction
+
+
+class SegmentedTextCache(TextCache):
+    """Append-only edition of the Text Cache
+
+    Each save seals only the lines appended since the last one into a new,
+    independently encrypted segment. The file at `sops_path` is an encrypted
+    manifest listing the segments in order; the segments themselves live in
+    the `<sops_path>.segments` directory and are never rewritten, except by
+    `compact`.
+    """
+
+    __slots__ = ("segment_dir", "manifest", "_sealed_length")
+
+    def __init__(
+        self,
+        sops_path: str,
+        age_pubkeys: list[str] = [],
+        pgp_fingerprints: list[str] = [],
+        newline: str = "\n",
+        autoload: bool = True,
+        lazy: bool = False,
+        **kwargs,
+    ):
+        self.newline = newline
+        self.segment_dir = Path(f"{sops_path}.segments")
+        self.manifest = KeyCache(
+            sops_path,
+            age_pubkeys,
+            pgp_fingerprints,
+            autoload=autoload,
+            lazy=lazy,
+            envelope=kwargs.get("envelope", False),
+        )
+        self._sealed_length = 0  # Characters of the buffer already in segments
+        super().__init__(
+            sops_path,
+            age_pubkeys,
+            pgp_fingerprints,
+            newline,
+            autoload=autoload,
+            lazy=lazy,
+            **kwargs,
+        )
+
+    @property
+    def segments(self) -> list[str]:
+        """Segment file names, oldest first"""
+        return self.manifest.data.setdefault("segments", [])
+
+    @property
+    def is_dirty(self) -> bool:
+        """Whether there are appended lines not yet sealed in a segment"""
+        if self.read_only or not self.is_loaded:
+            return False
+        return self.buffer.tell() != self._sealed_length
+
+    def _segment(self, name: str) -> BaseCache:
+        """Handle on a single segment file"""
+        segment = BaseCache(
+            str(self.segment_dir / name),
+            self.age_pubkeys,
+            self.pgp_fingerprints,
+            autoload=False,
+            codec=self.codec,
+            envelope=self.envelope,
+        )
+        # Every segment seals with the session data key, so Sops wraps one per process
+        segment._envelope = self._envelope
+        return segment
+
+    def _adopt_envelope(self, segment: BaseCache) -> None:
+        """Keep the data key a segment wrapped or unwrapped for the next ones"""
+        if segment._envelope is not None:
+            self._envelope = self.manifest._envelope = segment._envelope
+
+    def _next_name(self) -> str:
+        """File name for the next segment to be written"""
+        last = int(self.segments[-1].split(".")[0]) if self.segments else 0
+        return f"{last + 1:06d}.segment.sops"
+
+    def _ingest(self, parts: list[str]) -> str:
+        """Rebuild the buffer from the decrypted segments"""
+        text = "".join(parts)
+        if text.endswith(self.newline):
+            text = text[: -len(self.newline)]
+        if not self.read_only:
+            self.data = text
+            self._sealed_length = self.buffer.tell()
+        return text
+
+    def _sealed_lines(self, sops_path: str | None = None) -> Iterator[str]:
+        """Stream every segment in manifest order"""
+        for name in self.segments:
+            yield from super()._sealed_lines(str(self.segment_dir / name))
+
+    def _pending(self) -> str:
+        """Lines appended since the last seal"""
+        with self._lock:
+            self.buffer.seek(self._sealed_length)
+            return self.buffer.read()
+
+    def _checkpoint(self):
+        """Callback restoring the segment list and sealed length as they are now
+
+        A save inside a transaction registers it, so a failed commit does not
+        leave the manifest listing a segment that was never written.
+        """
+        segments, sealed_length = list(self.segments), self._sealed_length
+
+        def rewind() -> None:
+            self.manifest.data["segments"] = segments
+            self._sealed_length = sealed_length
+
+        if (transaction := active_transaction()) is not None:
+            transaction.on_rollback(rewind)
+        return rewind
+
+    def load(self) -> str:
+        """Decrypt every segment listed in the manifest and join them"""
+        parts = []
+        for name in self.segments:
+            segment = self._segment(name)
+            parts.append(segment.load())
+            self._adopt_envelope(segment)
+        return self._ingest(parts)
+
+    async def aload(self) -> str:
+        """Async edition of `load`, decrypting the segments concurrently"""
+        from asyncio import gather
+
+        await self.manifest.aload()
+        segments = [self._segment(x) for x in self.segments]
+        parts = await gather(*(x.aload() for x in segments))
+        for segment in segments:
+            self._adopt_envelope(segment)
+        return self._ingest(parts)
+
+    def save(self, data_string=None) -> None:
+        """Seal the newly appended lines as a new segment
+
+        Passing `data_string` replaces the whole history with it instead.
+        """
+        if data_string is not None:
+            self.data = data_string
+            return self.compact()
+        if not self.is_loaded or not (pending := self._pending()):
+            return
+
+        name = self._next_name()
+        rewind = self._checkpoint()
+        try:
+            segment = self._segment(name)
+            segment.save(pending)
+            self._adopt_envelope(segment)
+            self.segments.append(name)
+            self._sealed_length += len(pending)
+            self.manifest.save()
+        except BaseException:
+            rewind()
+            raise
+
+    async def asave(self, data_string=None) -> None:
+        """Async edition of `save`"""
+        if data_string is not None:
+            self.data = data_string
+            return self.compact()
+        if not self.is_loaded or not (pending := self._pending()):
+            return
+
+        name = self._next_name()
+        rewind = self._checkpoint()
+        try:
+            segment = self._segment(name)
+            await segment.asave(pending)
+            self._adopt_envelope(segment)
+            self.segments.append(name)
+            self._sealed_length += len(pending)
+            await self.manifest.asave()
+        except BaseException:
+            rewind()
+            raise
+
+    def compact(self) -> None:
+        """Merge every segment, including unsealed lines, into a single one"""
+        old_segments = list(self.segments)
+        with self._lock:
+            contents = self.buffer.getvalue()
+
+        name = self._next_name()
+        rewind = self._checkpoint()
+        try:
+            segment = self._segment(name)
+            segment.save(contents)
+            self._adopt_envelope(segment)
+            self.manifest.data["segments"] = [name]
+            self._sealed_length = len(contents)
+            self.manifest.save()
+        except BaseException:
+            rewind()
+            raise
+
+        def drop_old() -> None:
+            for old in old_segments:
+                (self.segment_dir / old).unlink(missing_ok=True)
+
+        # Only drop the old segments once the manifest no longer points at them
+        if (transaction := active_transaction()) is not None:
+            transaction.on_commit(drop_old)
+        else:
+            drop_old()
@@ -0,0 +1,133 @@
+# Python Modules
+from hashlib import blake2b
+from os import environ
+from pathlib import Path
+from re import fullmatch
+
+# Project Modules
+from cacheguard.bulk import load_many, save_many
+from cacheguard.key_cache import KeyCache
+
+SHARD_PATTERN = r"(\d+)-of-(\d+)\.shard\.sops"
+DEFAULT_SHARDS = 16
+
+
+class ShardedKeyCache:
+    """Key-Value edition of the Cache, split across several encrypted shards
+
+    Keys are hashed into `shards` KeyCache files under `<sops_path>.shards`.
+    Shards are only decrypted when a key inside them is touched, and only the
+    shards that changed are re-encrypted on save. An existing store keeps the
+    shard count found on disk; a new one uses `shards`, or 16 if not given.
+    """
+
+    def __init__(
+        self,
+        sops_path: str,
+        age_pubkeys: list[str] = [],
+        pgp_fingerprints: list[str] = [],
+        shards: int | None = None,
+        codec: str | None = None,
+        envelope: bool = False,
+    ) -> None:
+        self.codec = codec
+        self.envelope = envelope
+        self.age_pubkeys = age_pubkeys
+        self.pgp_fingerprints = pgp_fingerprints
+        self.sops_path = sops_path
+        self.shard_dir = Path(f"{sops_path}.shards")
+        self.shard_count = self._existing_count() or shards or DEFAULT_SHARDS
+        if shards is not None and self.shard_count != shards:
+            raise ValueError(
+                f"Sharded Key Cache has {self.shard_count} shards on disk, not {shards}"
+            )
+        self._shards: dict[int, KeyCache] = {}
+
+    def _existing_count(self) -> int | None:
+        """Shard count recorded in the file names already on disk"""
+        if not self.shard_dir.is_dir():
+            return None
+        for found in self.shard_dir.iterdir():
+            if match := fullmatch(SHARD_PATTERN, found.name):
+                return int(match.group(2))
+        return None
+
+    def _shard_path(self, index: int) -> Path:
+        """Location of a shard file"""
+        return self.shard_dir / f"{index:03d}-of-{self.shard_count:03d}.shard.sops"
+
+    def shard_index(self, key: str) -> int:
+        """Stable shard assignment for a key"""
+        digest = blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest) % self.shard_count
+
+    def shard(self, index: int) -> KeyCache:
+        """Open a shard on first use"""
+        if (cache := self._shards.get(index)) is None:
+            cache = self._shards[index] = KeyCache(
+                str(self._shard_path(index)),
+                self.age_pubkeys,
+                self.pgp_fingerprints,
+                codec=self.codec,
+                envelope=self.envelope,
+            )
+        return cache
+
+    def _open_all(self) -> None:
+        """Decrypt every shard that is not open yet, in parallel"""
+        missing = [x for x in range(self.shard_count) if x not in self._shards]
+        opened = load_many(
+            [self._shard_path(x) for x in missing],
+            cache_class=KeyCache,
+            age_pubkeys=self.age_pubkeys,
+            pgp_fingerprints=self.pgp_fingerprints,
+            codec=self.codec,
+            envelope=self.envelope,
+        )
+        for index, cache in zip(missing, opened.values()):
+            self._shards[index] = cache  # type: ignore[assignment]
+
+    @property
+    def data(self) -> dict:
+        """Every key-value across all shards, decrypting any not yet open"""
+        self._open_all()
+        return {
+            key: value
+            for index in range(self.shard_count)
+            for key, value in self._shards[index].data.items()
+        }
+
+    @property
+    def is_dirty(self) -> bool:
+        """Whether any open shard has unsaved changes"""
+        return any(x.is_dirty for x in self._shards.values())
+
+    def get(self, key: str, default=None):
+        """Fetch a single value, decrypting only its shard"""
+        return self.shard(self.shard_index(key)).data.get(key, default)
+
+    def add(self, entry: dict) -> None:
+        """Add new entries, touching only the shards they hash into"""
+        grouped: dict[int, dict] = {}
+        for key, value in entry.items():
+            grouped.setdefault(self.shard_index(key), {})[key] = value
+        for index, part in grouped.items():
+            self.shard(index).add(part)
+
+    def save(self, *args, **kwargs) -> None:
+        """Re-encrypt only the shards that changed, in parallel"""
+        save_many(
+            cache
+            for cache in self._shards.values()
+            if cache.is_dirty and (cache.data or Path(cache.sops_path).exists())
+        )
+
+    def load_env_var(self, env_var) -> None:
+        """Load a key-value pair into the environment from the cache"""
+        if not (value := self.get(env_var)):
+            raise KeyError("Key does not exist in Key Cache")
+        environ[env_var] = value
+
+    def deploy(self) -> None:
+        """Load every key-value pair in this cache into the environment"""
+        environ.update(self.data)
@@ -0,0 +1,77 @@
+# Python Modules
+from os import getpid
+
+
+def _attach(name: str):
+    """Map an existing segment without taking over its cleanup"""
+    from multiprocessing.shared_memory import SharedMemory
+
+    return SharedMemory(name=name, track=False)
+
+
+class Snapshot:
+    """Plaintext of a cache, decrypted once and shared with worker processes
+
+    The publishing process copies the plaintext into shared memory with
+    `publish`; workers, forked or handed the snapshot through
+    multiprocessing, open caches on it with `from_snapshot` and never run
+    Sops. The segment is freed when the publisher calls `release`.
+    """
+
+    __slots__ = ("name", "sops_path", "size", "_memory", "_owner")
+
+    def __init__(self, name: str, sops_path: str, size: int, memory=None, owner: int | None = None):
+        self.name = name
+        self.sops_path = sops_path
+        self.size = size
+        self._memory = memory
+        self._owner = owner  # Process id of the publisher
+
+    @classmethod
+    def publish(cls, cache) -> "Snapshot":
+        """Copy the unsealed dataset of a cache into a new shared memory segment"""
+        from multiprocessing.shared_memory import SharedMemory
+
+        plaintext = cache._serialize()
+        if isinstance(plaintext, str):
+            plaintext = plaintext.encode()
+        memory = SharedMemory(create=True, size=max(len(plaintext), 1))
+        memory.buf[: len(plaintext)] = plaintext
+        return cls(memory.name, cache.sops_path, len(plaintext), memory, getpid())
+
+    def __repr__(self) -> str:
+        return f"Snapshot({self.name!r}, {self.sops_path!r}, size={self.size})"
+
+    def __reduce__(self):
+        # Other processes get a handle that attaches by name and owns nothing
+        return type(self), (self.name, self.sops_path, self.size)
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    @property
+    def is_owner(self) -> bool:
+        """Whether this process published the snapshot"""
+        return self._owner == getpid()
+
+    def view(self) -> memoryview:
+        """Read-only view of the plaintext, attaching to the segment if needed
+
+        Views must be released before `release` is called.
+        """
+        if self._memory is None:
+            self._memory = _attach(self.name)
+        with self._memory.buf[: self.size] as view:
+            return view.toreadonly()
+
+    def release(self) -> None:
+        """Detach from the segment, and free it if this process published it"""
+        if self._memory is None:
+            return
+        memory, self._memory = self._memory, None
+        memory.close()
+        if self.is_owner:
+            memory.unlink()
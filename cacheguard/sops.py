@@ -1,20 +1,355 @@
-from subprocess import run, CompletedProcess  # nosec B404
+from codecs import getincrementaldecoder
+from collections.abc import Iterator
+from os import environ
+from re import search
+from subprocess import run, CompletedProcess, PIPE, Popen, TimeoutExpired  # nosec B404
 from shutil import which
-from json import loads
+from json import dumps, loads
+from threading import Thread, Timer
+from time import perf_counter, sleep
+from weakref import WeakKeyDictionary
 
-# This entire module will not function without Sops in the path
-if not (SOPS_BINARY := which("sops")):
-    raise RuntimeError("Sops not detected, get it at https://getsops.io/")
+from cacheguard.errors import SopsError, SopsInterruptedError, SopsTimeoutError, sops_error
+from cacheguard.instrumentation import SopsEvent, record, span
 
+# Overrides the Sops binary found on the PATH
+SOPS_BINARY_VARIABLE = "CACHEGUARD_SOPS_BINARY"
 
-def sops_execute(command, input) -> CompletedProcess:
-    """Wrapper for Subprocess run with desired conditions"""
-    return run(command, input=input, capture_output=True, text=True, timeout=4)  # nosec B603
+# Resolved on first use rather than at import, see `get_sops_binary`
+_sops_binary: str | None = None
+_sops_version: tuple[int, ...] | None = None
 
+# First Sops release accepting `set --value-stdin`, which keeps values out of argv
+SET_VALUE_STDIN_VERSION = (3, 9, 0)
 
-def encrypt(data: str, age_pubkeys: list = [], pgp_fingerprints: list = []) -> str:
-    """Encrypt a string using Sops, via either AGE and/or PGP"""
-    sops_command = ["sops", "-e"]
+# Bytes read from the Sops pipe at a time when streaming
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Upper bound on Sops processes running at once from the async API
+MAX_CONCURRENT_SOPS = 8
+
+# Semaphores are bound to the loop they are first used in, so keep one per loop
+_semaphores: WeakKeyDictionary = WeakKeyDictionary()
+
+# Keyservice that Sops calls are routed through, see `cacheguard.keyservice`
+_keyservice = None
+
+MIB = 1024 * 1024
+
+# Failures worth retrying by default: Sops killed before it could finish
+TRANSIENT_ERRORS: tuple[type[SopsError], ...] = (SopsInterruptedError,)
+
+
+class ExecutionPolicy:
+    """How Sops processes are run: timeouts, retries and streaming
+
+    Each call may take `timeout` seconds plus `timeout_per_mib` for every
+    whole MiB of input, up to `max_timeout`. Failures of the types in
+    `retry_on` are retried `retries` times, waiting `backoff` seconds and then
+    `backoff_factor` times longer for each further attempt. Inputs of at least
+    `stream_threshold` bytes are piped through Sops in `chunk_size` pieces.
+
+    Only `TRANSIENT_ERRORS` are retried by default. Timeouts and key errors
+    usually mean a hung agent or a missing key, so retrying them is opt-in,
+    by adding `SopsTimeoutError` or `SopsKeyError` to `retry_on`.
+    """
+
+    __slots__ = (
+        "timeout",
+        "timeout_per_mib",
+        "max_timeout",
+        "retries",
+        "backoff",
+        "backoff_factor",
+        "retry_on",
+        "stream_threshold",
+        "chunk_size",
+    )
+
+    def __init__(
+        self,
+        timeout: float = 4.0,
+        timeout_per_mib: float = 2.0,
+        max_timeout: float | None = 300.0,
+        retries: int = 2,
+        backoff: float = 0.25,
+        backoff_factor: float = 2.0,
+        retry_on: tuple[type[SopsError], ...] = TRANSIENT_ERRORS,
+        stream_threshold: int = 4 * MIB,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> None:
+        self.timeout = timeout
+        self.timeout_per_mib = timeout_per_mib
+        self.max_timeout = max_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.retry_on = retry_on
+        self.stream_threshold = stream_threshold
+        self.chunk_size = chunk_size
+
+    def timeout_for(self, size: int) -> float:
+        """Seconds allowed for a call with `size` bytes of input"""
+        timeout = self.timeout + self.timeout_per_mib * (size // MIB)
+        return timeout if self.max_timeout is None else min(timeout, self.max_timeout)
+
+    def delays(self) -> Iterator[float]:
+        """Seconds to wait before each retry"""
+        for attempt in range(self.retries):
+            yield self.backoff * self.backoff_factor**attempt
+
+
+_policy = ExecutionPolicy()
+
+
+def get_execution_policy() -> ExecutionPolicy:
+    """The policy Sops calls use unless given their own"""
+    return _policy
+
+
+def set_execution_policy(policy: ExecutionPolicy | None = None) -> None:
+    """Replace the process-wide policy, or restore the default with None"""
+    global _policy
+    _policy = policy or ExecutionPolicy()
+
+
+def get_sops_binary() -> str:
+    """Locate Sops on first use, then reuse the answer
+
+    `set_sops_binary` or the `CACHEGUARD_SOPS_BINARY` environment variable
+    take priority over searching the PATH.
+    """
+    global _sops_binary
+    if _sops_binary is None:
+        if not (found := environ.get(SOPS_BINARY_VARIABLE) or which("sops")):
+            # Nothing in this module will function without Sops
+            raise RuntimeError("Sops not detected, get it at https://getsops.io/")
+        _sops_binary = found
+    return _sops_binary
+
+
+def set_sops_binary(binary: str | None) -> None:
+    """Use a specific Sops binary, or None to search again on next use"""
+    global _sops_binary, _sops_version
+    _sops_binary = binary
+    _sops_version = None
+
+
+def sops_version() -> tuple[int, ...]:
+    """Version of the Sops binary in use, probed once and then remembered"""
+    global _sops_version
+    if _sops_version is None:
+        output = run(  # nosec B603
+            [get_sops_binary(), "--version"],
+            capture_output=True,
+            text=True,
+            timeout=4,
+            env={**environ, "SOPS_DISABLE_VERSION_CHECK": "1"},
+        )
+        found = search(r"(\d+)\.(\d+)\.(\d+)", output.stdout)
+        _sops_version = tuple(int(x) for x in found.groups()) if found else ()
+    return _sops_version
+
+
+def __getattr__(name: str):
+    """Keep the old module constant working without an import-time PATH scan"""
+    if name == "SOPS_BINARY":
+        return get_sops_binary()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _run_streaming(command, input, timeout: float, chunk_size: int) -> CompletedProcess:
+    """Run Sops feeding stdin and draining stdout in chunks, for large payloads
+
+    Writes come from a view over the input rather than a copy, and stdout is
+    read into a single growing buffer instead of a list of pieces. That
+    buffer is returned as is, so callers decode it once or use it in place.
+    """
+    process = Popen(command, stdin=PIPE, stdout=PIPE, stderr=PIPE)  # nosec B603
+    timer = Timer(timeout, process.kill)
+    stderr: list[bytes] = []
+
+    def feed() -> None:
+        try:
+            with memoryview(input) as view:
+                for start in range(0, len(view), chunk_size):
+                    process.stdin.write(view[start : start + chunk_size])  # type: ignore[union-attr]
+        except BrokenPipeError:
+            pass  # Sops exited early, its exit code says why
+        finally:
+            process.stdin.close()  # type: ignore[union-attr]
+
+    threads = [
+        Thread(target=feed, daemon=True),
+        Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True),  # type: ignore[union-attr]
+    ]
+    timer.start()
+    try:
+        for thread in threads:
+            thread.start()
+        stdout = bytearray()
+        while chunk := process.stdout.read1(chunk_size):  # type: ignore[union-attr]
+            stdout += chunk
+        for thread in threads:
+            thread.join()
+        returncode = process.wait()
+    finally:
+        timed_out = not timer.is_alive() and process.returncode is not None and process.returncode < 0
+        timer.cancel()
+        process.stdout.close()  # type: ignore[union-attr]
+        process.stderr.close()  # type: ignore[union-attr]
+    if timed_out:
+        raise TimeoutExpired(command, timeout)
+    return CompletedProcess(command, returncode, stdout, b"".join(stderr))
+
+
+def use_keyservice(service) -> None:
+    """Route every Sops call through a keyservice, or stop routing with None"""
+    global _keyservice
+    _keyservice = service
+
+
+def get_keyservice():
+    """The keyservice Sops calls are routed through, if any"""
+    return _keyservice
+
+
+def _route(command: list[str]) -> list[str]:
+    """Add the keyservice flags after the Sops action, when one is in use"""
+    if _keyservice is None:
+        return command
+    return [*command[:2], *_keyservice.flags(), *command[2:]]
+
+
+def _attempt(command, input, operation: str, policy: ExecutionPolicy) -> CompletedProcess:
+    """Run Sops once, raising a typed error if it fails"""
+    command = _route(command)
+    text = isinstance(input, str)
+    timeout = policy.timeout_for(len(input))
+    with span(operation, subprocess=True) as event:
+        event.input_bytes = len(input)
+        try:
+            if len(input) >= policy.stream_threshold:
+                result = _run_streaming(
+                    command, input.encode() if text else input, timeout, policy.chunk_size
+                )
+                if text:
+                    result.stdout, result.stderr = result.stdout.decode(), result.stderr.decode()
+            else:
+                result = run(command, input=input, capture_output=True, text=text, timeout=timeout)  # nosec B603
+        except TimeoutExpired as error:
+            raise SopsTimeoutError(command, timeout) from error
+        event.exit_code = result.returncode
+        event.output_bytes = len(result.stdout)
+        if result.returncode != 0:
+            stderr = result.stderr if text else result.stderr.decode(errors="replace")
+            raise sops_error(f"Sops {operation} failed", command, result.returncode, stderr)
+    return result
+
+
+def sops_execute(
+    command, input, operation: str = "sops", policy: ExecutionPolicy | None = None
+) -> CompletedProcess:
+    """Wrapper for Subprocess run with desired conditions
+
+    String input gives string output; bytes-like input, such as a memoryview,
+    is written to the pipe as-is and gives bytes output, a bytearray when
+    streamed. A non-zero exit
+    raises a SopsError, after any retries the execution policy allows.
+    """
+    policy = policy or _policy
+    for delay in policy.delays():
+        try:
+            return _attempt(command, input, operation, policy)
+        except policy.retry_on:
+            sleep(delay)
+    return _attempt(command, input, operation, policy)
+
+
+def set_async_concurrency(limit: int) -> None:
+    """Set how many Sops processes the async API may run at once"""
+    global MAX_CONCURRENT_SOPS
+    if limit < 1:
+        raise ValueError("Concurrency limit must be at least 1")
+    MAX_CONCURRENT_SOPS = limit
+    _semaphores.clear()
+
+
+def _get_semaphore():
+    """Fetch the concurrency limiter for the running event loop"""
+    # asyncio is slow to import, so only pay for it when the async API is used
+    from asyncio import Semaphore, get_running_loop
+
+    loop = get_running_loop()
+    if (semaphore := _semaphores.get(loop)) is None:
+        semaphore = _semaphores[loop] = Semaphore(MAX_CONCURRENT_SOPS)
+    return semaphore
+
+
+async def _async_attempt(command, input, operation: str, policy: ExecutionPolicy) -> CompletedProcess:
+    """Run Sops once without blocking the event loop, raising a typed error if it fails"""
+    from asyncio import create_subprocess_exec, wait_for
+
+    command = _route(command)
+
+    text = isinstance(input, str)
+    timeout = policy.timeout_for(len(input))
+    async with _get_semaphore():
+        with span(operation, subprocess=True) as event:
+            event.input_bytes = len(input)
+            process = await create_subprocess_exec(
+                *command, stdin=PIPE, stdout=PIPE, stderr=PIPE
+            )
+            try:
+                stdout, stderr = await wait_for(
+                    process.communicate(input.encode() if text else input), timeout=timeout
+                )
+            except TimeoutError:
+                process.kill()
+                await process.wait()
+                raise SopsTimeoutError(command, timeout)
+            event.exit_code = process.returncode
+            event.output_bytes = len(stdout)
+            if process.returncode != 0:
+                raise sops_error(
+                    f"Sops {operation} failed", command, process.returncode, stderr.decode(errors="replace")
+                )
+
+    if text:
+        stdout, stderr = stdout.decode(), stderr.decode()
+    return CompletedProcess(command, process.returncode, stdout, stderr)
+
+
+async def async_sops_execute(
+    command, input, operation: str = "sops", policy: ExecutionPolicy | None = None
+) -> CompletedProcess:
+    """Asyncio counterpart of `sops_execute`, bounded by `MAX_CONCURRENT_SOPS`"""
+    from asyncio import sleep as async_sleep
+
+    policy = policy or _policy
+    for delay in policy.delays():
+        try:
+            return await _async_attempt(command, input, operation, policy)
+        except policy.retry_on:
+            await async_sleep(delay)
+    return await _async_attempt(command, input, operation, policy)
+
+
+def _type_flags(data_type: str | None) -> list[str]:
+    """Flags telling Sops how to parse and emit the plaintext, such as "json" """
+    return ["--input-type", data_type, "--output-type", data_type] if data_type else []
+
+
+def _index(key: str) -> str:
+    """Sops tree path for a top-level key"""
+    return f"[{dumps(key)}]"
+
+
+def _encrypt_command(
+    age_pubkeys: list, pgp_fingerprints: list, data_type: str | None = None
+) -> list[str]:
+    """Build the Sops encryption command for the given recipients"""
+    sops_command = [get_sops_binary(), "-e"]
 
     # flatten the list into a string, then add it to the commands
     args_dict = {
@@ -27,21 +362,165 @@ def encrypt(data: str, age_pubkeys: list = [], pgp_fingerprints: list = []) -> s
             continue
         sops_command += [key, ",".join(value)]
 
-    sops_command += ["/dev/stdin"]
+    sops_command += [*_type_flags(data_type), "/dev/stdin"]
+    return sops_command
+
 
-    encrypted_data = sops_execute(sops_command, input=data)
+def encrypt(
+    data: str,
+    age_pubkeys: list = [],
+    pgp_fingerprints: list = [],
+    data_type: str | None = None,
+) -> str:
+    """Encrypt a string using Sops, via either AGE and/or PGP"""
+    sops_command = _encrypt_command(age_pubkeys, pgp_fingerprints, data_type)
+    encrypted_data = sops_execute(sops_command, input=data, operation="encrypt")
+    return encrypted_data.stdout
+
+
+async def aencrypt(
+    data: str,
+    age_pubkeys: list = [],
+    pgp_fingerprints: list = [],
+    data_type: str | None = None,
+) -> str:
+    """Encrypt a string using Sops without blocking the event loop"""
+    sops_command = _encrypt_command(age_pubkeys, pgp_fingerprints, data_type)
+    encrypted_data = await async_sops_execute(sops_command, input=data, operation="encrypt")
     return encrypted_data.stdout
 
 
-def decrypt(data) -> str:
+def encrypt_bytes(
+    data: bytes | memoryview, age_pubkeys: list = [], pgp_fingerprints: list = []
+) -> bytes:
+    """Encrypt binary data using Sops, without any text decoding"""
+    sops_command = _encrypt_command(age_pubkeys, pgp_fingerprints)
+    return sops_execute(sops_command, input=data, operation="encrypt").stdout
+
+
+async def aencrypt_bytes(
+    data: bytes | memoryview, age_pubkeys: list = [], pgp_fingerprints: list = []
+) -> bytes:
+    """Encrypt binary data using Sops without blocking the event loop"""
+    sops_command = _encrypt_command(age_pubkeys, pgp_fingerprints)
+    encrypted_data = await async_sops_execute(sops_command, input=data, operation="encrypt")
+    return encrypted_data.stdout
+
+
+def decrypt_bytes(data: bytes | memoryview) -> bytes:
+    """Decrypt a sops structure into the original binary data"""
+    command = [get_sops_binary(), "decrypt"]
+    return sops_execute(command, input=data, operation="decrypt").stdout
+
+
+async def adecrypt_bytes(data: bytes | memoryview) -> bytes:
+    """Decrypt a sops structure into binary data without blocking the event loop"""
+    command = [get_sops_binary(), "decrypt"]
+    output = await async_sops_execute(command, input=data, operation="decrypt")
+    return output.stdout
+
+
+def decrypt(data, data_type: str | None = None) -> str:
     """Simple decryption of an encrypted sops structure"""
-    command = [SOPS_BINARY, "decrypt"]
-    output = sops_execute(command, input=data)
+    command = [get_sops_binary(), "decrypt", *_type_flags(data_type)]
+    output = sops_execute(command, input=data, operation="decrypt")
+    return output.stdout
 
-    # WIP: Exit code and error handling
+
+async def adecrypt(data, data_type: str | None = None) -> str:
+    """Decrypt a sops structure without blocking the event loop"""
+    command = [get_sops_binary(), "decrypt", *_type_flags(data_type)]
+    output = await async_sops_execute(command, input=data, operation="decrypt")
     return output.stdout
 
 
+def extract(sops_path: str, key: str) -> str:
+    """Decrypt one top-level value of a JSON sops file, leaving the rest sealed
+
+    Strings come back as-is, any other value as JSON.
+    """
+    command = [get_sops_binary(), "decrypt", *_type_flags("json"), "--extract", _index(key), sops_path]
+    try:
+        return sops_execute(command, input="", operation="extract").stdout
+    except SopsError as error:
+        if "not found" in error.stderr:
+            raise KeyError(key) from error
+        raise
+
+
+def set_value(sops_path: str, key: str, value) -> None:
+    """Encrypt one top-level value into a JSON sops file in place
+
+    The value is passed on stdin, which needs Sops 3.9 or newer.
+    """
+    command = [get_sops_binary(), "set", *_type_flags("json"), "--value-stdin", sops_path, _index(key)]
+    sops_execute(command, input=dumps(value), operation="set")
+
+
+def rotate(
+    sops_path: str,
+    add_age: list = [],
+    remove_age: list = [],
+    add_pgp: list = [],
+    remove_pgp: list = [],
+    data_type: str | None = None,
+) -> str:
+    """Re-encrypt a sops file under a new data key, optionally changing recipients
+
+    Returns the rotated document, leaving the file itself untouched.
+    """
+    command = [get_sops_binary(), "rotate", *_type_flags(data_type)]
+    flags = {"--add-age": add_age, "--rm-age": remove_age, "--add-pgp": add_pgp, "--rm-pgp": remove_pgp}
+    for flag, value in flags.items():
+        if value:
+            command += [flag, ",".join(value)]
+    return sops_execute([*command, sops_path], input="", operation="rotate").stdout
+
+
+def decrypt_lines(sops_path: str, newline: str = "\n") -> Iterator[str]:
+    """Stream the lines of a sops file as Sops decrypts it
+
+    Reads the Sops stdout pipe in chunks, so the whole plaintext is never held
+    in memory at once. Stopping early terminates the Sops process.
+    """
+    command = _route([get_sops_binary(), "decrypt", sops_path])
+    # Timed by hand, a context variable cannot be held open across yields
+    event = SopsEvent("decrypt", sops_path, subprocess=True)
+    started = perf_counter()
+    process = Popen(command, stdout=PIPE, stderr=PIPE)  # nosec B603
+    # Drained alongside stdout, so a chatty Sops cannot fill the pipe and stall
+    stderr: list[bytes] = []
+    drain = Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)  # type: ignore[union-attr]
+    drain.start()
+    decoder = getincrementaldecoder("utf-8")()
+    pending = ""
+    try:
+        while chunk := process.stdout.read1(STREAM_CHUNK_SIZE):  # type: ignore[union-attr]
+            event.output_bytes += len(chunk)
+            *lines, pending = (pending + decoder.decode(chunk)).split(newline)
+            yield from lines
+        if pending := pending + decoder.decode(b"", final=True):
+            yield pending
+
+        event.exit_code = process.wait()
+        if event.exit_code != 0:
+            drain.join()
+            message = b"".join(stderr).decode(errors="replace")
+            raise sops_error(f"Sops failed to decrypt {sops_path}", command, event.exit_code, message)
+    except BaseException as error:
+        event.error = error
+        raise
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        drain.join()
+        process.stdout.close()  # type: ignore[union-attr]
+        process.stderr.close()  # type: ignore[union-attr]
+        event.wall_time = perf_counter() - started
+        record(event)
+
+
 def get_recipients(sops_data: str) -> dict[str, list]:
     """Parse a sops structure for the recipients"""
     sops_dict = loads(sops_data)
@@ -50,7 +529,7 @@ def get_recipients(sops_data: str) -> dict[str, list]:
 
     def get_keys(key_type: str, lookup: str):
         """Closure to get the keys of a certain types"""
-        return [x.get(lookup) for x in sops_dict["sops"].get(key_type)]
+        return [x.get(lookup) for x in sops_dict["sops"].get(key_type) or []]
 
     key_dict = {
         "age_pubkeys": ("age", "recipient"),
@@ -60,7 +539,7 @@ def get_recipients(sops_data: str) -> dict[str, list]:
     for key, value in key_dict.items():
         recipients = get_keys(*value)
 
-        if recipients[0] is None:
+        if not recipients or recipients[0] is None:
             continue
 
         output[key] = recipients
@@ -1,12 +1,46 @@
 # Python Modules
-from io import StringIO
+from collections import deque
+from collections.abc import Iterator
+from datetime import datetime
+from io import StringIO, UnsupportedOperation
+from os import path
+from threading import RLock
 
 # Project Modules
 from cacheguard.base_cache import BaseCache
+from cacheguard.envelope import is_envelope
+from cacheguard.payload import decode_payload, is_encoded
+from cacheguard.plaintext_cache import PLAINTEXT_CACHE, file_identity
+from cacheguard.sops import decrypt_lines
+from cacheguard.text_index import TextIndex, TimestampParser, line_offsets
+
+
+def split_lines(text: str, newline: str) -> Iterator[str]:
+    """Lazily split text into lines without building a list"""
+    start = 0
+    while (end := text.find(newline, start)) != -1:
+        yield text[start:end]
+        start = end + len(newline)
+    if start < len(text):
+        yield text[start:]
 
 
 class TextCache(BaseCache):
-    """Plain-text edition of the cache"""
+    """Plain-text edition of the cache
+
+    With `read_only=True` the cache is lazy and never builds the append
+    buffer; use `iter_lines` and `tail` to stream the sealed text instead.
+
+    `find`, `since` and `between` are answered from a TextIndex, built on
+    first use (or at load with `indexed=True`) and kept current by `append`.
+    Timestamps are read from the start of each line by `timestamp_parser`,
+    ISO 8601 by default.
+
+    Once unsealed, a writable cache keeps its text only in the append buffer,
+    which `data` reads from.
+    """
+
+    __slots__ = ("read_only", "indexed", "timestamp_parser", "newline", "_index", "_lock", "_buffer")
 
     def __init__(
         self,
@@ -14,28 +48,211 @@ class TextCache(BaseCache):
         age_pubkeys: list[str] = [],
         pgp_fingerprints: list[str] = [],
         newline: str = "\n",
+        read_only: bool = False,
+        indexed: bool = False,
+        timestamp_parser: TimestampParser | None = None,
+        **kwargs,
     ):
-        super().__init__(sops_path, age_pubkeys, pgp_fingerprints)
-        self.buffer = StringIO()
+        self.read_only = read_only
+        self.indexed = indexed
+        self.timestamp_parser = timestamp_parser
+        self._index: TextIndex | None = None
+        self._lock = RLock()  # Keeps appends and save snapshots from interleaving
+        self._buffer: StringIO | None = None
         self.newline = newline
+        if read_only:
+            kwargs["lazy"] = True
+        super().__init__(sops_path, age_pubkeys, pgp_fingerprints, **kwargs)
 
-        # Add the existing data
-        if self.data:
-            for line in self.data.split(newline):
-                self.append(line)
+        # Start empty when there was nothing to load
+        if self.is_loaded and not read_only and self._buffer is None:
+            self.buffer = StringIO()
+
+    @property
+    def data(self) -> str:
+        """The unsealed text, unsaved appends included once loaded for writing"""
+        if self.read_only or self._pending_load:
+            return BaseCache.data.fget(self)  # type: ignore[attr-defined]
+        return self._serialize()
+
+    @data.setter
+    def data(self, value: str) -> None:
+        self._pending_load = False
+        if self.read_only:
+            self._data = value
+        else:
+            # The buffer becomes the only copy of the text
+            self._data = ""
+            self.buffer = StringIO()
+            self._extend(value)
+
+    @property
+    def buffer(self) -> StringIO:
+        """Appendable text, unsealed on first access for lazy caches"""
+        if self.read_only:
+            raise UnsupportedOperation("Text Cache was opened read-only")
+        if self._pending_load:
+            self._ensure_loaded()
+        return self._buffer
+
+    @buffer.setter
+    def buffer(self, value: StringIO) -> None:
+        self._buffer = value
+        # A fresh buffer is indexed as it is filled, anything else on next use
+        empty = self.indexed and not value.tell() and not value.getvalue()
+        self._index = TextIndex(self.timestamp_parser) if empty else None
 
     def load(self) -> str:
         """Handle the plain text version of the cache"""
         data = super().load()
-        self.buffer = StringIO(data)
+        if not self.read_only:
+            self.buffer = StringIO(data)
+            self._mark_clean(self._serialize())
         return data
 
     def save(self, data_string=None) -> None:
         """Write the dataset to the encrypted at-rest state"""
         if data_string is None:
-            data_string = self.buffer.getvalue().strip()
+            if not self.is_loaded:
+                return  # Never unsealed, so there is nothing new to write
+            with self._lock:
+                data_string = self._serialize()
         super().save(data_string)
 
+    async def aload(self) -> str:
+        """Async edition of `load`, leaving the buffer ready for appends"""
+        data = await super().aload()
+        if not self.read_only:
+            self.data = data
+            self._mark_clean(self._serialize())
+        return data
+
+    async def asave(self, data_string=None) -> None:
+        """Async edition of `save`"""
+        if data_string is None:
+            if not self.is_loaded:
+                return
+            with self._lock:
+                data_string = self._serialize()
+        await super().asave(data_string)
+
+    def _merge(self, data_string: str, sealed: str) -> str:
+        """Add the lines appended here after another writer's lines"""
+        base = self._base or ""
+        with self._lock:
+            current = self._serialize()
+            pending = current[len(base) :] if current.startswith(base) else current
+            self.data = self.newline.join(x for x in (sealed, pending.lstrip(self.newline)) if x)
+            return self._serialize()
+
+    def _serialize(self) -> str:
+        """Text form of the buffer, as it would be saved"""
+        if self.read_only:
+            return self.data
+        return self.buffer.getvalue().strip()
+
     def append(self, string: str) -> None:
         """Simple method to add more string content"""
-        self.buffer.write(string + self.newline)
+        with self._lock:
+            offset = self.buffer.tell()
+            self.buffer.write(string + self.newline)
+            if self._index is not None:
+                for start, line in line_offsets(string, self.newline):
+                    self._index.add(line, offset + start)
+
+    @property
+    def index(self) -> TextIndex:
+        """Index over the unsealed lines, built on first use"""
+        with self._lock:
+            if self._index is None:
+                index = TextIndex(self.timestamp_parser)
+                for start, line in line_offsets(self._text(), self.newline):
+                    index.add(line, start)
+                self._index = index
+            return self._index
+
+    def find(self, text: str) -> list[str]:
+        """Lines containing every word of `text`, ignoring case"""
+        with self._lock:
+            return self._lines(self.index.find(text))
+
+    def since(self, timestamp: datetime) -> list[str]:
+        """Lines timestamped at or after `timestamp`"""
+        return self.between(timestamp, None)
+
+    def between(self, start: datetime | None, end: datetime | None) -> list[str]:
+        """Lines timestamped from `start` to `end` inclusive, either end open when None"""
+        with self._lock:
+            return self._lines(self.index.between(start, end))
+
+    def _text(self) -> str:
+        """The unsealed text the index offsets refer to"""
+        return self.data if self.read_only else self.buffer.getvalue()
+
+    def _lines(self, numbers: list[int]) -> list[str]:
+        """Slice indexed lines out of the text by their offsets"""
+        if self.read_only:
+            text = self.data
+            return [text[slice(*self._index.span(x))] for x in numbers]  # type: ignore[union-attr]
+
+        # Read each line in place, then put the position back for appends
+        buffer = self.buffer
+        position = buffer.tell()
+        lines = []
+        for number in numbers:
+            start, end = self._index.span(number)  # type: ignore[union-attr]
+            buffer.seek(start)
+            lines.append(buffer.read(end - start))
+        buffer.seek(position)
+        return lines
+
+    def iter_lines(self) -> Iterator[str]:
+        """Iterate over the lines of the cache
+
+        Once unsealed this walks the text in memory, unsaved appends included.
+        Otherwise the sealed file is streamed from Sops line by line.
+        """
+        if self.is_loaded:
+            text = self.data if self.read_only else self._serialize()
+            yield from split_lines(text, self.newline)
+        else:
+            yield from self._sealed_lines()
+
+    def tail(self, count: int) -> list[str]:
+        """The last `count` lines, holding no more than that many in memory"""
+        return list(deque(self.iter_lines(), maxlen=count)) if count > 0 else []
+
+    def _sealed_lines(self, sops_path: str | None = None) -> Iterator[str]:
+        """Stream the lines of a sealed file, reusing known plaintext if unchanged"""
+        sops_path = sops_path or self.sops_path
+        if not path.exists(sops_path):
+            return
+        if (data := PLAINTEXT_CACHE.get(sops_path, file_identity(sops_path))) is not None:
+            yield from split_lines(data, self.newline)
+        elif self._is_envelope_file(sops_path):
+            # Envelopes are decrypted in-process, there is no Sops pipe to stream
+            with open(sops_path) as f:
+                yield from split_lines(self._unseal(f.read()), self.newline)
+        else:
+            lines = decrypt_lines(sops_path, self.newline)
+            if (first := next(lines, None)) is None:
+                return
+            if is_encoded(first):
+                # A compressed payload has to be decoded whole before splitting
+                data = decode_payload(self.newline.join([first, *lines]))
+                yield from split_lines(data, self.newline)
+            else:
+                yield first
+                yield from lines
+
+    @staticmethod
+    def _is_envelope_file(sops_path: str) -> bool:
+        """Whether a sealed file uses the envelope layout"""
+        with open(sops_path, "rb") as f:
+            return is_envelope(f.read(64))
+
+    def _extend(self, data: str) -> None:
+        """Append each line of previously sealed content"""
+        if data:
+            for line in data.split(self.newline):
+                self.append(line)
@@ -0,0 +1,107 @@
+# Python Modules
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterator
+from datetime import UTC, datetime
+from re import compile
+
+# Words as the inverted index sees them
+_TOKEN = compile(r"\w+")
+
+# Extended ISO 8601 date, so that bare numbers such as "20240101" are not read as one
+_ISO_DATE = compile(r"\d{4}-\d{2}-\d{2}")
+
+TimestampParser = Callable[[str], datetime | None]
+
+
+def parse_timestamp(line: str) -> datetime | None:
+    """Read an ISO 8601 timestamp from the start of a line, if there is one"""
+    head = line.split(maxsplit=1)[0] if line and not line[0].isspace() else ""
+    if not _ISO_DATE.match(head):
+        return None
+    try:
+        return datetime.fromisoformat(head)
+    except ValueError:
+        return None
+
+
+def as_utc(timestamp: datetime) -> datetime:
+    """Comparable form of a timestamp, reading naive ones as UTC"""
+    return timestamp.replace(tzinfo=UTC) if timestamp.tzinfo is None else timestamp
+
+
+def tokenize(text: str) -> set[str]:
+    """Case-insensitive words in a line or query"""
+    return set(_TOKEN.findall(text.lower()))
+
+
+def line_offsets(text: str, newline: str) -> Iterator[tuple[int, str]]:
+    """Each line of the text with the offset it starts at"""
+    start = 0
+    while (end := text.find(newline, start)) != -1:
+        yield start, text[start:end]
+        start = end + len(newline)
+    if start < len(text):
+        yield start, text[start:]
+
+
+class TextIndex:
+    """In-memory index over the lines of a Text Cache
+
+    Lines are numbered in order and recorded by their offset and length in the
+    text, so they can be sliced out again without scanning. Alongside that are
+    a token to line inverted index and the lines sorted by timestamp.
+    Timestamps without a timezone, in the log or in queries, are read as UTC.
+    """
+
+    def __init__(self, timestamp_parser: TimestampParser | None = None) -> None:
+        self.parse_timestamp = timestamp_parser or parse_timestamp
+        self.offsets = array("Q")
+        self.lengths = array("Q")
+        self.postings: dict[str, list[int]] = {}
+        self._times: list[datetime] = []  # Sorted, parallel to `_timed_lines`
+        self._timed_lines: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def add(self, line: str, offset: int) -> int:
+        """Index a line starting at `offset` in the text, returning its number"""
+        number = len(self.offsets)
+        self.offsets.append(offset)
+        self.lengths.append(len(line))
+        for token in tokenize(line):
+            self.postings.setdefault(token, []).append(number)
+
+        if (timestamp := self.parse_timestamp(line)) is not None:
+            timestamp = as_utc(timestamp)
+            if not self._times or timestamp >= self._times[-1]:
+                # Logs are written in time order, so this is the usual case
+                self._times.append(timestamp)
+                self._timed_lines.append(number)
+            else:
+                position = bisect_right(self._times, timestamp)
+                self._times.insert(position, timestamp)
+                self._timed_lines.insert(position, number)
+        return number
+
+    def span(self, number: int) -> tuple[int, int]:
+        """Start and end offsets of a line"""
+        return self.offsets[number], self.offsets[number] + self.lengths[number]
+
+    def find(self, text: str) -> list[int]:
+        """Numbers of the lines containing every word of `text`, in order"""
+        if not (tokens := tokenize(text)):
+            return []
+        postings = sorted((self.postings.get(x, []) for x in tokens), key=len)
+        found = set(postings[0])
+        for numbers in postings[1:]:
+            found.intersection_update(numbers)
+        return sorted(found)
+
+    def between(self, start: datetime | None = None, end: datetime | None = None) -> list[int]:
+        """Numbers of the lines timestamped from `start` to `end` inclusive, in order"""
+        low = 0 if start is None else bisect_left(self._times, as_utc(start))
+        high = len(self._times) if end is None else bisect_right(self._times, as_utc(end))
+        return sorted(self._timed_lines[low:high])
+
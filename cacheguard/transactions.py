@@ -0,0 +1,139 @@
+# Python Modules
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from os import replace
+from pathlib import Path
+from threading import Lock
+
+# Project Modules
+from cacheguard.atomic import file_lock, fsync_directory, write_temporary
+
+# The transaction that cache writes in this context are staged into
+_active: ContextVar["Transaction | None"] = ContextVar("cacheguard_transaction", default=None)
+
+
+def active_transaction() -> "Transaction | None":
+    """The transaction collecting writes in the current context, if any"""
+    return _active.get()
+
+
+class Transaction:
+    """Saves of several caches that land on disk together or not at all
+
+    While a commit runs, each cache write goes to a flushed temporary file
+    beside its target. Once every cache is sealed the files are renamed into
+    place, so a failure before then leaves every original untouched.
+
+    Multi-writer caches keep their file lock from the merge until the rename,
+    so no other writer can slip in between.
+    """
+
+    __slots__ = ("caches", "max_workers", "_staged", "_undo", "_after", "_locks", "_locked", "_lock")
+
+    def __init__(self, caches=(), max_workers: int | None = None) -> None:
+        self.caches = list(caches)
+        self.max_workers = max_workers
+        self._staged: dict[str, tuple[Path, object, str | bytes]] = {}
+        self._undo: list[Callable[[], None]] = []
+        self._after: list[Callable[[], None]] = []
+        self._locks = ExitStack()
+        self._locked: set[str] = set()
+        self._lock = Lock()
+
+    def add(self, *caches) -> None:
+        """Include more caches in the commit"""
+        self.caches.extend(caches)
+
+    def stage(self, cache, encrypted_data: str | bytes, data_string: str | bytes) -> None:
+        """Hold a sealed write until commit, called from `BaseCache._write`"""
+        temporary = write_temporary(cache.sops_path, encrypted_data)
+        with self._lock:
+            if (previous := self._staged.get(cache.sops_path)) is not None:
+                previous[0].unlink(missing_ok=True)  # A later write to the same file wins
+            self._staged[cache.sops_path] = (temporary, cache, data_string)
+
+    def hold_lock(self, sops_path: str) -> None:
+        """Take the lock of a multi-writer file until the commit finishes"""
+        with self._lock:
+            if sops_path not in self._locked:
+                self._locks.enter_context(file_lock(sops_path))
+                self._locked.add(sops_path)
+
+    def _release_locks(self) -> None:
+        with self._lock:
+            self._locks.close()
+            self._locked.clear()
+
+    def on_rollback(self, callback: Callable[[], None]) -> None:
+        """Run a callback if the commit fails, to undo in-memory bookkeeping"""
+        with self._lock:
+            self._undo.append(callback)
+
+    def on_commit(self, callback: Callable[[], None]) -> None:
+        """Run a callback once the commit has moved every file into place"""
+        with self._lock:
+            self._after.append(callback)
+
+    def commit(self) -> None:
+        """Seal every cache in parallel, then move all the results into place"""
+        # Imported here to keep `concurrent.futures` out of `import cacheguard`
+        from concurrent.futures import ThreadPoolExecutor
+        from contextvars import copy_context
+
+        from cacheguard.bulk import DEFAULT_WORKERS
+
+        token = _active.set(self)
+        try:
+            # Locks are taken in path order, so two transactions cannot deadlock
+            shared = {x.sops_path for x in self.caches if getattr(x, "multi_writer", False)}
+            for sops_path in sorted(shared):
+                self.hold_lock(sops_path)
+            with ThreadPoolExecutor(max_workers=self.max_workers or DEFAULT_WORKERS) as pool:
+                # Each task carries this context, so its writes are staged here
+                futures = [pool.submit(copy_context().run, x.save) for x in self.caches]
+            for future in futures:
+                future.result()
+        except BaseException:
+            self.rollback()
+            raise
+        finally:
+            _active.reset(token)
+
+        try:
+            for sops_path, (temporary, _, _) in self._staged.items():
+                replace(temporary, sops_path)
+            for directory in {Path(x).parent for x in self._staged}:
+                fsync_directory(directory)
+        finally:
+            self._release_locks()
+
+        for _, cache, data_string in self._staged.values():
+            cache._committed(data_string)
+        self._staged.clear()
+        self._undo.clear()
+        while self._after:
+            self._after.pop(0)()
+
+    def rollback(self) -> None:
+        """Discard every staged write and undo the bookkeeping that went with it"""
+        for temporary, _, _ in self._staged.values():
+            temporary.unlink(missing_ok=True)
+        self._staged.clear()
+        self._release_locks()
+        self._after.clear()
+        while self._undo:
+            self._undo.pop()()
+
+
+@contextmanager
+def transaction(*caches, max_workers: int | None = None) -> Iterator[Transaction]:
+    """Save caches together when the block exits without an error
+
+    Unchanged caches are skipped, the rest encrypt concurrently so the commit
+    takes about as long as the slowest one. Nothing is written if the block
+    raises or any cache fails to seal.
+    """
+    pending = Transaction(caches, max_workers)
+    yield pending
+    pending.commit()
@@ -0,0 +1,115 @@
+# Python Modules
+from atexit import register, unregister
+from threading import Event, Lock, Thread
+
+# Project Modules
+from cacheguard.text_cache import TextCache
+
+
+class WriteBehind:
+    """Background flushing for a Text Cache
+
+    `append` stays an in-memory write while a daemon thread coalesces the
+    appends and saves them every `interval` seconds, or sooner once
+    `max_lines` lines or `max_bytes` characters are waiting. A final flush
+    happens on `close`, when leaving the context manager, or at exit.
+
+    Lines appended straight to the cache are sealed too; only the thresholds
+    depend on appends made through this wrapper.
+    """
+
+    def __init__(
+        self,
+        cache: TextCache,
+        interval: float = 5.0,
+        max_lines: int | None = None,
+        max_bytes: int | None = None,
+    ) -> None:
+        self.cache = cache
+        self.interval = interval
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+
+        self.pending_lines = 0
+        self.pending_bytes = 0
+        self._error: BaseException | None = None
+        self._counter_lock = Lock()
+        self._flush_lock = Lock()  # One save at a time
+        self._wake = Event()
+        self._closed = Event()
+
+        self._thread = Thread(target=self._run, name="cacheguard-write-behind", daemon=True)
+        self._thread.start()
+        register(self.close)
+
+    def __enter__(self) -> "WriteBehind":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def append(self, string: str) -> None:
+        """Add a line to the cache, to be sealed by the background thread"""
+        self._raise_error()
+        if self._closed.is_set():
+            raise RuntimeError("Write-behind has been closed")
+
+        self.cache.append(string)
+        with self._counter_lock:
+            self.pending_lines += 1
+            self.pending_bytes += len(string) + len(self.cache.newline)
+            over_lines = self.max_lines is not None and self.pending_lines >= self.max_lines
+            over_bytes = self.max_bytes is not None and self.pending_bytes >= self.max_bytes
+        if over_lines or over_bytes:
+            self._wake.set()
+
+    def flush(self) -> None:
+        """Seal everything appended so far, in the calling thread"""
+        with self._flush_lock:
+            with self._counter_lock:
+                lines, size = self.pending_lines, self.pending_bytes
+                self.pending_lines = self.pending_bytes = 0
+            if not lines and not self._cache_changed():
+                return
+            try:
+                self.cache.save()
+            except BaseException:
+                # The lines are still in the buffer, so retry them next time
+                with self._counter_lock:
+                    self.pending_lines += lines
+                    self.pending_bytes += size
+                raise
+        self._raise_error()
+
+    def _cache_changed(self) -> bool:
+        """Whether the cache holds lines not yet sealed, however they were appended"""
+        # A new cache nothing was written to counts as dirty, but has nothing to save
+        return self.cache.buffer.tell() > 0 and self.cache.is_dirty
+
+    def close(self) -> None:
+        """Stop the background thread and do the final flush"""
+        if not self._closed.is_set():
+            self._closed.set()
+            self._wake.set()
+        self._thread.join()
+        unregister(self.close)
+        self.flush()
+
+    def _run(self) -> None:
+        """Background loop flushing on the interval or when woken by a threshold"""
+        while not self._closed.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._closed.is_set():
+                break
+            try:
+                self.flush()
+            except BaseException as error:
+                # Surface the failure to the caller on its next append or flush
+                self._error = error
+
+    def _raise_error(self) -> None:
+        """Re-raise a failure from the background thread"""
+        if (error := self._error) is not None:
+            self._error = None
+            raise error
@@ -0,0 +1,73 @@
+"""
+Shared fixtures for the test suite
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from cacheguard.plaintext_cache import PLAINTEXT_CACHE
+from cacheguard.sops import set_sops_binary
+
+
+@pytest.fixture(autouse=True)
+def isolated_plaintext_cache():
+    """Keep decrypted contents from leaking between tests"""
+    PLAINTEXT_CACHE.clear()
+    yield
+    PLAINTEXT_CACHE.clear()
+
+
+@pytest.fixture(autouse=True)
+def sops_binary():
+    """Resolve `sops` through the PATH at call time, so tests never need it installed"""
+    set_sops_binary("sops")
+    yield
+    set_sops_binary("sops")
+
+
+@pytest.fixture
+def fake_sops_binary(tmp_path):
+    """Point cacheguard at the benchmark Sops stand-in, for end-to-end tests"""
+    fake_sops = Path(__file__).resolve().parent.parent / "benchmarks" / "fake_sops.py"
+    shim = tmp_path / "sops"
+    shim.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{fake_sops}" "$@"\n')
+    shim.chmod(0o755)
+    set_sops_binary(str(shim))
+    return str(shim)
+
+
+def fake_encrypt(data, *args, **kwargs):
+    return "ENC:" + data
+
+
+def fake_decrypt(data, *args, **kwargs):
+    return data.removeprefix("ENC:")
+
+
+async def fake_aencrypt(data, *args, **kwargs):
+    return fake_encrypt(data)
+
+
+async def fake_adecrypt(data, *args, **kwargs):
+    return fake_decrypt(data)
+
+
+def fake_decrypt_lines(sops_path, newline="\n"):
+    with open(sops_path) as f:
+        yield from fake_decrypt(f.read()).split(newline)
+
+
+@pytest.fixture
+def reversible_sops():
+    """Patch the cache modules' Sops calls with a reversible "ENC:" prefix, so files round-trip on disk"""
+    with (
+        patch("cacheguard.base_cache.encrypt", side_effect=fake_encrypt) as mock_encrypt,
+        patch("cacheguard.base_cache.decrypt", side_effect=fake_decrypt) as mock_decrypt,
+        patch("cacheguard.base_cache.aencrypt", side_effect=fake_aencrypt),
+        patch("cacheguard.base_cache.adecrypt", side_effect=fake_adecrypt),
+        patch("cacheguard.text_cache.decrypt_lines", side_effect=fake_decrypt_lines),
+    ):
+        yield SimpleNamespace(encrypt=mock_encrypt, decrypt=mock_decrypt)
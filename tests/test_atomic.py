@@ -0,0 +1,38 @@
+"""
+Tests for atomic file replacement
+"""
+
+import os
+import pytest
+from unittest.mock import patch
+from cacheguard.atomic import atomic_write
+
+
+class TestAtomicWrite:
+    """Test cases for atomic_write"""
+
+    def test_creates_and_replaces(self, tmp_path):
+        """Test new files are created and existing ones replaced whole"""
+        target = tmp_path / "nested" / "cache.keys.sops"
+        atomic_write(target, "first")
+        atomic_write(target, b"second")
+        assert target.read_bytes() == b"second"
+        assert os.listdir(target.parent) == ["cache.keys.sops"]
+
+    def test_keeps_permissions(self, tmp_path):
+        """Test the replacement keeps the mode of the original file"""
+        target = tmp_path / "cache.keys.sops"
+        target.write_text("old")
+        target.chmod(0o600)
+        atomic_write(target, "new")
+        assert target.stat().st_mode & 0o777 == 0o600
+
+    def test_failure_leaves_original(self, tmp_path):
+        """Test a failed write leaves the original and no temporary file"""
+        target = tmp_path / "cache.keys.sops"
+        target.write_text("old")
+        with patch('cacheguard.atomic.fsync', side_effect=OSError("disk full")):
+            with pytest.raises(OSError):
+                atomic_write(target, "new")
+        assert target.read_text() == "old"
+        assert os.listdir(tmp_path) == ["cache.keys.sops"]
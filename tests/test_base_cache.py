@@ -2,6 +2,7 @@
 Tests for the BaseCache class
 """
 
+import asyncio
 import pytest
 from pathlib import Path
 from unittest.mock import patch, mock_open
@@ -109,6 +110,93 @@ class TestBaseCache:
             mock_file.assert_called_with(str(temp_path), "w")
             mock_file().write.assert_called_with(encrypted_data)
 
+    def test_save_skips_unchanged(self, temp_path, sample_data, encrypted_data):
+        """Test a second save of the same plaintext does not re-encrypt"""
+        cache = BaseCache(str(temp_path))
+
+        with patch('cacheguard.base_cache.encrypt', return_value=encrypted_data) as mock_encrypt, \
+             patch('builtins.open', mock_open()):
+            cache.save(sample_data)
+            cache.save(sample_data)
+            assert mock_encrypt.call_count == 1
+
+            cache.mark_dirty()
+            cache.save(sample_data)
+            assert mock_encrypt.call_count == 2
+
+    def test_is_dirty(self, temp_path, sample_data):
+        """Test dirty tracking follows load and changes to the data"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('builtins.open', mock_open(read_data="dummy")), \
+             patch('cacheguard.base_cache.decrypt', return_value=sample_data):
+            cache = BaseCache(str(temp_path))
+
+        assert not cache.is_dirty
+        cache.data = '{"key": "other"}'
+        assert cache.is_dirty
+
+    def test_new_cache_is_dirty(self, temp_path):
+        """Test a cache with nothing on disk needs saving"""
+        cache = BaseCache(str(temp_path))
+        assert cache.is_dirty
+
+    def test_lazy_defers_decrypt(self, temp_path, sample_data):
+        """Test lazy caches only decrypt on first access to data"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('builtins.open', mock_open(read_data="dummy")), \
+             patch('cacheguard.base_cache.decrypt', return_value=sample_data) as mock_decrypt:
+            cache = BaseCache(str(temp_path), lazy=True)
+            mock_decrypt.assert_not_called()
+            assert not cache.is_loaded
+            assert not cache.is_dirty
+
+            assert cache.data == sample_data
+            assert cache.data == sample_data
+            mock_decrypt.assert_called_once()
+            assert cache.is_loaded
+
+    def test_lazy_assignment_skips_decrypt(self, temp_path):
+        """Test assigning data before first access cancels the deferred load"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('cacheguard.base_cache.decrypt') as mock_decrypt:
+            cache = BaseCache(str(temp_path), lazy=True)
+            cache.data = "replacement"
+            assert cache.data == "replacement"
+            mock_decrypt.assert_not_called()
+
+    def test_aload_success(self, temp_path, sample_data, encrypted_data):
+        """Test async loading of cache data"""
+        cache = BaseCache(str(temp_path))
+        with patch('builtins.open', mock_open(read_data=encrypted_data)), \
+             patch('cacheguard.base_cache.adecrypt', return_value=sample_data) as mock_decrypt:
+            result = asyncio.run(cache.aload())
+            assert result == sample_data
+            mock_decrypt.assert_awaited_with(encrypted_data)
+
+    def test_asave_encrypts_and_writes(self, temp_path, sample_data, encrypted_data):
+        """Test async save encrypts data and writes to file"""
+        cache = BaseCache(str(temp_path))
+
+        with patch('cacheguard.base_cache.aencrypt', return_value=encrypted_data) as mock_encrypt, \
+             patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('builtins.open', mock_open()) as mock_file:
+
+            asyncio.run(cache.asave(sample_data))
+
+            mock_encrypt.assert_awaited_with(sample_data)
+            mock_file.assert_called_with(str(temp_path), "w")
+            mock_file().write.assert_called_with(encrypted_data)
+
+    def test_aopen_skips_sync_load(self, temp_path, sample_data):
+        """Test aopen unseals through the async path only"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('builtins.open', mock_open(read_data="dummy")), \
+             patch('cacheguard.base_cache.decrypt') as mock_decrypt, \
+             patch('cacheguard.base_cache.adecrypt', return_value=sample_data):
+            cache = asyncio.run(BaseCache.aopen(str(temp_path)))
+            assert cache.data == sample_data
+            mock_decrypt.assert_not_called()
+
     def test_add_raises_not_implemented(self, temp_path):
         """Test that add method raises NotImplementedError"""
         cache = BaseCache(str(temp_path))
@@ -0,0 +1,99 @@
+"""
+Tests for the BlobCache class and the bytes path to Sops
+"""
+
+import asyncio
+import os
+import pytest
+from unittest.mock import patch
+from cacheguard.blob_cache import BlobCache
+from cacheguard.plaintext_cache import PLAINTEXT_CACHE
+from cacheguard.sops import ExecutionPolicy, set_execution_policy
+
+BINARY = bytes(range(256)) * 4 + b"\r\n\x00 trailing"
+
+
+class TestBlobCache:
+    """Test cases for BlobCache functionality"""
+
+    @pytest.fixture
+    def temp_path(self, tmp_path):
+        """Create a temporary file path for testing"""
+        return str(tmp_path / "payload.blob.sops")
+
+    def test_new_cache_is_empty_bytes(self, temp_path):
+        """Test a cache without a file starts as empty bytes"""
+        assert BlobCache(temp_path).data == b""
+
+    def test_round_trip(self, temp_path, fake_sops_binary):
+        """Test binary content, line endings included, survives untouched"""
+        cache = BlobCache(temp_path)
+        cache.data = BINARY
+        cache.save()
+        assert not cache.is_dirty
+
+        PLAINTEXT_CACHE.clear()
+        assert BlobCache(temp_path).data == BINARY
+
+    def test_round_trip_with_codec(self, temp_path, fake_sops_binary):
+        """Test compressed blobs read back with or without the codec set"""
+        BlobCache(temp_path, codec="zlib").save(BINARY * 64)
+
+        PLAINTEXT_CACHE.clear()
+        assert BlobCache(temp_path).data == BINARY * 64
+
+    def test_streamed_round_trip(self, temp_path, fake_sops_binary):
+        """Test blobs piped through Sops in chunks are written and read back"""
+        set_execution_policy(ExecutionPolicy(stream_threshold=0, chunk_size=512))
+        try:
+            BlobCache(temp_path).save(BINARY * 64)
+            PLAINTEXT_CACHE.clear()
+            assert BlobCache(temp_path).data == BINARY * 64
+        finally:
+            set_execution_policy(None)
+
+    def test_large_files_are_mapped(self, temp_path, fake_sops_binary):
+        """Test ciphertext over the threshold is passed on as a mapped view"""
+        BlobCache(temp_path).save(os.urandom(4096))
+        PLAINTEXT_CACHE.clear()
+
+        cache = BlobCache(temp_path, autoload=False)
+        sent = []
+
+        def decrypt_bytes(contents):
+            sent.append((type(contents.obj).__name__, contents.nbytes))
+            return b"plain"
+
+        with patch.object(BlobCache, 'MMAP_THRESHOLD', 1024), \
+             patch('cacheguard.blob_cache.decrypt_bytes', side_effect=decrypt_bytes):
+            assert cache.load() == b"plain"
+        assert sent == [("mmap", os.path.getsize(temp_path))]
+
+    def test_read_buffer_is_reused(self, temp_path, fake_sops_binary):
+        """Test small files are read into the same buffer on every load"""
+        cache = BlobCache(temp_path)
+        cache.save(b"first")
+        PLAINTEXT_CACHE.clear()
+        cache.load()
+        buffer = cache._read_buffer
+
+        PLAINTEXT_CACHE.clear()
+        assert cache.load() == b"first"
+        assert cache._read_buffer is buffer
+
+    def test_unloaded_save_is_skipped(self, temp_path, fake_sops_binary):
+        """Test a lazy cache that was never unsealed does not re-encrypt"""
+        BlobCache(temp_path).save(b"data")
+        cache = BlobCache(temp_path, lazy=True)
+        with patch('cacheguard.blob_cache.encrypt_bytes') as mock_encrypt:
+            cache.save()
+            mock_encrypt.assert_not_called()
+
+    def test_async_round_trip(self, temp_path, fake_sops_binary):
+        """Test the async API takes the same bytes path"""
+        async def round_trip():
+            await BlobCache(temp_path, autoload=False).asave(BINARY)
+            PLAINTEXT_CACHE.clear()
+            return (await BlobCache.aopen(temp_path)).data
+
+        assert asyncio.run(round_trip()) == BINARY
@@ -0,0 +1,89 @@
+"""
+Tests for the `cacheguard.bulk` module
+"""
+
+import threading
+
+import pytest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+from cacheguard.bulk import cache_type, discover, load_many, save_many
+from cacheguard.key_cache import KeyCache
+from cacheguard.text_cache import TextCache
+
+
+class TestBulk:
+    """Test cases for bulk loading and saving"""
+
+    @pytest.fixture
+    def cache_dir(self, tmp_path):
+        """Directory with a mix of cache and unrelated files"""
+        (tmp_path / "a.keys.sops").write_text("encrypted-a")
+        (tmp_path / "b.keys.sops").write_text("encrypted-b")
+        (tmp_path / "log.text.sops").write_text("encrypted-log")
+        (tmp_path / "notes.txt").write_text("ignored")
+        (tmp_path / "nested").mkdir()
+        (tmp_path / "nested" / "c.keys.sops").write_text("encrypted-c")
+        return tmp_path
+
+    def test_cache_type(self):
+        """Test cache classes are picked by extension"""
+        assert cache_type("config.keys.sops") is KeyCache
+        assert cache_type("logs/app.text.sops") is TextCache
+        with pytest.raises(ValueError, match="Unrecognized cache extension"):
+            cache_type("config.sops")
+
+    def test_discover(self, cache_dir):
+        """Test discovery only returns cache files"""
+        assert [x.name for x in discover(cache_dir)] == [
+            "a.keys.sops",
+            "b.keys.sops",
+            "log.text.sops",
+        ]
+        assert len(discover(cache_dir, recursive=True)) == 4
+
+    def test_load_many_directory(self, cache_dir):
+        """Test a directory is loaded into a mapping of path to cache"""
+        plaintext = {
+            "encrypted-a": '{"A": "1"}',
+            "encrypted-b": '{"B": "2"}',
+            "encrypted-log": "line1\nline2",
+        }
+        with patch('cacheguard.base_cache.decrypt', side_effect=plaintext.get):
+            caches = load_many(cache_dir)
+
+        assert caches[cache_dir / "a.keys.sops"].data == {"A": "1"}
+        assert caches[cache_dir / "b.keys.sops"].data == {"B": "2"}
+        assert isinstance(caches[cache_dir / "log.text.sops"], TextCache)
+        assert caches[cache_dir / "log.text.sops"].buffer.getvalue() == "line1\nline2\n"
+
+    def test_load_many_runs_in_parallel(self, cache_dir):
+        """Test decrypts overlap instead of running one after another"""
+        barrier = threading.Barrier(3, timeout=2)
+
+        def slow_decrypt(contents):
+            barrier.wait()
+            return ""
+
+        with patch('cacheguard.base_cache.decrypt', side_effect=slow_decrypt):
+            caches = load_many(cache_dir, max_workers=3)
+
+        assert len(caches) == 3
+
+    def test_load_many_paths(self, cache_dir):
+        """Test an explicit list of paths is honoured"""
+        with patch('cacheguard.base_cache.decrypt', return_value='{"A": "1"}'):
+            caches = load_many([cache_dir / "a.keys.sops"])
+        assert list(caches) == [cache_dir / "a.keys.sops"]
+
+    def test_save_many(self):
+        """Test every cache is saved and failures surface afterwards"""
+        good = MagicMock()
+        bad = MagicMock()
+        bad.save.side_effect = OSError("disk full")
+
+        with pytest.raises(OSError, match="disk full"):
+            save_many({Path("bad"): bad, Path("good"): good})
+
+        good.save.assert_called_once()
+        bad.save.assert_called_once()
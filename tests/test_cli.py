@@ -0,0 +1,100 @@
+"""
+Tests for the `cacheguard` command line interface
+"""
+
+import json
+import os
+import subprocess
+import sys
+import pytest
+from unittest.mock import patch
+from cacheguard.cli import main
+from cacheguard.key_cache import KeyCache
+from cacheguard.sops import encrypt, get_recipients
+
+
+class TestRotateCommand:
+    """Test cases for `cacheguard rotate`"""
+
+    @pytest.fixture
+    def cache(self, tmp_path, fake_sops_binary):
+        """A cache sealed for one age recipient"""
+        sops_path = tmp_path / "config.keys.sops"
+        sops_path.write_text(encrypt(json.dumps({"KEY": "value"}), age_pubkeys=["age1old"]))
+        return sops_path
+
+    def test_rotate(self, tmp_path, cache, capsys):
+        """Test recipients are swapped and progress is reported"""
+        assert main(["rotate", str(tmp_path), "--add-age", "age1new", "--rm-age", "age1old", "-j", "2"]) == 0
+        assert get_recipients(cache.read_text()) == {"age_pubkeys": ["age1new"]}
+        err = capsys.readouterr().err
+        assert f"[1/1] rotated {cache}" in err
+        assert "Rotated 1, skipped 0, failed 0" in err
+
+    def test_failure_exit_code(self, tmp_path, cache, capsys):
+        """Test a file that cannot be rotated fails the command"""
+        cache.write_text("not a sops file")
+        assert main(["rotate", str(cache), "-q"]) == 1
+        assert "Failed to rotate" in capsys.readouterr().err
+
+    def test_module_entry_point(self):
+        """Test `python -m cacheguard` runs the same interface"""
+        result = subprocess.run(  # nosec B603
+            [sys.executable, "-m", "cacheguard", "--help"], capture_output=True, text=True
+        )
+        assert result.returncode == 0
+        assert "rotate" in result.stdout
+
+
+class TestExecCommand:
+    """Test cases for `cacheguard exec`"""
+
+    @pytest.fixture
+    def caches(self, tmp_path, fake_sops_binary):
+        """Two Key Caches sharing one key"""
+        first = KeyCache(str(tmp_path / "a.keys.sops"))
+        first.add({"SHARED": "from-a", "ONLY_A": "a"})
+        first.save()
+        second = KeyCache(str(tmp_path / "b.keys.sops"))
+        second.add({"SHARED": "from-b", "PORT": 8080})
+        second.save()
+        return [first.sops_path, second.sops_path]
+
+    def test_exec_with_merged_environment(self, caches, monkeypatch):
+        """Test later caches win and the command gets the merged environment"""
+        monkeypatch.setenv("SHARED", "inherited")
+        with patch('cacheguard.cli.execvpe') as mock_exec:
+            assert main(["exec", "-k", caches[0], "-k", caches[1], "--", "env", "-0"]) == 0
+        file, command, env = mock_exec.call_args.args
+        assert (file, command) == ("env", ["env", "-0"])
+        assert env["SHARED"] == "from-b"
+        assert env["ONLY_A"] == "a"
+        assert env["PORT"] == "8080"
+        assert env["PATH"] == os.environ["PATH"]
+        assert "ONLY_A" not in os.environ
+
+    def test_no_override_keeps_environment(self, caches, monkeypatch):
+        """Test existing variables win with --no-override"""
+        monkeypatch.setenv("SHARED", "inherited")
+        with patch('cacheguard.cli.execvpe') as mock_exec:
+            main(["exec", "--no-override", "-k", caches[0], "--", "true"])
+        assert mock_exec.call_args.args[2]["SHARED"] == "inherited"
+
+    def test_errors(self, tmp_path, caches, capsys):
+        """Test a missing command or cache fails before anything runs"""
+        with patch('cacheguard.cli.execvpe') as mock_exec:
+            assert main(["exec", "-k", caches[0]]) == 2
+            assert main(["exec", "-k", str(tmp_path / "missing.keys.sops"), "--", "true"]) == 2
+            mock_exec.assert_not_called()
+        assert "not found" in capsys.readouterr().err
+
+    def test_runs_real_command(self, caches, fake_sops_binary):
+        """Test the process is replaced by the command end to end"""
+        result = subprocess.run(  # nosec B603
+            [sys.executable, "-m", "cacheguard", "exec", "-k", caches[1], "--",
+             sys.executable, "-c", "import os; print(os.environ['SHARED'])"],
+            capture_output=True,
+            text=True,
+            env={**os.environ, "CACHEGUARD_SOPS_BINARY": fake_sops_binary},
+        )
+        assert result.stdout.strip() == "from-b"
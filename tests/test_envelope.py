@@ -0,0 +1,163 @@
+"""
+Tests for envelope mode, where Sops wraps only a data key
+"""
+
+import asyncio
+import json
+import sys
+
+import pytest
+from unittest.mock import patch
+from cacheguard import envelope, sops
+from cacheguard.blob_cache import BlobCache
+from cacheguard.envelope import forget_keys, is_envelope, rotate_envelope
+from cacheguard.key_cache import KeyCache
+from cacheguard.plaintext_cache import PLAINTEXT_CACHE
+from cacheguard.segmented_cache import SegmentedTextCache
+from cacheguard.sops import decrypt_bytes, get_recipients
+from cacheguard.text_cache import TextCache
+
+
+def test_missing_cryptography(tmp_path):
+    """Test envelope mode explains how to install its dependency"""
+    with patch.dict(sys.modules, {"cryptography.hazmat.primitives.ciphers.aead": None}):
+        with pytest.raises(ImportError, match=r"pip install cacheguard\[envelope\]"):
+            KeyCache(str(tmp_path / "config.keys.sops"), envelope=True)
+
+
+def test_is_envelope():
+    """Test envelopes are told apart from plain Sops documents"""
+    assert is_envelope('{\n\t"cacheguard_envelope": 1,\n\t"cipher": "AES256_GCM"')
+    assert is_envelope(memoryview(b'{"cacheguard_envelope": 1}'))
+    assert not is_envelope('{\n\t"data": "ENC[AES256_GCM,data:...]",\n\t"sops": {}}')
+
+
+def test_structured_is_refused(tmp_path):
+    """Test envelope mode cannot be combined with per-value Sops documents"""
+    with pytest.raises(ValueError, match="envelope"):
+        KeyCache(str(tmp_path / "config.keys.sops"), structured=True, envelope=True)
+
+
+class TestEnvelope:
+    """Test cases for sealing caches in envelope mode"""
+
+    @pytest.fixture(autouse=True)
+    def cipher(self, fake_sops_binary):
+        pytest.importorskip("cryptography")
+        forget_keys()
+        yield
+        forget_keys()
+
+    def test_round_trip_wraps_key_once(self, tmp_path):
+        """Test repeat saves and loads run Sops only to wrap and unwrap the key"""
+        sops_path = str(tmp_path / "config.keys.sops")
+        with patch("cacheguard.sops.run", wraps=sops.run) as mock_run:
+            cache = KeyCache(sops_path, ["age1test"], envelope=True)
+            for x in range(5):
+                cache["COUNT"] = str(x)
+                cache.save()
+            assert mock_run.call_count == 1  # Wrapping the new data key
+
+            PLAINTEXT_CACHE.clear()
+            assert KeyCache(sops_path, envelope=True)["COUNT"] == "4"
+            assert mock_run.call_count == 1  # Already unwrapped in this process
+
+        forget_keys()
+        PLAINTEXT_CACHE.clear()
+        assert KeyCache(sops_path)["COUNT"] == "4"  # Readable without envelope=True
+
+    def test_segmented_cache_wraps_key_once(self, tmp_path):
+        """Test segments and their manifest share one data key per process"""
+        sops_path = str(tmp_path / "events.text.sops")
+        with patch("cacheguard.sops.run", wraps=sops.run) as mock_run:
+            log = SegmentedTextCache(sops_path, ["age1test"], envelope=True)
+            for x in range(5):
+                log.append(f"event {x}")
+                log.save()
+            assert len(log.segments) == 5
+            assert mock_run.call_count == 1
+
+        PLAINTEXT_CACHE.clear()
+        assert SegmentedTextCache(sops_path, envelope=True).data.splitlines()[-1] == "event 4"
+
+    def test_layout_is_sops_inspectable(self, tmp_path):
+        """Test the wrapped key is a Sops document holding the data key"""
+        sops_path = tmp_path / "config.keys.sops"
+        cache = KeyCache(str(sops_path), ["age1test"], envelope=True)
+        cache["KEY"] = "value"
+        cache.save()
+
+        document = json.loads(sops_path.read_text())
+        assert document["cacheguard_envelope"] == 1
+        assert document["cipher"] == "AES256_GCM"
+        assert "value" not in sops_path.read_text()
+        assert get_recipients(json.dumps(document["key"]))["age_pubkeys"] == ["age1test"]
+        assert len(decrypt_bytes(json.dumps(document["key"]).encode())) == 32
+
+    def test_tampering_is_detected(self, tmp_path):
+        """Test a modified payload fails authentication"""
+        from cryptography.exceptions import InvalidTag
+
+        sops_path = tmp_path / "log.text.sops"
+        log = TextCache(str(sops_path), envelope=True)
+        log.append("line")
+        log.save()
+        document = json.loads(sops_path.read_text())
+        document["data"] = document["data"][::-1]
+        with pytest.raises((InvalidTag, ValueError)):
+            envelope.open_document(document, envelope.unwrap(document["key"]))
+
+    def test_text_and_blob_caches(self, tmp_path):
+        """Test streaming reads and binary payloads work with envelopes"""
+        log = TextCache(str(tmp_path / "app.text.sops"), envelope=True, codec="zlib")
+        log.append("first")
+        log.append("second")
+        log.save()
+        PLAINTEXT_CACHE.clear()
+        assert list(TextCache(log.sops_path, read_only=True).iter_lines()) == ["first", "second"]
+
+        blob = BlobCache(str(tmp_path / "model.blob.sops"), envelope=True)
+        blob.save(b"\x00\x01\x02")
+        PLAINTEXT_CACHE.clear()
+        assert BlobCache(blob.sops_path).data == b"\x00\x01\x02"
+
+    def test_async(self, tmp_path):
+        """Test the async path wraps and unwraps the key without blocking"""
+        sops_path = str(tmp_path / "config.keys.sops")
+
+        async def round_trip():
+            cache = KeyCache(sops_path, envelope=True)
+            cache["KEY"] = "value"
+            await cache.asave()
+            forget_keys()
+            PLAINTEXT_CACHE.clear()
+            return await KeyCache.aopen(sops_path, envelope=True)
+
+        assert asyncio.run(round_trip())["KEY"] == "value"
+
+    def test_new_recipients_get_a_new_key(self, tmp_path):
+        """Test changing recipients wraps a fresh data key"""
+        cache = KeyCache(str(tmp_path / "config.keys.sops"), ["age1old"], envelope=True)
+        cache["KEY"] = "value"
+        cache.save()
+        first = cache._envelope.key
+        cache.age_pubkeys = ["age1new"]
+        cache["KEY"] = "changed"
+        cache.save()
+        assert cache._envelope.key != first
+
+    def test_rotate(self, tmp_path):
+        """Test rotation reseals the payload under a new key for the new recipients"""
+        sops_path = tmp_path / "config.keys.sops"
+        cache = KeyCache(str(sops_path), ["age1old"], envelope=True)
+        cache["KEY"] = "value"
+        cache.save()
+        old_key = cache._envelope.key
+
+        sops_path.write_text(rotate_envelope(sops_path, add_age=["age1new"], remove_age=["age1old"]))
+        forget_keys()
+        PLAINTEXT_CACHE.clear()
+        rotated = KeyCache(str(sops_path), envelope=True)
+        assert rotated["KEY"] == "value"
+        assert rotated._envelope.key != old_key
+        assert rotated._envelope.recipients[0] == {"age1new"}
@@ -0,0 +1,58 @@
+"""
+Tests for the benchmark Sops stand-in, which must stay compatible with
+`cacheguard.sops` for the benchmark numbers to mean anything
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+from cacheguard.sops import get_recipients
+
+FAKE_SOPS = Path(__file__).resolve().parent.parent / "benchmarks" / "fake_sops.py"
+
+
+def fake_sops(*args, input=b""):
+    return subprocess.run(  # nosec B603
+        [sys.executable, str(FAKE_SOPS), *args], input=input, capture_output=True
+    )
+
+
+def test_round_trip():
+    encrypted = fake_sops("-e", "-a", "age1abc,age1def", "/dev/stdin", input=b"line1\nline2")
+    assert encrypted.returncode == 0  # nosec B101
+
+    decrypted = fake_sops("decrypt", input=encrypted.stdout)
+    assert decrypted.stdout == b"line1\nline2"  # nosec B101
+
+
+def test_decrypt_file(tmp_path):
+    sealed = tmp_path / "config.keys.sops"
+    sealed.write_bytes(fake_sops("-e", "/dev/stdin", input=b'{"a": "1"}').stdout)
+    assert fake_sops("decrypt", str(sealed)).stdout == b'{"a": "1"}'  # nosec B101
+
+
+def test_recipients_are_recorded():
+    encrypted = fake_sops("-e", "-a", "age1abc", "-p", "FINGERPRINT", "/dev/stdin", input=b"x")
+    assert get_recipients(encrypted.stdout.decode()) == {  # nosec B101
+        "age_pubkeys": ["age1abc"],
+        "pgp_fingerprints": ["FINGERPRINT"],
+    }
+
+
+def test_decrypt_garbage_fails():
+    result = fake_sops("decrypt", input=b"not sops")
+    assert result.returncode != 0  # nosec B101
+
+
+def test_structured_extract_and_set(tmp_path):
+    sealed = tmp_path / "config.keys.sops"
+    json_types = ("--input-type", "json", "--output-type", "json")
+    sealed.write_bytes(
+        fake_sops("-e", *json_types, "/dev/stdin", input=b'{"a": "1", "b": "2"}').stdout
+    )
+
+    assert fake_sops("decrypt", *json_types, "--extract", '["b"]', str(sealed)).stdout == b"2"  # nosec B101
+    assert fake_sops("set", *json_types, "--value-stdin", str(sealed), '["c"]', input=b'"3"').returncode == 0  # nosec B101
+    assert fake_sops("decrypt", *json_types, "--extract", '["c"]', str(sealed)).stdout == b"3"  # nosec B101
+    assert b"not found" in fake_sops("decrypt", *json_types, "--extract", '["z"]', str(sealed)).stderr  # nosec B101
@@ -0,0 +1,110 @@
+"""
+Tests for the `cacheguard.instrumentation` hooks and counters
+"""
+
+import subprocess
+
+import pytest
+from unittest.mock import MagicMock, patch
+from cacheguard.instrumentation import (
+    OpenTelemetryHook,
+    SopsEvent,
+    add_hook,
+    get_counters,
+    remove_hook,
+    reset_counters,
+    span,
+)
+from cacheguard.key_cache import KeyCache
+
+
+class TestInstrumentation:
+    """Test cases for instrumentation hooks"""
+
+    @pytest.fixture
+    def events(self):
+        """Collect every event emitted during a test"""
+        collected = []
+        reset_counters()
+        add_hook(collected.append)
+        yield collected
+        remove_hook(collected.append)
+        reset_counters()
+
+    def test_span_reports_event(self, events):
+        """Test a span emits one timed event"""
+        with span("load", "config.keys.sops") as event:
+            event.input_bytes = 10
+
+        assert events == [event]
+        assert event.path == "config.keys.sops"
+        assert event.wall_time >= 0
+        assert get_counters()["load"]["calls"] == 1
+        assert get_counters()["load"]["input_bytes"] == 10
+
+    def test_subprocess_rolls_into_parent(self, events):
+        """Test nested Sops processes add to the enclosing operation"""
+        with span("save", "config.keys.sops") as parent:
+            with span("encrypt", subprocess=True) as child:
+                child.exit_code = 0
+
+        assert events == [child, parent]
+        assert child.path == "config.keys.sops"
+        assert child.subprocess_time == child.wall_time
+        assert parent.subprocess_time == child.wall_time
+        assert parent.exit_code == 0
+
+    def test_errors_and_timeouts(self, events):
+        """Test failures are recorded and re-raised"""
+        with pytest.raises(subprocess.TimeoutExpired):
+            with span("decrypt", subprocess=True):
+                raise subprocess.TimeoutExpired(["sops"], 4)
+
+        assert events[0].timed_out
+        counters = get_counters()["decrypt"]
+        assert counters["timeouts"] == 1
+        assert counters["errors"] == 1
+
+    def test_failing_hook_warns(self, events):
+        """Test a broken hook does not break the operation"""
+        def broken(event):
+            raise ValueError("broken hook")
+
+        add_hook(broken)
+        try:
+            with pytest.warns(UserWarning, match="broken hook"):
+                with span("load"):
+                    pass
+        finally:
+            remove_hook(broken)
+        assert len(events) == 1
+
+    def test_cache_load_reports_sops_process(self, events, tmp_path):
+        """Test a real load reports both the cache and the Sops process"""
+        sealed = tmp_path / "config.keys.sops"
+        sealed.write_text("ciphertext")
+        completed = subprocess.CompletedProcess(["sops"], 0, '{"a": "1"}', "")
+
+        with patch('cacheguard.sops.run', return_value=completed):
+            KeyCache(str(sealed))
+
+        decrypt, load = events
+        assert (decrypt.operation, load.operation) == ("decrypt", "load")
+        assert decrypt.path == load.path == str(sealed)
+        assert decrypt.input_bytes == load.input_bytes == len("ciphertext")
+        assert load.output_bytes == len('{"a": "1"}')
+        assert load.exit_code == 0
+        assert load.subprocess_time == decrypt.wall_time
+
+    def test_open_telemetry_hook(self):
+        """Test events become spans on a tracer"""
+        tracer = MagicMock()
+        event = SopsEvent("save", "config.keys.sops", start_ns=1_000, wall_time=0.5, exit_code=0)
+
+        OpenTelemetryHook(tracer)(event)
+
+        tracer.start_span.assert_called_with("cacheguard.save", start_time=1_000)
+        otel_span = tracer.start_span.return_value
+        otel_span.set_attribute.assert_any_call("cacheguard.path", "config.keys.sops")
+        otel_span.set_attribute.assert_any_call("cacheguard.exit_code", 0)
+        otel_span.end.assert_called_with(end_time=1_000 + 500_000_000)
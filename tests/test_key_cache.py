@@ -2,10 +2,15 @@
 Tests for the KeyCache class
 """
 
+import asyncio
+import json
+import os
 import pytest
+from collections.abc import MutableMapping
 from pathlib import Path
 from unittest.mock import patch, mock_open
 from cacheguard.key_cache import KeyCache
+from cacheguard.plaintext_cache import PLAINTEXT_CACHE
 
 
 class TestKeyCache:
@@ -88,6 +93,70 @@ class TestKeyCache:
                 cache.save()
                 mock_super_save.assert_called_with(expected_json)
 
+    def test_aopen(self, temp_path, sample_json):
+        """Test async construction parses the unsealed JSON"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('builtins.open', mock_open(read_data="encrypted")), \
+             patch('cacheguard.base_cache.adecrypt', return_value=sample_json):
+            cache = asyncio.run(KeyCache.aopen(str(temp_path)))
+            assert cache.data == {"key1": "value1", "key2": "value2"}
+
+    def test_asave(self, temp_path, sample_data):
+        """Test async save serializes to JSON"""
+        cache = KeyCache(str(temp_path))
+        cache.data = sample_data
+
+        with patch('cacheguard.base_cache.BaseCache.asave') as mock_super_save:
+            asyncio.run(cache.asave())
+            mock_super_save.assert_awaited_with('{"key1": "value1", "key2": "value2"}')
+
+    def test_is_dirty_after_add(self, temp_path, sample_json):
+        """Test loaded caches are clean until a key changes"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('builtins.open', mock_open(read_data="dummy")), \
+             patch('cacheguard.base_cache.decrypt', return_value=sample_json):
+            cache = KeyCache(str(temp_path))
+
+        assert not cache.is_dirty
+        cache.add({"key1": "value1"})
+        assert not cache.is_dirty
+        cache.add({"key3": "value3"})
+        assert cache.is_dirty
+
+    def test_save_unchanged_skips_encrypt(self, temp_path, sample_json):
+        """Test saving an untouched cache does not call Sops"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('builtins.open', mock_open(read_data="dummy")), \
+             patch('cacheguard.base_cache.decrypt', return_value=sample_json):
+            cache = KeyCache(str(temp_path))
+
+        with patch('cacheguard.base_cache.encrypt') as mock_encrypt:
+            cache.save()
+            mock_encrypt.assert_not_called()
+
+    def test_lazy_load_env_var(self, temp_path, sample_json):
+        """Test lazy caches decrypt when a key is first read"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('builtins.open', mock_open(read_data="dummy")), \
+             patch('cacheguard.base_cache.decrypt', return_value=sample_json) as mock_decrypt, \
+             patch.dict('os.environ', {}, clear=True):
+            cache = KeyCache(str(temp_path), lazy=True)
+            mock_decrypt.assert_not_called()
+
+            cache.load_env_var("key1")
+            mock_decrypt.assert_called_once()
+            assert cache.data == {"key1": "value1", "key2": "value2"}
+
+    def test_lazy_save_untouched(self, temp_path):
+        """Test saving a lazy cache that was never read does nothing"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('cacheguard.base_cache.decrypt') as mock_decrypt, \
+             patch('cacheguard.base_cache.encrypt') as mock_encrypt:
+            cache = KeyCache(str(temp_path), lazy=True)
+            cache.save()
+            mock_decrypt.assert_not_called()
+            mock_encrypt.assert_not_called()
+
     def test_add(self, temp_path):
         """Test add method"""
         cache = KeyCache(str(temp_path))
@@ -108,6 +177,82 @@ class TestKeyCache:
 
         assert cache.data == {"key1": "new_value"}
 
+    def test_add_updates_in_place(self, temp_path):
+        """Test add keeps the same dict rather than rebuilding it"""
+        cache = KeyCache(str(temp_path))
+        data = cache.data
+        cache.add({"key1": "value1"})
+        assert cache.data is data
+
+    def test_mutable_mapping(self, temp_path):
+        """Test the cache reads and writes like a dict"""
+        cache = KeyCache(str(temp_path))
+        cache["key1"] = "value1"
+        cache.update(key2="value2", key3="value3")
+        del cache["key3"]
+
+        assert isinstance(cache, MutableMapping)
+        assert cache["key1"] == "value1"
+        assert "key2" in cache and "key3" not in cache
+        assert len(cache) == 2
+        assert dict(cache) == {"key1": "value1", "key2": "value2"}
+        assert cache.pop("key2") == "value2"
+        with pytest.raises(KeyError):
+            cache["missing"]
+
+    def test_object_semantics(self, tmp_path):
+        """Test equality, hashing and truth follow identity, not contents"""
+        first = KeyCache(str(tmp_path / "first.json"))
+        second = KeyCache(str(tmp_path / "second.json"))
+
+        assert first and len(first) == 0
+        assert first != second and first == first
+        assert len({first, second}) == 2
+        assert {first: "handle"}[first] == "handle"
+        assert dict(first) == dict(second)
+
+    def test_changed_keys(self, temp_path):
+        """Test keys changed through the mapping are tracked until saved"""
+        cache = KeyCache(str(temp_path))
+        cache.data = {"key1": "value1", "key2": "value2"}
+        with patch('cacheguard.base_cache.encrypt', return_value="encrypted"), \
+             patch('builtins.open', mock_open()):
+            cache.save()
+            assert not cache.is_dirty
+
+            cache["key1"] = "value1"  # Unchanged value
+            assert cache.changed_keys == frozenset()
+            cache["key1"] = "changed"
+            del cache["key2"]
+            assert cache.changed_keys == {"key1", "key2"}
+            assert cache.is_dirty
+
+            cache.save()
+        assert cache.changed_keys == frozenset()
+        assert not cache.is_dirty
+
+    def test_change_undone(self, temp_path):
+        """Test a value set back to what is sealed leaves the cache clean"""
+        cache = KeyCache(str(temp_path))
+        cache.data = {"key1": "value1"}
+        with patch('cacheguard.base_cache.encrypt', return_value="encrypted") as mock_encrypt, \
+             patch('builtins.open', mock_open()):
+            cache.save()
+            cache["key1"] = "changed"
+            cache["key1"] = "value1"
+            assert not cache.is_dirty
+
+            cache.save()
+            assert mock_encrypt.call_count == 1
+        assert cache.changed_keys == frozenset()
+
+    def test_slots(self, temp_path):
+        """Test instances carry no attribute dict"""
+        cache = KeyCache(str(temp_path))
+        assert not hasattr(cache, "__dict__")
+        with pytest.raises(AttributeError):
+            cache.unknown = "value"
+
     def test_load_env_var_success(self, temp_path):
         """Test loading environment variable successfully"""
         cache = KeyCache(str(temp_path))
@@ -133,4 +278,78 @@ class TestKeyCache:
         with patch.dict('os.environ', {}, clear=True):
             cache.deploy()
             assert cache.data["VAR1"] == "value1"
-            assert cache.data["VAR2"] == "value2"
\ No newline at end of file
+            assert cache.data["VAR2"] == "value2"
+
+class TestStructuredKeyCache:
+    """Test cases for the structured, per-value encrypted Key Cache"""
+
+    @pytest.fixture
+    def sealed(self, tmp_path, fake_sops_binary):
+        """A structured cache sealed on disk by the Sops stand-in"""
+        sops_path = str(tmp_path / "config.keys.sops")
+        cache = KeyCache(sops_path, structured=True)
+        cache.add({"KEY1": "value1", "KEY2": "value2"})
+        cache.save()
+        PLAINTEXT_CACHE.clear()
+        return sops_path
+
+    def test_round_trip(self, sealed):
+        """Test the whole store loads back from the JSON document"""
+        with open(sealed) as f:
+            assert set(json.load(f)) == {"KEY1", "KEY2", "sops"}
+        assert KeyCache(sealed, structured=True).data == {"KEY1": "value1", "KEY2": "value2"}
+
+    def test_get_extracts_one_value(self, sealed):
+        """Test a lazy lookup extracts the value without a full decrypt"""
+        cache = KeyCache(sealed, structured=True, lazy=True)
+        with patch('cacheguard.base_cache.decrypt') as mock_decrypt:
+            assert cache.get("KEY2") == "value2"
+            assert cache.get("MISSING", "default") == "default"
+            mock_decrypt.assert_not_called()
+        assert not cache.is_loaded
+
+    def test_mapping_lookups_match_loaded_values(self, sealed):
+        """Test lookups through the mapping decrypt once and keep value types"""
+        cache = KeyCache(sealed, structured=True)
+        cache["COUNT"] = 5
+        cache.save()
+        PLAINTEXT_CACHE.clear()
+
+        lazy = KeyCache(sealed, structured=True, lazy=True)
+        with patch("cacheguard.key_cache.extract") as mock_extract:
+            assert lazy["COUNT"] == 5
+            assert "KEY1" in lazy and "MISSING" not in lazy
+            mock_extract.assert_not_called()
+        assert lazy.is_loaded
+
+    def test_load_env_var_extracts(self, sealed, monkeypatch):
+        """Test loading one variable into the environment uses extraction"""
+        monkeypatch.delenv("KEY1", raising=False)
+        KeyCache(sealed, structured=True, lazy=True).load_env_var("KEY1")
+        assert os.environ["KEY1"] == "value1"
+
+    def test_set_updates_one_value(self, sealed):
+        """Test a sealed structured cache updates a key in place"""
+        cache = KeyCache(sealed, structured=True, lazy=True)
+        cache.set("KEY3", "value3")
+        assert not cache.is_loaded
+        assert KeyCache(sealed, structured=True).data == {
+            "KEY1": "value1",
+            "KEY2": "value2",
+            "KEY3": "value3",
+        }
+
+    def test_set_falls_back_to_save_on_old_sops(self, sealed):
+        """Test Sops without `set --value-stdin` rewrites the whole store"""
+        cache = KeyCache(sealed, structured=True, lazy=True)
+        with patch('cacheguard.key_cache.sops_version', return_value=(3, 8, 1)), \
+             patch('cacheguard.key_cache.set_value') as mock_set:
+            cache.set("KEY1", "changed")
+            mock_set.assert_not_called()
+        PLAINTEXT_CACHE.clear()
+        assert KeyCache(sealed, structured=True).get("KEY1") == "changed"
+
+    def test_codec_is_refused(self, tmp_path):
+        """Test a payload codec cannot be combined with structured mode"""
+        with pytest.raises(ValueError, match="payload codec"):
+            KeyCache(str(tmp_path / "config.keys.sops"), structured=True, codec="zlib")
@@ -0,0 +1,87 @@
+"""
+Tests for the managed Sops keyservice
+"""
+
+import os
+
+import pytest
+from unittest.mock import patch
+from cacheguard import sops
+from cacheguard.key_cache import KeyCache
+from cacheguard.keyservice import KeyService, start_keyservice, stop_keyservice
+from cacheguard.plaintext_cache import PLAINTEXT_CACHE
+from cacheguard.sops import decrypt, encrypt, get_keyservice
+
+
+class TestKeyService:
+    """Test cases for the keyservice"""
+
+    @pytest.fixture
+    def service(self, fake_sops_binary, monkeypatch):
+        """A running keyservice that Sops calls are routed through"""
+        monkeypatch.setattr("cacheguard.keyservice._registered", False)
+        with patch("cacheguard.keyservice.register") as mock_register:
+            service = start_keyservice()
+        mock_register.assert_called_once_with(stop_keyservice)
+        yield service
+        stop_keyservice()
+
+    def test_routes_calls(self, service):
+        """Test Sops calls carry the keyservice flags after their action"""
+        with patch("cacheguard.sops.run", wraps=sops.run) as mock_run:
+            assert decrypt(encrypt("secret", ["age1test"], [])) == "secret"
+        command = mock_run.call_args.args[0]
+        assert command[1:5] == ["decrypt", "--keyservice", service.address, "--enable-local-keyservice=false"]
+
+    def test_caches_work_through_it(self, tmp_path, service):
+        """Test caches and streaming decrypts work with the keyservice in use"""
+        cache = KeyCache(str(tmp_path / "config.keys.sops"))
+        cache["KEY"] = "value"
+        cache.save()
+        PLAINTEXT_CACHE.clear()
+        assert KeyCache(cache.sops_path)["KEY"] == "value"
+        assert list(sops.decrypt_lines(cache.sops_path)) == ['{"KEY": "value"}']
+
+    def test_restarts_after_exit(self, service):
+        """Test a dead keyservice is restarted before the next call"""
+        service._process.kill()
+        service._process.wait()
+        assert not service.is_healthy
+        assert decrypt(encrypt("secret", ["age1test"], [])) == "secret"
+        assert service.restarts == 1
+        assert service.is_healthy
+
+    def test_stop(self, service):
+        """Test stopping ends the process, removes the socket and stops routing"""
+        process = service._process
+        stop_keyservice()
+        assert get_keyservice() is None
+        assert process.poll() is not None
+        assert not os.path.exists(service.socket_path)
+        assert sops._route(["sops", "decrypt"]) == ["sops", "decrypt"]
+
+    def test_replaces_previous(self, service, tmp_path):
+        """Test starting again stops the earlier keyservice"""
+        with patch("cacheguard.keyservice.register"):
+            second = start_keyservice(str(tmp_path / "second.sock"))
+        assert get_keyservice() is second
+        assert not service.is_healthy
+        assert second.is_healthy
+
+    def test_other_processes_do_not_restart(self, service):
+        """Test a forked worker falls back to plain Sops instead of restarting"""
+        service._owner = -1  # As seen from another process
+        service._process.kill()
+        service._process.wait()
+        assert service.flags() == []
+        assert service.restarts == 0
+        service._owner = os.getpid()
+
+    def test_failed_start(self, tmp_path):
+        """Test a keyservice that never listens raises a SopsError"""
+        from cacheguard.errors import SopsError
+
+        sops.set_sops_binary("false")
+        service = KeyService(str(tmp_path / "sops.sock"), startup_timeout=1)
+        with pytest.raises(SopsError, match="did not start"):
+            service.start()
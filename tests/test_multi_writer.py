@@ -0,0 +1,130 @@
+"""
+Tests for several writers sharing one cache file
+"""
+
+import multiprocessing
+import threading
+from unittest.mock import patch
+
+from cacheguard import transaction
+from cacheguard.blob_cache import BlobCache
+from cacheguard.key_cache import KeyCache
+from cacheguard.plaintext_cache import PLAINTEXT_CACHE
+from cacheguard.sops import set_sops_binary
+from cacheguard.text_cache import TextCache
+from cacheguard.transactions import Transaction
+
+
+def add_key(sops_path, shim, index):
+    """Worker process adding one key to a shared Key Cache"""
+    set_sops_binary(shim)
+    cache = KeyCache(sops_path, multi_writer=True)
+    cache.add({f"WORKER{index}": str(index)})
+    cache.save()
+
+
+class TestMultiWriter:
+    """Test cases for multi-writer mode"""
+
+    def test_key_cache_merges(self, tmp_path, fake_sops_binary):
+        """Test keys added, changed and removed by two writers all survive"""
+        sops_path = str(tmp_path / "shared.keys.sops")
+        seed = KeyCache(sops_path)
+        seed.add({"KEEP": "1", "CHANGE": "old", "DROP": "x"})
+        seed.save()
+
+        first = KeyCache(sops_path, multi_writer=True)
+        second = KeyCache(sops_path, multi_writer=True)
+        first.add({"FIRST": "a", "CHANGE": "new"})
+        first.save()
+        second.add({"SECOND": "b"})
+        del second.data["DROP"]
+        second.save()
+
+        expected = {"KEEP": "1", "CHANGE": "new", "FIRST": "a", "SECOND": "b"}
+        assert second.data == expected
+        PLAINTEXT_CACHE.clear()
+        assert KeyCache(sops_path).data == expected
+
+    def test_text_cache_concatenates(self, tmp_path, fake_sops_binary):
+        """Test lines appended by two writers are all kept, in save order"""
+        sops_path = str(tmp_path / "shared.text.sops")
+        first = TextCache(sops_path, multi_writer=True)
+        second = TextCache(sops_path, multi_writer=True)
+        first.append("one")
+        first.save()
+        second.append("two")
+        second.save()
+        first.append("three")
+        first.save()
+
+        PLAINTEXT_CACHE.clear()
+        assert TextCache(sops_path).data == "one\ntwo\nthree"
+        assert first.buffer.getvalue().strip() == "one\ntwo\nthree"
+
+    def test_unchanged_file_skips_decrypt(self, tmp_path, fake_sops_binary, mocker):
+        """Test a writer that is up to date does not re-read the file"""
+        cache = KeyCache(str(tmp_path / "solo.keys.sops"), multi_writer=True)
+        cache.add({"A": "1"})
+        cache.save()
+        merge = mocker.spy(KeyCache, "_merge")
+        cache.add({"B": "2"})
+        cache.save()
+        merge.assert_not_called()
+        assert (tmp_path / "solo.keys.sops.lock").exists()
+
+    def test_blob_cache_last_writer_wins(self, tmp_path, fake_sops_binary):
+        """Test caches without a merge replace the whole dataset"""
+        sops_path = str(tmp_path / "shared.blob.sops")
+        first = BlobCache(sops_path, multi_writer=True)
+        second = BlobCache(sops_path, multi_writer=True)
+        first.data = b"first"
+        first.save()
+        second.data = b"second"
+        second.save()
+        PLAINTEXT_CACHE.clear()
+        assert BlobCache(sops_path).data == b"second"
+
+    def test_processes(self, tmp_path, fake_sops_binary):
+        """Test concurrent worker processes lose no updates"""
+        sops_path = str(tmp_path / "workers.keys.sops")
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=add_key, args=(sops_path, fake_sops_binary, x))
+            for x in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            assert worker.exitcode == 0
+
+        assert KeyCache(sops_path).data == {f"WORKER{x}": str(x) for x in range(4)}
+
+    def test_transaction_holds_lock_until_commit(self, tmp_path, fake_sops_binary):
+        """Test a writer saving between a transaction's merge and rename is not lost"""
+        sops_path = str(tmp_path / "shared.keys.sops")
+        seed = KeyCache(sops_path)
+        seed.add({"BASE": "0"})
+        seed.save()
+
+        first = KeyCache(sops_path, multi_writer=True)
+        second = KeyCache(sops_path, multi_writer=True)
+        first.add({"A": "a"})
+        second.add({"B": "b"})
+        rival = threading.Thread(target=second.save)
+        original = Transaction.stage
+
+        def stage_then_race(pending, cache, *args):
+            original(pending, cache, *args)
+            # The rival writer must wait for the rename, not overwrite it afterwards
+            rival.start()
+            rival.join(0.5)
+            assert rival.is_alive()
+
+        with patch.object(Transaction, "stage", stage_then_race), transaction(first):
+            pass
+        rival.join(30)
+
+        PLAINTEXT_CACHE.clear()
+        assert KeyCache(sops_path).data == {"BASE": "0", "A": "a", "B": "b"}
@@ -0,0 +1,85 @@
+"""
+Tests for the payload codecs applied to plaintext before encryption
+"""
+
+import pytest
+from cacheguard.key_cache import KeyCache
+from cacheguard.payload import decode_payload, encode_payload, is_encoded
+from cacheguard.plaintext_cache import PLAINTEXT_CACHE
+from cacheguard.text_cache import TextCache
+
+
+class TestPayload:
+    """Test cases for encode_payload and decode_payload"""
+
+    @pytest.mark.parametrize("codec", ["zlib", "lzma"])
+    def test_round_trip(self, codec):
+        """Test each codec restores the original text"""
+        data = "line of a repetitive log\n" * 500
+        payload = encode_payload(data, codec)
+        assert payload.startswith(f"cacheguard:1:{codec}\n")
+        assert len(payload) < len(data) // 10
+        assert decode_payload(payload) == data
+
+    def test_no_codec_is_unchanged(self):
+        """Test plaintext passes straight through without a codec"""
+        assert encode_payload("plain", None) == "plain"
+        assert decode_payload("plain") == "plain"
+        assert not is_encoded("cacheguard: not a header\nplain")
+
+    def test_unknown_codec(self):
+        """Test unknown codecs and format versions are refused"""
+        with pytest.raises(ValueError, match="Unknown payload codec"):
+            encode_payload("data", "brotli")
+        with pytest.raises(ValueError, match="Unknown payload codec"):
+            decode_payload("cacheguard:1:brotli\nZGF0YQ==")
+        with pytest.raises(ValueError, match="format version"):
+            decode_payload("cacheguard:2:zlib\nZGF0YQ==")
+        with pytest.raises(ValueError, match="Unknown payload codec"):
+            KeyCache("unused.keys.sops", codec="brotli")
+
+
+class TestCachesWithCodecs:
+    """Test cases for caches saving through a codec"""
+
+    @pytest.fixture(autouse=True)
+    def fake_sops(self, reversible_sops):
+        """Every test round-trips through the reversible Sops stand-in"""
+        return reversible_sops.encrypt
+
+    def test_key_cache_compact_and_compressed(self, tmp_path, fake_sops):
+        """Test a Key Cache writes compact compressed JSON and reads it back"""
+        sops_path = str(tmp_path / "config.keys.sops")
+        cache = KeyCache(sops_path, codec="zlib")
+        cache.add({"KEY": "value", "OTHER": "value"})
+        assert cache._serialize() == '{"KEY":"value","OTHER":"value"}'
+        cache.save()
+
+        sent = fake_sops.call_args.args[0]
+        assert sent.startswith("cacheguard:1:zlib\n")
+
+        PLAINTEXT_CACHE.clear()
+        assert KeyCache(sops_path).data == {"KEY": "value", "OTHER": "value"}
+
+    def test_legacy_files_stay_readable(self, tmp_path):
+        """Test a cache with a codec still reads files written without one"""
+        sops_path = str(tmp_path / "config.keys.sops")
+        legacy = KeyCache(sops_path)
+        legacy.add({"KEY": "value"})
+        legacy.save()
+
+        PLAINTEXT_CACHE.clear()
+        assert KeyCache(sops_path, codec="lzma").data == {"KEY": "value"}
+
+    def test_text_cache_streams_compressed_file(self, tmp_path):
+        """Test streaming a sealed compressed Text Cache yields its lines"""
+        sops_path = str(tmp_path / "log.text.sops")
+        cache = TextCache(sops_path, codec="lzma")
+        for x in range(100):
+            cache.append(f"entry {x}")
+        cache.save()
+
+        PLAINTEXT_CACHE.clear()
+        reader = TextCache(sops_path, read_only=True)
+        assert reader.tail(2) == ["entry 98", "entry 99"]
+        assert TextCache(sops_path).data.count("\n") == 99
@@ -0,0 +1,105 @@
+"""
+Tests for the process-wide PlaintextCache
+"""
+
+import pytest
+from unittest.mock import patch
+from cacheguard.key_cache import KeyCache
+from cacheguard.plaintext_cache import (
+    PLAINTEXT_CACHE,
+    PlaintextCache,
+    configure_plaintext_cache,
+    file_identity,
+)
+
+
+class TestPlaintextCache:
+    """Test cases for PlaintextCache functionality"""
+
+    @pytest.fixture
+    def sealed_file(self, tmp_path):
+        """A file standing in for Sops ciphertext"""
+        sealed = tmp_path / "config.keys.sops"
+        sealed.write_text("ciphertext")
+        return str(sealed)
+
+    def test_hit_while_unchanged(self, sealed_file):
+        """Test stored plaintext is returned for the same file identity"""
+        cache = PlaintextCache()
+        identity = file_identity(sealed_file)
+        cache.put(sealed_file, identity, "plain")
+        assert cache.get(sealed_file, file_identity(sealed_file)) == "plain"
+
+    def test_miss_after_file_changes(self, sealed_file):
+        """Test rewriting the file invalidates the entry"""
+        cache = PlaintextCache()
+        cache.put(sealed_file, file_identity(sealed_file), "plain")
+        with open(sealed_file, "w") as f:
+            f.write("other ciphertext")
+        assert cache.get(sealed_file, file_identity(sealed_file)) is None
+        assert len(cache) == 0
+
+    def test_missing_file(self, tmp_path):
+        """Test files that do not exist are never cached"""
+        missing = str(tmp_path / "missing.keys.sops")
+        assert file_identity(missing) is None
+        cache = PlaintextCache()
+        cache.put(missing, None, "plain")
+        assert len(cache) == 0
+
+    def test_lru_byte_budget(self, tmp_path):
+        """Test least recently used entries are evicted to fit the budget"""
+        cache = PlaintextCache(max_bytes=10)
+        paths = []
+        for name in ("a", "b", "c"):
+            sealed = tmp_path / name
+            sealed.write_text(name)
+            paths.append(str(sealed))
+
+        cache.put(paths[0], file_identity(paths[0]), "aaaa")
+        cache.put(paths[1], file_identity(paths[1]), "bbbb")
+        assert cache.get(paths[0], file_identity(paths[0])) == "aaaa"
+        cache.put(paths[2], file_identity(paths[2]), "cccc")
+
+        assert cache.get(paths[1], file_identity(paths[1])) is None
+        assert cache.get(paths[0], file_identity(paths[0])) == "aaaa"
+        assert cache.size == 8
+
+    def test_ttl(self, sealed_file):
+        """Test entries expire after the TTL"""
+        cache = PlaintextCache(ttl=5)
+        with patch('cacheguard.plaintext_cache.monotonic', return_value=100):
+            cache.put(sealed_file, file_identity(sealed_file), "plain")
+        with patch('cacheguard.plaintext_cache.monotonic', return_value=104):
+            assert cache.get(sealed_file, file_identity(sealed_file)) == "plain"
+        with patch('cacheguard.plaintext_cache.monotonic', return_value=106):
+            assert cache.get(sealed_file, file_identity(sealed_file)) is None
+
+    def test_disabled(self, sealed_file):
+        """Test a zero budget turns the cache off"""
+        try:
+            configure_plaintext_cache(max_bytes=0)
+            PLAINTEXT_CACHE.put(sealed_file, file_identity(sealed_file), "plain")
+            assert PLAINTEXT_CACHE.get(sealed_file, file_identity(sealed_file)) is None
+        finally:
+            configure_plaintext_cache(max_bytes=32 * 1024 * 1024)
+
+    def test_repeat_loads_skip_decrypt(self, sealed_file):
+        """Test separate caches over one unchanged file decrypt once"""
+        with patch('cacheguard.base_cache.decrypt', return_value='{"a": "1"}') as mock_decrypt:
+            first = KeyCache(sealed_file)
+            second = KeyCache(sealed_file)
+        assert first.data == second.data == {"a": "1"}
+        mock_decrypt.assert_called_once()
+
+    def test_save_updates_entry(self, sealed_file):
+        """Test a save refreshes the entry instead of forcing a decrypt"""
+        with patch('cacheguard.base_cache.decrypt', return_value='{"a": "1"}') as mock_decrypt, \
+             patch('cacheguard.base_cache.encrypt', return_value="new ciphertext"):
+            cache = KeyCache(sealed_file)
+            cache.add({"b": "2"})
+            cache.save()
+            reopened = KeyCache(sealed_file)
+
+        assert reopened.data == {"a": "1", "b": "2"}
+        mock_decrypt.assert_called_once()
@@ -0,0 +1,109 @@
+"""
+Tests for bulk recipient rotation
+"""
+
+import json
+import pytest
+from unittest.mock import patch
+from cacheguard.blob_cache import BlobCache
+from cacheguard.key_cache import KeyCache
+from cacheguard.plaintext_cache import PLAINTEXT_CACHE
+from cacheguard.rotate import discover_sealed, rotate_many
+from cacheguard import sops
+from cacheguard.sops import encrypt, get_recipients
+
+
+def recipients(sops_path):
+    with open(sops_path) as f:
+        return get_recipients(f.read())
+
+
+class TestRotateMany:
+    """Test cases for rotate_many"""
+
+    @pytest.fixture
+    def caches(self, tmp_path, fake_sops_binary):
+        """A directory of caches sealed for one age recipient"""
+        paths = []
+        for x in range(5):
+            sops_path = tmp_path / f"cache{x}.keys.sops"
+            sops_path.write_text(encrypt(json.dumps({"KEY": str(x)}), age_pubkeys=["age1old"]))
+            paths.append(sops_path)
+        return paths
+
+    def test_rotates_every_file(self, tmp_path, caches):
+        """Test recipients change and the contents still decrypt"""
+        seen = []
+        report = rotate_many(
+            tmp_path,
+            add_age=["age1new"],
+            remove_age=["age1old"],
+            max_workers=2,
+            progress=lambda *args: seen.append(args),
+        )
+
+        assert report.ok and report.rotated == caches
+        assert recipients(caches[0]) == {"age_pubkeys": ["age1new"]}
+        assert sorted(x[0] for x in seen) == [1, 2, 3, 4, 5]
+        assert {x[1] for x in seen} == {5}
+        PLAINTEXT_CACHE.clear()
+        assert KeyCache(str(caches[3])).data == {"KEY": "3"}
+
+    def test_up_to_date_files_are_skipped(self, tmp_path, caches):
+        """Test files already holding the requested recipients are left alone"""
+        rotate_many(caches[:2], add_age=["age1new"])
+        with patch('cacheguard.rotate.rotate', wraps=sops.rotate) as mock_rotate:
+            report = rotate_many(tmp_path, add_age=["age1new"])
+        assert report.skipped == caches[:2]
+        assert mock_rotate.call_count == 3
+
+    def test_resume_from_state(self, tmp_path, caches):
+        """Test an interrupted rotation only retries what did not finish"""
+        state = tmp_path / "rotation.state"
+        real_rotate = sops.rotate
+
+        def flaky(sops_path, **kwargs):
+            if sops_path.endswith("cache2.keys.sops"):
+                raise RuntimeError("interrupted")
+            return real_rotate(sops_path, **kwargs)
+
+        with patch('cacheguard.rotate.rotate', side_effect=flaky):
+            report = rotate_many(tmp_path, state_file=state)
+        assert list(report.failed) == [caches[2]]
+        assert state.exists()
+
+        with patch('cacheguard.rotate.rotate', wraps=real_rotate) as mock_rotate:
+            report = rotate_many(tmp_path, state_file=state)
+        assert report.rotated == [caches[2]]
+        assert mock_rotate.call_count == 1
+        assert not state.exists()
+
+    def test_state_for_another_rotation_is_refused(self, tmp_path, caches):
+        """Test a state file cannot be resumed with different recipients"""
+        state = tmp_path / "rotation.state"
+        state.write_text('# {"add_age": ["age1other"]}\n')
+        with pytest.raises(ValueError, match="different rotation"):
+            rotate_many(tmp_path, add_age=["age1new"], state_file=state)
+
+    def test_structured_and_binary_types(self, tmp_path, fake_sops_binary):
+        """Test JSON documents are rotated as JSON and blobs as binary"""
+        KeyCache(str(tmp_path / "a.keys.sops"), structured=True).set("KEY", "value")
+        BlobCache(str(tmp_path / "b.blob.sops")).save(b"\x00\x01")
+        with patch('cacheguard.rotate.rotate', return_value="{}") as mock_rotate:
+            rotate_many(tmp_path, max_workers=1)
+        types = {x.args[0].rsplit("/", 1)[1]: x.kwargs["data_type"] for x in mock_rotate.call_args_list}
+        assert types == {"a.keys.sops": "json", "b.blob.sops": None}
+
+    def test_discover_includes_sidecars(self, tmp_path):
+        """Test segments and shards are found next to their caches"""
+        for name in ("a.text.sops", "a.text.sops.segments/000001.segment.sops",
+                     "b.keys.sops.shards/000-of-002.shard.sops", "nested/c.keys.sops"):
+            (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / name).write_text("{}")
+        found = [x.relative_to(tmp_path).as_posix() for x in discover_sealed(tmp_path)]
+        assert found == [
+            "a.text.sops",
+            "a.text.sops.segments/000001.segment.sops",
+            "b.keys.sops.shards/000-of-002.shard.sops",
+        ]
+        assert len(discover_sealed(tmp_path, recursive=True)) == 4
@@ -0,0 +1,134 @@
+"""
+Tests for the SegmentedTextCache class
+"""
+
+import asyncio
+import pytest
+from cacheguard.plaintext_cache import PLAINTEXT_CACHE
+from cacheguard.segmented_cache import SegmentedTextCache
+
+
+class TestSegmentedTextCache:
+    """Test cases for SegmentedTextCache functionality"""
+
+    @pytest.fixture(autouse=True)
+    def fake_sops(self, reversible_sops):
+        """Every test round-trips through the reversible Sops stand-in"""
+        return reversible_sops.encrypt
+
+    @pytest.fixture
+    def temp_path(self, tmp_path):
+        """Create a temporary file path for testing"""
+        return tmp_path / "log.text.sops"
+
+    def test_save_writes_only_new_lines(self, temp_path, fake_sops):
+        """Test each save seals just the lines appended since the last one"""
+        cache = SegmentedTextCache(str(temp_path))
+        cache.append("line1")
+        cache.append("line2")
+        cache.save()
+        cache.append("line3")
+        cache.save()
+
+        assert cache.segments == ["000001.segment.sops", "000002.segment.sops"]
+        segment_dir = temp_path.parent / "log.text.sops.segments"
+        assert (segment_dir / "000001.segment.sops").read_text() == "ENC:line1\nline2\n"
+        assert (segment_dir / "000002.segment.sops").read_text() == "ENC:line3\n"
+
+        # The second save encrypted one segment and the manifest, not the history
+        assert [x.args[0] for x in fake_sops.call_args_list[2:]] == [
+            "line3\n",
+            '{"segments": ["000001.segment.sops", "000002.segment.sops"]}',
+        ]
+
+    def test_save_without_changes(self, temp_path, fake_sops):
+        """Test saving with nothing appended writes nothing"""
+        cache = SegmentedTextCache(str(temp_path))
+        assert not cache.is_dirty
+        cache.save()
+        fake_sops.assert_not_called()
+
+    def test_reload_concatenates_segments(self, temp_path):
+        """Test reading joins the segments in manifest order"""
+        cache = SegmentedTextCache(str(temp_path))
+        cache.append("line1")
+        cache.save()
+        cache.append("")
+        cache.append("line3")
+        cache.save()
+
+        reopened = SegmentedTextCache(str(temp_path))
+        assert reopened.buffer.getvalue() == "line1\n\nline3\n"
+        assert not reopened.is_dirty
+
+        reopened.append("line4")
+        assert reopened.is_dirty
+        reopened.save()
+        assert len(reopened.segments) == 3
+
+    def test_compact(self, temp_path):
+        """Test compaction merges every segment into one"""
+        cache = SegmentedTextCache(str(temp_path))
+        for line in ("a", "b", "c"):
+            cache.append(line)
+            cache.save()
+        cache.append("d")
+        cache.compact()
+
+        assert cache.segments == ["000004.segment.sops"]
+        assert [x.name for x in cache.segment_dir.iterdir()] == ["000004.segment.sops"]
+        assert SegmentedTextCache(str(temp_path)).buffer.getvalue() == "a\nb\nc\nd\n"
+
+    def test_save_with_data_string_replaces_history(self, temp_path):
+        """Test an explicit data string becomes the whole history"""
+        cache = SegmentedTextCache(str(temp_path))
+        cache.append("old")
+        cache.save()
+        cache.save("new1\nnew2")
+
+        assert SegmentedTextCache(str(temp_path)).buffer.getvalue() == "new1\nnew2\n"
+
+    def test_lazy(self, temp_path, reversible_sops):
+        """Test lazy mode defers the manifest and segment decrypts"""
+        cache = SegmentedTextCache(str(temp_path))
+        cache.append("line1")
+        cache.save()
+        PLAINTEXT_CACHE.clear()
+        mock_decrypt = reversible_sops.decrypt
+        mock_decrypt.reset_mock()
+
+        reopened = SegmentedTextCache(str(temp_path), lazy=True)
+        reopened.save()
+        mock_decrypt.assert_not_called()
+
+        reopened.append("line2")
+        assert mock_decrypt.call_count == 2
+        assert reopened.buffer.getvalue() == "line1\nline2\n"
+        reopened.save()
+        assert reopened.segments == ["000001.segment.sops", "000002.segment.sops"]
+
+    def test_read_only_streams_segments(self, temp_path):
+        """Test read-only mode streams each segment in order"""
+        cache = SegmentedTextCache(str(temp_path))
+        for line in ("a", "b", "c"):
+            cache.append(line)
+            cache.save()
+
+        reopened = SegmentedTextCache(str(temp_path), read_only=True)
+        assert reopened.tail(2) == ["b", "c"]
+        assert list(reopened.iter_lines()) == ["a", "b", "c"]
+
+    def test_async_round_trip(self, temp_path):
+        """Test the async editions seal and read segments"""
+
+        async def scenario():
+            cache = await SegmentedTextCache.aopen(str(temp_path))
+            cache.append("line1")
+            await cache.asave()
+            cache.append("line2")
+            await cache.asave()
+            return await SegmentedTextCache.aopen(str(temp_path))
+
+        reopened = asyncio.run(scenario())
+        assert reopened.segments == ["000001.segment.sops", "000002.segment.sops"]
+        assert reopened.buffer.getvalue() == "line1\nline2\n"
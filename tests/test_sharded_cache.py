@@ -0,0 +1,103 @@
+"""
+Tests for the ShardedKeyCache class
+"""
+
+import os
+
+import pytest
+from unittest.mock import patch
+from cacheguard.sharded_cache import ShardedKeyCache
+
+
+class TestShardedKeyCache:
+    """Test cases for ShardedKeyCache functionality"""
+
+    @pytest.fixture(autouse=True)
+    def fake_sops(self, reversible_sops):
+        """Every test round-trips through the reversible Sops stand-in"""
+        return reversible_sops.encrypt, reversible_sops.decrypt
+
+    @pytest.fixture
+    def temp_path(self, tmp_path):
+        """Create a temporary file path for testing"""
+        return str(tmp_path / "config.keys.sops")
+
+    @pytest.fixture
+    def populated(self, temp_path):
+        """Sharded cache saved with a spread of keys"""
+        cache = ShardedKeyCache(temp_path, shards=4)
+        cache.add({f"KEY_{x}": f"value{x}" for x in range(20)})
+        cache.save()
+        return temp_path
+
+    def test_shard_index_is_stable(self, temp_path):
+        """Test keys always hash into the same shard"""
+        cache = ShardedKeyCache(temp_path, shards=8)
+        assert cache.shard_index("API_KEY") == cache.shard_index("API_KEY")
+        assert all(0 <= cache.shard_index(f"k{x}") < 8 for x in range(50))
+
+    def test_round_trip(self, populated):
+        """Test every key survives a save and reopen"""
+        cache = ShardedKeyCache(populated, shards=4)
+        assert cache.data == {f"KEY_{x}": f"value{x}" for x in range(20)}
+
+    def test_get_decrypts_single_shard(self, populated, fake_sops):
+        """Test reading one key only decrypts the shard holding it"""
+        _, mock_decrypt = fake_sops
+        mock_decrypt.reset_mock()
+
+        cache = ShardedKeyCache(populated, shards=4)
+        assert cache.get("KEY_7") == "value7"
+        assert cache.get("missing") is None
+        assert mock_decrypt.call_count <= 2
+        assert len(cache._shards) == len({cache.shard_index(x) for x in ("KEY_7", "missing")})
+
+    def test_save_only_dirty_shards(self, populated, fake_sops):
+        """Test changing one key re-encrypts only its shard"""
+        mock_encrypt, _ = fake_sops
+        cache = ShardedKeyCache(populated, shards=4)
+        cache.data  # open every shard
+        mock_encrypt.reset_mock()
+
+        cache.add({"KEY_3": "changed"})
+        assert cache.is_dirty
+        cache.save()
+
+        assert mock_encrypt.call_count == 1
+        assert '"KEY_3": "changed"' in mock_encrypt.call_args.args[0]
+        assert not cache.is_dirty
+
+    def test_reads_do_not_create_shards(self, temp_path):
+        """Test looking up keys in shards that do not exist writes nothing"""
+        cache = ShardedKeyCache(temp_path, shards=4)
+        cache.get("missing")
+        cache.save()
+        assert not os.path.exists(temp_path + ".shards")
+
+    def test_shard_count_mismatch(self, populated):
+        """Test reopening with a different shard count is refused"""
+        with pytest.raises(ValueError, match="has 4 shards on disk"):
+            ShardedKeyCache(populated, shards=8)
+
+    def test_shard_count_from_disk(self, populated, tmp_path):
+        """Test reopening without a shard count adopts the one on disk"""
+        cache = ShardedKeyCache(populated)
+        assert cache.shard_count == 4
+        assert cache.get("KEY_7") == "value7"
+        assert ShardedKeyCache(str(tmp_path / "new.keys.sops")).shard_count == 16
+
+    def test_load_env_var(self, populated):
+        """Test a single key is exported to the environment"""
+        cache = ShardedKeyCache(populated, shards=4)
+        with patch.dict('os.environ', {}, clear=True):
+            cache.load_env_var("KEY_1")
+            assert os.environ["KEY_1"] == "value1"
+            with pytest.raises(KeyError, match="Key does not exist in Key Cache"):
+                cache.load_env_var("missing")
+
+    def test_deploy(self, populated):
+        """Test deploy exports every key"""
+        cache = ShardedKeyCache(populated, shards=4)
+        with patch.dict('os.environ', {}, clear=True):
+            cache.deploy()
+            assert os.environ["KEY_19"] == "value19"
@@ -0,0 +1,98 @@
+"""
+Tests for sharing decrypted caches with worker processes
+"""
+
+import multiprocessing
+import pickle
+
+import pytest
+from unittest.mock import patch
+from cacheguard.blob_cache import BlobCache
+from cacheguard.key_cache import KeyCache
+from cacheguard.snapshot import Snapshot, _attach
+from cacheguard.text_cache import TextCache
+
+
+def read_keys(snapshot, results):
+    """Worker process opening a Key Cache from a snapshot"""
+    with patch("cacheguard.sops.run", side_effect=AssertionError("Sops was run")):
+        cache = KeyCache.from_snapshot(snapshot)
+        results.put(dict(cache))
+    snapshot.release()
+
+
+class TestSnapshot:
+    """Test cases for Snapshot"""
+
+    @pytest.fixture
+    def keys(self, tmp_path, fake_sops_binary):
+        cache = KeyCache(str(tmp_path / "config.keys.sops"))
+        cache.update(API_KEY="secret", PORT=8080)
+        cache.save()
+        return cache
+
+    def test_key_cache(self, keys):
+        """Test a Key Cache opens from a snapshot without decrypting"""
+        with Snapshot.publish(keys) as snapshot:
+            handle = pickle.loads(pickle.dumps(snapshot))
+            assert not handle.is_owner
+            with patch("cacheguard.base_cache.decrypt") as mock_decrypt:
+                cache = KeyCache.from_snapshot(handle)
+            mock_decrypt.assert_not_called()
+            handle.release()
+
+        assert cache.data == {"API_KEY": "secret", "PORT": 8080}
+        assert cache.sops_path == keys.sops_path
+        assert not cache.is_dirty
+
+    def test_text_cache(self, tmp_path, fake_sops_binary):
+        """Test read-only and writable Text Caches open from a snapshot"""
+        log = TextCache(str(tmp_path / "app.text.sops"))
+        log.append("first line")
+        log.append("second line")
+        with Snapshot.publish(log) as snapshot:
+            read_only = TextCache.from_snapshot(snapshot, read_only=True)
+            writable = TextCache.from_snapshot(snapshot)
+        assert list(read_only.iter_lines()) == ["first line", "second line"]
+        writable.append("third line")
+        assert writable.data == "first line\nsecond line\nthird line"
+
+    def test_blob_cache_is_zero_copy(self, tmp_path, fake_sops_binary):
+        """Test a Blob Cache reads the shared memory in place"""
+        blob = BlobCache(str(tmp_path / "model.blob.sops"))
+        blob.data = b"\x00\x01binary"
+        snapshot = Snapshot.publish(blob)
+        cache = BlobCache.from_snapshot(snapshot)
+        assert isinstance(cache.data, memoryview) and cache.data.readonly
+        assert bytes(cache.data) == b"\x00\x01binary"
+        assert not cache.is_dirty
+
+        cache.data.release()
+        snapshot.release()
+
+    def test_release_frees_segment(self, keys):
+        """Test the publisher's release removes the shared memory"""
+        snapshot = Snapshot.publish(keys)
+        name = snapshot.name
+        snapshot.release()
+        snapshot.release()  # Releasing twice is harmless
+        with pytest.raises(FileNotFoundError):
+            _attach(name)
+
+    @pytest.mark.parametrize("method", ["fork", "spawn"])
+    def test_worker_processes(self, keys, method):
+        """Test workers started either way read the published plaintext"""
+        context = multiprocessing.get_context(method)
+        results = context.Queue()
+        with Snapshot.publish(keys) as snapshot:
+            workers = [context.Process(target=read_keys, args=(snapshot, results)) for _ in range(2)]
+            for worker in workers:
+                worker.start()
+            found = [results.get(timeout=30) for _ in workers]
+            for worker in workers:
+                worker.join(30)
+                assert worker.exitcode == 0
+            # Workers detaching must not free the segment
+            KeyCache.from_snapshot(pickle.loads(pickle.dumps(snapshot)))
+
+        assert found == [{"API_KEY": "secret", "PORT": 8080}] * 2
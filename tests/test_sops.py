@@ -3,7 +3,36 @@ Test for the `cacheguard.sops` module, which contains helper functions for
 interfacing with Sops via Subprocess
 """
 
-from cacheguard.sops import encrypt, get_recipients
+import asyncio
+import io
+import subprocess
+import sys
+
+import pytest
+import cacheguard.sops
+from cacheguard.errors import (
+    SopsError,
+    SopsIntegrityError,
+    SopsInterruptedError,
+    SopsKeyError,
+    SopsTimeoutError,
+)
+from cacheguard.sops import (
+    ExecutionPolicy,
+    adecrypt,
+    aencrypt,
+    decrypt_bytes,
+    decrypt_lines,
+    encrypt,
+    encrypt_bytes,
+    get_recipients,
+    get_sops_binary,
+    set_async_concurrency,
+    set_execution_policy,
+    set_sops_binary,
+    sops_execute,
+    sops_version,
+)
 
 # These are dummy values
 TEST_AGE_PUBKEY = (
@@ -17,11 +46,14 @@ SAMPLE_SOPS = '{\n\t"data": "ENC[AES256_GCM,data:1zEA/X07evo3IDtIa5JJLuNEuQ==,iv
 
 def test_encryption(mocker, monkeypatch):
     mock_run = mocker.patch("cacheguard.sops.run")
+    mock_run.return_value = subprocess.CompletedProcess([], 0, "", "")
 
     def shutil_patch(*args, **kwargs):
         return "sops"
 
     monkeypatch.setattr("cacheguard.sops.which", shutil_patch)
+    monkeypatch.delenv("CACHEGUARD_SOPS_BINARY", raising=False)
+    set_sops_binary(None)
 
     test_kwargs = {
         "data": TEST_DATA,
@@ -60,3 +92,271 @@ def test_get_recipients():
     }
 
     assert result == expected_result  # nosec B101
+
+
+def test_async_encryption(mocker):
+    process = mocker.MagicMock(returncode=0)
+    process.communicate = mocker.AsyncMock(return_value=(b"encrypted", b""))
+    mock_exec = mocker.patch(
+        "asyncio.create_subprocess_exec",
+        new=mocker.AsyncMock(return_value=process),
+    )
+
+    result = asyncio.run(aencrypt(TEST_DATA, age_pubkeys=[TEST_AGE_PUBKEY]))
+
+    assert result == "encrypted"  # nosec B101
+    assert mock_exec.call_args.args == (  # nosec B101
+        "sops",
+        "-e",
+        "-a",
+        TEST_AGE_PUBKEY,
+        "/dev/stdin",
+    )
+    process.communicate.assert_called_with(TEST_DATA.encode())
+
+
+def test_async_concurrency_is_bounded(mocker):
+    running = 0
+    peak = 0
+
+    async def communicate(input):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return b"plain", b""
+
+    def make_process(*args, **kwargs):
+        process = mocker.MagicMock(returncode=0)
+        process.communicate = communicate
+        return process
+
+    mocker.patch(
+        "asyncio.create_subprocess_exec",
+        new=mocker.AsyncMock(side_effect=make_process),
+    )
+    set_async_concurrency(2)
+
+    async def run_many():
+        return await asyncio.gather(*(adecrypt("data") for _ in range(6)))
+
+    try:
+        assert asyncio.run(run_many()) == ["plain"] * 6  # nosec B101
+        assert peak == 2  # nosec B101
+    finally:
+        set_async_concurrency(8)
+
+
+def test_decrypt_lines_streams_chunks(mocker):
+    process = mocker.MagicMock()
+    process.stdout = io.BytesIO("line1\nli".encode() + "né2\nline3".encode())
+    process.stderr = io.BytesIO(b"")
+    process.wait.return_value = 0
+    process.poll.return_value = 0
+    mock_popen = mocker.patch("cacheguard.sops.Popen", return_value=process)
+    mocker.patch("cacheguard.sops.STREAM_CHUNK_SIZE", 3)
+
+    lines = list(decrypt_lines("logs.text.sops"))
+
+    assert lines == ["line1", "liné2", "line3"]  # nosec B101
+    assert mock_popen.call_args.args[0][-2:] == ["decrypt", "logs.text.sops"]  # nosec B101
+
+
+def test_decrypt_lines_failure(mocker):
+    process = mocker.MagicMock()
+    process.stdout = io.BytesIO(b"")
+    process.stderr = io.BytesIO(b"Failed to get the data key")
+    process.wait.return_value = 128
+    mocker.patch("cacheguard.sops.Popen", return_value=process)
+
+    with pytest.raises(RuntimeError, match="Failed to get the data key"):
+        list(decrypt_lines("logs.text.sops"))
+
+
+def test_decrypt_lines_early_stop_kills_sops(mocker):
+    process = mocker.MagicMock()
+    process.stdout = io.BytesIO(b"line1\nline2\nline3\n")
+    process.stderr = io.BytesIO(b"")
+    process.poll.return_value = None
+    mocker.patch("cacheguard.sops.Popen", return_value=process)
+
+    stream = decrypt_lines("logs.text.sops")
+    assert next(stream) == "line1"  # nosec B101
+    stream.close()
+
+    process.kill.assert_called_once()
+
+
+def test_decrypt_lines_drains_stderr(mocker):
+    script = "import sys; sys.stderr.write('w' * 200_000); sys.stdout.write('line1\\nline2\\n')"
+    mocker.patch("cacheguard.sops.get_sops_binary", return_value=sys.executable)
+    mocker.patch("cacheguard.sops._route", return_value=[sys.executable, "-c", script])
+
+    assert list(decrypt_lines("logs.text.sops")) == ["line1", "line2"]  # nosec B101
+
+
+class TestSopsDiscovery:
+    def test_lookup_is_deferred_and_cached(self, mocker, monkeypatch):
+        monkeypatch.delenv("CACHEGUARD_SOPS_BINARY", raising=False)
+        which = mocker.patch("cacheguard.sops.which", return_value="/opt/bin/sops")
+        set_sops_binary(None)
+
+        assert get_sops_binary() == "/opt/bin/sops"  # nosec B101
+        assert cacheguard.sops.SOPS_BINARY == "/opt/bin/sops"  # nosec B101
+        which.assert_called_once_with("sops")
+
+    def test_environment_override(self, mocker, monkeypatch):
+        monkeypatch.setenv("CACHEGUARD_SOPS_BINARY", "/custom/sops")
+        which = mocker.patch("cacheguard.sops.which")
+        set_sops_binary(None)
+
+        assert get_sops_binary() == "/custom/sops"  # nosec B101
+        which.assert_not_called()
+
+    def test_missing_binary_raises_on_use(self, mocker, monkeypatch):
+        monkeypatch.delenv("CACHEGUARD_SOPS_BINARY", raising=False)
+        mocker.patch("cacheguard.sops.which", return_value=None)
+        set_sops_binary(None)
+
+        with pytest.raises(RuntimeError, match="Sops not detected"):
+            encrypt(TEST_DATA)
+
+    def test_version_is_probed_once(self, mocker):
+        mock_run = mocker.patch(
+            "cacheguard.sops.run",
+            return_value=subprocess.CompletedProcess([], 0, "sops 3.10.2 (latest)\n", ""),
+        )
+
+        assert sops_version() == (3, 10, 2)  # nosec B101
+        assert sops_version() == (3, 10, 2)  # nosec B101
+        mock_run.assert_called_once()
+        assert mock_run.call_args.args[0] == ["sops", "--version"]  # nosec B101
+        assert mock_run.call_args.kwargs["env"]["SOPS_DISABLE_VERSION_CHECK"] == "1"  # nosec B101
+
+    def test_import_is_cheap_without_sops(self, tmp_path):
+        script = (
+            "import sys, cacheguard\n"
+            "heavy = {'asyncio', 'concurrent.futures', 'dataclasses'} & set(sys.modules)\n"
+            "assert not heavy, heavy\n"
+        )
+        result = subprocess.run(  # nosec B603
+            [sys.executable, "-c", script],
+            capture_output=True,
+            text=True,
+            env={"PATH": str(tmp_path), "PYTHONPATH": ":".join(sys.path)},
+        )
+
+        assert result.returncode == 0, result.stderr  # nosec B101
+
+
+def test_bytes_skip_text_mode(mocker):
+    mock_run = mocker.patch(
+        "cacheguard.sops.run",
+        return_value=subprocess.CompletedProcess([], 0, b"sealed\x00", b""),
+    )
+    payload = memoryview(b"\x00\xffbinary\r\n")
+
+    assert encrypt_bytes(payload) == b"sealed\x00"  # nosec B101
+    assert mock_run.call_args.kwargs["input"] is payload  # nosec B101
+    assert mock_run.call_args.kwargs["text"] is False  # nosec B101
+
+    decrypt_bytes(b"sealed")
+    assert mock_run.call_args.args[0] == ["sops", "decrypt"]  # nosec B101
+
+
+class TestExecutionPolicy:
+    @pytest.fixture(autouse=True)
+    def no_sleep(self, mocker):
+        yield mocker.patch("cacheguard.sops.sleep")
+        set_execution_policy(None)
+
+    def test_timeout_scales_with_size(self):
+        policy = ExecutionPolicy(timeout=4, timeout_per_mib=2, max_timeout=10)
+        assert policy.timeout_for(100) == 4
+        assert policy.timeout_for(2 * 1024 * 1024) == 8
+        assert policy.timeout_for(100 * 1024 * 1024) == 10
+
+    def test_delays_back_off(self):
+        assert list(ExecutionPolicy(retries=3, backoff=1, backoff_factor=2).delays()) == [1, 2, 4]
+
+    def test_typed_errors(self, mocker):
+        mock_run = mocker.patch("cacheguard.sops.run")
+        for code, error_type in ((1, SopsError), (51, SopsIntegrityError), (128, SopsKeyError)):
+            mock_run.return_value = subprocess.CompletedProcess([], code, "", "boom\n")
+            with pytest.raises(error_type, match="boom") as error:
+                sops_execute(["sops"], "data", policy=ExecutionPolicy(retries=0))
+            assert error.value.returncode == code
+
+    def test_retries_transient_errors(self, mocker, no_sleep):
+        mock_run = mocker.patch("cacheguard.sops.run")
+        mock_run.side_effect = [
+            subprocess.TimeoutExpired(["sops"], 4),
+            subprocess.CompletedProcess([], 128, "", "agent busy"),
+            subprocess.CompletedProcess([], 0, "done", ""),
+        ]
+        policy = ExecutionPolicy(retries=2, backoff=0.5, retry_on=(SopsTimeoutError, SopsKeyError))
+        result = sops_execute(["sops"], "data", policy=policy)
+        assert result.stdout == "done"
+        assert [x.args for x in no_sleep.call_args_list] == [(0.5,), (1.0,)]
+
+    def test_default_retries_only_interruptions(self, mocker):
+        mock_run = mocker.patch("cacheguard.sops.run")
+        for returncode, error_type in ((128, SopsKeyError), (-9, SopsInterruptedError)):
+            mock_run.reset_mock()
+            mock_run.return_value = subprocess.CompletedProcess([], returncode, "", "failed")
+            with pytest.raises(error_type):
+                sops_execute(["sops"], "data", policy=ExecutionPolicy(retries=2))
+            assert mock_run.call_count == (1 if error_type is SopsKeyError else 3)
+
+        mock_run.reset_mock()
+        mock_run.side_effect = subprocess.TimeoutExpired(["sops"], 4)
+        with pytest.raises(SopsTimeoutError):
+            sops_execute(["sops"], "data")
+        assert mock_run.call_count == 1
+
+    def test_does_not_retry_other_errors(self, mocker):
+        mock_run = mocker.patch("cacheguard.sops.run")
+        mock_run.return_value = subprocess.CompletedProcess([], 51, "", "MAC mismatch")
+        with pytest.raises(SopsIntegrityError):
+            sops_execute(["sops"], "data", policy=ExecutionPolicy(retries=3))
+        assert mock_run.call_count == 1
+
+    def test_timeout_is_still_timeout_expired(self, mocker):
+        mocker.patch("cacheguard.sops.run", side_effect=subprocess.TimeoutExpired(["sops"], 4))
+        set_execution_policy(ExecutionPolicy(retries=1))
+        with pytest.raises(subprocess.TimeoutExpired) as error:
+            sops_execute(["sops"], "data")
+        assert isinstance(error.value, SopsTimeoutError)
+
+    def test_large_input_streams(self):
+        policy = ExecutionPolicy(stream_threshold=1024, chunk_size=100)
+        data = b"x" * 5000
+        result = sops_execute([sys.executable, "-c", STREAM_ECHO], memoryview(data), policy=policy)
+        assert result.stdout == data.upper()
+        assert isinstance(result.stdout, bytearray)  # Handed over without a copy
+        result = sops_execute([sys.executable, "-c", STREAM_ECHO], "y" * 5000, policy=policy)
+        assert result.stdout == "Y" * 5000
+
+    def test_streaming_failure(self):
+        policy = ExecutionPolicy(stream_threshold=0, retries=0)
+        command = [sys.executable, "-c", "import sys; sys.stderr.write('nope'); sys.exit(3)"]
+        with pytest.raises(SopsError, match="nope"):
+            sops_execute(command, b"data" * 1000, policy=policy)
+
+    def test_streaming_timeout(self):
+        policy = ExecutionPolicy(timeout=0.2, stream_threshold=0, retries=0)
+        command = [sys.executable, "-c", "import time; time.sleep(5)"]
+        with pytest.raises(SopsTimeoutError):
+            sops_execute(command, b"data", policy=policy)
+
+
+STREAM_ECHO = "import sys; sys.stdout.buffer.write(sys.stdin.buffer.read().upper())"
+
+
+def test_async_typed_errors():
+    from cacheguard.sops import async_sops_execute
+
+    command = [sys.executable, "-c", "import sys; sys.stderr.write('no key'); sys.exit(128)"]
+    with pytest.raises(SopsKeyError, match="no key"):
+        asyncio.run(async_sops_execute(command, "data", policy=ExecutionPolicy(retries=0)))
@@ -2,6 +2,8 @@
 Tests for the TextCache class
 """
 
+import asyncio
+import io
 import pytest
 from pathlib import Path
 from unittest.mock import patch, mock_open
@@ -100,6 +102,54 @@ class TestTextCache:
             cache.save(sample_data)
             mock_super_save.assert_called_with(sample_data)
 
+    def test_aopen(self, temp_path, sample_data):
+        """Test async construction fills the buffer"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('builtins.open', mock_open(read_data="encrypted")), \
+             patch('cacheguard.base_cache.adecrypt', return_value=sample_data):
+            cache = asyncio.run(TextCache.aopen(str(temp_path)))
+            assert cache.buffer.getvalue() == sample_data + "\n"
+            cache.append("line4")
+            assert cache.buffer.getvalue() == sample_data + "\nline4\n"
+
+    def test_is_dirty_after_append(self, temp_path, sample_data):
+        """Test loaded caches are clean until a line is appended"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('builtins.open', mock_open(read_data="dummy")), \
+             patch('cacheguard.base_cache.decrypt', return_value=sample_data):
+            cache = TextCache(str(temp_path))
+
+        assert not cache.is_dirty
+        cache.append("line4")
+        assert cache.is_dirty
+
+    def test_lazy_buffer(self, temp_path, sample_data):
+        """Test lazy caches decrypt when the buffer is first used"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('builtins.open', mock_open(read_data="dummy")), \
+             patch('cacheguard.base_cache.decrypt', return_value=sample_data) as mock_decrypt:
+            cache = TextCache(str(temp_path), lazy=True)
+            mock_decrypt.assert_not_called()
+
+            cache.append("line4")
+            mock_decrypt.assert_called_once()
+            assert cache.buffer.getvalue() == "line1\nline2\nline3\nline4\n"
+
+    def test_single_backing_store(self, temp_path, sample_data):
+        """Test a loaded cache keeps its text only in the buffer"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('builtins.open', mock_open(read_data="dummy")), \
+             patch('cacheguard.base_cache.decrypt', return_value=sample_data):
+            cache = TextCache(str(temp_path))
+        assert cache._data == ""
+        assert cache.data == sample_data
+        cache.append("line4")
+        assert cache.data == sample_data + "\nline4"
+
+        cache.data = "replaced"
+        assert cache.buffer.getvalue() == "replaced\n"
+        assert not hasattr(cache, "__dict__")
+
     def test_append(self, temp_path):
         """Test append method"""
         cache = TextCache(str(temp_path))
@@ -114,4 +164,44 @@ class TestTextCache:
         cache.append("first line")
         cache.append("second line")
         expected = "first line\r\nsecond line\r\n"
-        assert cache.buffer.getvalue() == expected
\ No newline at end of file
+        assert cache.buffer.getvalue() == expected
+
+    def test_iter_lines_streams_when_unloaded(self, temp_path):
+        """Test lazy caches stream lines from Sops without building a buffer"""
+        temp_path.write_text("ciphertext")
+        with patch('cacheguard.text_cache.decrypt_lines', return_value=iter(["a", "b", "c"])) as mock_stream, \
+             patch('cacheguard.base_cache.decrypt') as mock_decrypt:
+            cache = TextCache(str(temp_path), lazy=True)
+            assert cache.tail(2) == ["b", "c"]
+            mock_stream.assert_called_once_with(str(temp_path), "\n")
+            mock_decrypt.assert_not_called()
+            assert not cache.is_loaded
+
+    def test_iter_lines_includes_unsaved_appends(self, temp_path):
+        """Test loaded caches iterate over the buffer"""
+        cache = TextCache(str(temp_path))
+        cache.append("first")
+        cache.append("second")
+        assert list(cache.iter_lines()) == ["first", "second"]
+        assert cache.tail(1) == ["second"]
+        assert cache.tail(0) == []
+
+    def test_iter_lines_missing_file(self, temp_path):
+        """Test streaming a cache with nothing on disk yields nothing"""
+        cache = TextCache(str(temp_path), read_only=True)
+        assert list(cache.iter_lines()) == []
+
+    def test_read_only(self, temp_path, sample_data):
+        """Test read-only caches refuse appends and never build a buffer"""
+        with patch('cacheguard.base_cache.path.exists', return_value=True), \
+             patch('builtins.open', mock_open(read_data="dummy")), \
+             patch('cacheguard.base_cache.decrypt', return_value=sample_data) as mock_decrypt:
+            cache = TextCache(str(temp_path), read_only=True)
+            mock_decrypt.assert_not_called()
+
+            with pytest.raises(io.UnsupportedOperation, match="read-only"):
+                cache.append("line4")
+
+            assert cache.data == sample_data
+            assert list(cache.iter_lines()) == ["line1", "line2", "line3"]
+            assert not cache.is_dirty
@@ -0,0 +1,140 @@
+"""
+Tests for the TextIndex class and the Text Cache queries it backs
+"""
+
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from cacheguard.segmented_cache import SegmentedTextCache
+from cacheguard.text_cache import TextCache
+from cacheguard.text_index import TextIndex, parse_timestamp
+
+LOG = [
+    "2025-11-13T07:00:00 service started",
+    "2025-11-13T07:05:00 ERROR disk full on /var",
+    "continuation without a timestamp",
+    "2025-11-13T07:10:00 error cleared, disk ok",
+    "2025-11-13T07:20:00 service stopped",
+]
+
+
+class TestTextIndex:
+    """Test cases for TextIndex functionality"""
+
+    def test_parse_timestamp(self):
+        """Test leading ISO 8601 timestamps are recognised"""
+        assert parse_timestamp(LOG[0]) == datetime(2025, 11, 13, 7, 0)
+        assert parse_timestamp(LOG[2]) is None
+        assert parse_timestamp("") is None
+        assert parse_timestamp("20240101 order 17") is None
+
+    def test_find_intersects_tokens(self):
+        """Test lookups need every word, ignoring case"""
+        index = TextIndex()
+        for number, line in enumerate(LOG):
+            index.add(line, number * 100)
+        assert index.find("error") == [1, 3]
+        assert index.find("Error DISK full") == [1]
+        assert index.find("missing") == []
+        assert index.find("!!") == []
+        assert index.span(1) == (100, 100 + len(LOG[1]))
+
+    def test_out_of_order_timestamps(self):
+        """Test late lines are still found by time"""
+        index = TextIndex()
+        index.add("2025-01-03T00:00:00 c", 0)
+        index.add("2025-01-01T00:00:00 a", 10)
+        index.add("2025-01-02T00:00:00 b", 20)
+        assert index.between(datetime(2025, 1, 1, 12), None) == [0, 2]
+
+    def test_mixed_timezones(self):
+        """Test naive timestamps are read as UTC beside aware ones"""
+        index = TextIndex()
+        index.add("2025-01-01T10:00:00 naive", 0)
+        index.add("2025-01-01T12:30:00+02:00 aware", 30)
+        index.add("2025-01-01T11:00:00 naive again", 70)
+        assert index.between(datetime(2025, 1, 1, 10, 15), None) == [1, 2]
+        assert index.between(None, datetime(2025, 1, 1, 10, 30, tzinfo=timezone.utc)) == [0, 1]
+        plus_one = timezone(timedelta(hours=1))
+        assert index.between(datetime(2025, 1, 1, 12, tzinfo=plus_one), None) == [2]
+
+
+class TestTextCacheQueries:
+    """Test cases for find, since and between on a Text Cache"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """A Text Cache holding the sample log"""
+        cache = TextCache(str(tmp_path / "log.text.sops"), indexed=True)
+        for line in LOG:
+            cache.append(line)
+        return cache
+
+    def test_find(self, cache):
+        """Test lines come back whole and in order"""
+        assert cache.find("error") == [LOG[1], LOG[3]]
+
+    def test_since_and_between(self, cache):
+        """Test time range queries skip lines without a timestamp"""
+        assert cache.since(datetime(2025, 11, 13, 7, 10)) == LOG[3:]
+        assert cache.between(datetime(2025, 11, 13, 7, 5), datetime(2025, 11, 13, 7, 10)) == [
+            LOG[1],
+            LOG[3],
+        ]
+
+    def test_aware_query_on_naive_log(self, cache):
+        """Test appending an aware line and querying with one both work"""
+        cache.append("2025-11-13T09:30:00+01:00 late entry")
+        since = datetime(2025, 11, 13, 7, 15, tzinfo=timezone.utc)
+        assert cache.since(since) == [LOG[4], "2025-11-13T09:30:00+01:00 late entry"]
+
+    def test_append_updates_index(self, cache):
+        """Test new lines are queryable and appends still land at the end"""
+        index = cache.index
+        assert cache.find("service") == [LOG[0], LOG[4]]
+        cache.append("2025-11-13T07:30:00 service restarted\nsecond line")
+        assert cache.index is index
+        assert cache.find("service restarted") == ["2025-11-13T07:30:00 service restarted"]
+        assert cache.find("second") == ["second line"]
+        assert cache._serialize().endswith("restarted\nsecond line")
+
+    def test_index_built_on_first_use(self, tmp_path):
+        """Test an unindexed cache builds the index lazily from its text"""
+        cache = TextCache(str(tmp_path / "log.text.sops"))
+        for line in LOG:
+            cache.append(line)
+        assert cache._index is None
+        assert cache.find("stopped") == [LOG[4]]
+
+    def test_read_only_cache(self, tmp_path):
+        """Test queries work on a read-only cache without an append buffer"""
+        sops_path = tmp_path / "log.text.sops"
+        sops_path.write_text("sealed")
+        with patch('cacheguard.base_cache.decrypt', return_value="\n".join(LOG)):
+            cache = TextCache(str(sops_path), read_only=True)
+            assert cache.find("disk") == [LOG[1], LOG[3]]
+            assert cache.since(datetime(2025, 11, 13, 7, 20)) == [LOG[4]]
+
+    def test_custom_timestamp_parser(self, tmp_path):
+        """Test a caller supplied parser, here for epoch seconds"""
+        def epoch(line):
+            head = line.split()[0]
+            return datetime.fromtimestamp(int(head)) if head.isdigit() else None
+
+        cache = TextCache(str(tmp_path / "log.text.sops"), timestamp_parser=epoch)
+        cache.append("1700000000 first")
+        cache.append("1700000100 second")
+        assert cache.since(datetime.fromtimestamp(1700000050)) == ["1700000100 second"]
+
+    def test_segmented_cache_reloads_index(self, tmp_path, reversible_sops):
+        """Test a Segmented Text Cache indexes lines from every segment"""
+        sops_path = str(tmp_path / "log.text.sops")
+        cache = SegmentedTextCache(sops_path)
+        cache.append(LOG[0])
+        cache.save()
+        cache.append(LOG[1])
+        cache.save()
+
+        reopened = SegmentedTextCache(sops_path, indexed=True)
+        assert reopened.find("service started") == [LOG[0]]
+        assert reopened.find("error") == [LOG[1]]
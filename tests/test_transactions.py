@@ -0,0 +1,159 @@
+"""
+Tests for saving several caches together
+"""
+
+import os
+import pytest
+from unittest.mock import patch
+from cacheguard import transaction
+from cacheguard.errors import SopsError
+from cacheguard.key_cache import KeyCache
+from cacheguard.plaintext_cache import PLAINTEXT_CACHE
+from cacheguard.segmented_cache import SegmentedTextCache
+from cacheguard.sharded_cache import ShardedKeyCache
+from cacheguard.sops import encrypt
+from cacheguard.text_cache import TextCache
+
+
+class TestTransaction:
+    """Test cases for transaction"""
+
+    @pytest.fixture
+    def caches(self, tmp_path, fake_sops_binary):
+        """A sealed Key Cache and Text Cache side by side"""
+        keys = KeyCache(str(tmp_path / "creds.keys.sops"))
+        keys.add({"TOKEN": "old"})
+        keys.save()
+        log = TextCache(str(tmp_path / "audit.text.sops"))
+        log.append("created")
+        log.save()
+        return keys, log
+
+    def test_commits_together(self, tmp_path, caches):
+        """Test every dirty cache lands on disk and no temporary files remain"""
+        keys, log = caches
+        with transaction(keys, log):
+            keys.add({"TOKEN": "new"})
+            log.append("rotated token")
+
+        PLAINTEXT_CACHE.clear()
+        assert KeyCache(keys.sops_path).data == {"TOKEN": "new"}
+        assert TextCache(log.sops_path).data == "created\nrotated token"
+        assert not keys.is_dirty and not log.is_dirty
+        assert sorted(os.listdir(tmp_path)) == ["audit.text.sops", "creds.keys.sops", "sops"]
+
+    def test_error_in_block_writes_nothing(self, caches):
+        """Test an exception inside the block leaves every file as it was"""
+        keys, log = caches
+        before = [open(x.sops_path).read() for x in caches]
+        with pytest.raises(ValueError):
+            with transaction(keys, log):
+                keys.add({"TOKEN": "new"})
+                log.append("rotated token")
+                raise ValueError("abort")
+        assert [open(x.sops_path).read() for x in caches] == before
+
+    def test_failed_seal_writes_nothing(self, tmp_path, caches):
+        """Test one failed encrypt discards the writes already staged"""
+        keys, log = caches
+        before = [open(x.sops_path).read() for x in caches]
+        original = TextCache._seal
+
+        def failing_seal(cache, data_string):
+            if cache is log:
+                raise SopsError("Sops encrypt failed")
+            return original(cache, data_string)
+
+        with patch.object(TextCache, "_seal", failing_seal):
+            with pytest.raises(SopsError):
+                with transaction(keys, log) as pending:
+                    keys.add({"TOKEN": "new"})
+                    log.append("rotated token")
+                    assert pending.caches == [keys, log]
+
+        assert [open(x.sops_path).read() for x in caches] == before
+        assert sorted(os.listdir(tmp_path)) == ["audit.text.sops", "creds.keys.sops", "sops"]
+        assert keys.is_dirty
+
+    def test_failed_commit_rewinds_segments(self, tmp_path, caches):
+        """Test a Segmented Text Cache forgets a segment whose commit failed"""
+        keys, _ = caches
+        log = SegmentedTextCache(str(tmp_path / "events.text.sops"))
+        log.append("first")
+        log.save()
+        original = KeyCache._seal
+
+        def failing_seal(cache, data_string):
+            if cache is keys:
+                raise SopsError("Sops encrypt failed")
+            return original(cache, data_string)
+
+        with patch.object(KeyCache, "_seal", failing_seal):
+            with pytest.raises(SopsError):
+                with transaction(log, keys):
+                    keys.add({"TOKEN": "new"})
+                    log.append("second")
+
+        assert log.segments == ["000001.segment.sops"]
+        assert log.is_dirty and not log.manifest.is_dirty
+
+        # The retried save writes the segment the failed commit left out
+        log.save()
+        PLAINTEXT_CACHE.clear()
+        assert SegmentedTextCache(log.sops_path).data == "first\nsecond"
+
+    def test_failed_commit_keeps_compacted_segments(self, tmp_path, caches):
+        """Test segments replaced by a compact survive a commit that fails"""
+        keys, _ = caches
+        log = SegmentedTextCache(str(tmp_path / "events.text.sops"))
+        for line in ("first", "second"):
+            log.append(line)
+            log.save()
+        original = KeyCache._seal
+
+        class Compacting:
+            """Transaction member that rewrites the log's history when saved"""
+
+            def save(self):
+                log.save("replaced")
+
+        def failing_seal(cache, data_string):
+            if cache is keys:
+                raise SopsError("Sops encrypt failed")
+            return original(cache, data_string)
+
+        with patch.object(KeyCache, "_seal", failing_seal):
+            with pytest.raises(SopsError):
+                with transaction(Compacting(), keys):
+                    keys.add({"TOKEN": "new"})
+
+        assert log.segments == ["000001.segment.sops", "000002.segment.sops"]
+        PLAINTEXT_CACHE.clear()
+        assert SegmentedTextCache(log.sops_path).data == "first\nsecond"
+
+        with transaction(Compacting()):
+            pass
+        assert sorted(os.listdir(log.segment_dir)) == ["000003.segment.sops"]
+        PLAINTEXT_CACHE.clear()
+        assert SegmentedTextCache(log.sops_path).data == "replaced"
+
+    def test_add_and_skip_unchanged(self, tmp_path, caches):
+        """Test caches can join inside the block and clean ones are not re-encrypted"""
+        keys, log = caches
+        with patch("cacheguard.base_cache.encrypt", wraps=encrypt) as mock_encrypt:
+            with transaction(keys) as pending:
+                pending.add(log)
+                log.append("only the log changed")
+        assert mock_encrypt.call_count == 1
+
+    def test_sharded_cache(self, tmp_path, fake_sops_binary):
+        """Test shards saved on their own pool are still staged in the transaction"""
+        cache = ShardedKeyCache(str(tmp_path / "big.keys.sops"), shards=4)
+        cache.add({f"KEY{x}": str(x) for x in range(8)})
+        with patch("cacheguard.transactions.replace", wraps=os.replace) as mock_replace:
+            with transaction(cache):
+                pass
+        assert mock_replace.call_count == len(list((tmp_path / "big.keys.sops.shards").glob("*.sops")))
+
+        PLAINTEXT_CACHE.clear()
+        assert ShardedKeyCache(str(tmp_path / "big.keys.sops"), shards=4).get("KEY5") == "5"
@@ -0,0 +1,116 @@
+"""
+Tests for the WriteBehind background flusher
+"""
+
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from cacheguard.plaintext_cache import PLAINTEXT_CACHE
+from cacheguard.text_cache import TextCache
+from cacheguard.write_behind import WriteBehind
+
+
+class TestWriteBehind:
+    """Test cases for WriteBehind functionality"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Text Cache with nothing on disk"""
+        return TextCache(str(tmp_path / "log.text.sops"))
+
+    def test_append_does_not_save(self, cache):
+        """Test appends stay in memory until a flush"""
+        with patch.object(TextCache, "save") as mock_save:
+            writer = WriteBehind(cache, interval=60)
+            writer.append("line1")
+            writer.append("line2")
+            mock_save.assert_not_called()
+            assert cache.buffer.getvalue() == "line1\nline2\n"
+            assert writer.pending_lines == 2
+
+            writer.close()
+            mock_save.assert_called_once()
+
+    def test_line_threshold_wakes_flusher(self, cache):
+        """Test reaching max_lines flushes in the background"""
+        saved = threading.Event()
+        with patch.object(TextCache, "save", side_effect=lambda *a: saved.set()):
+            writer = WriteBehind(cache, interval=60, max_lines=3)
+            for x in range(3):
+                writer.append(f"line{x}")
+            assert saved.wait(2)
+            writer.close()
+
+    def test_byte_threshold_wakes_flusher(self, cache):
+        """Test reaching max_bytes flushes in the background"""
+        saved = threading.Event()
+        with patch.object(TextCache, "save", side_effect=lambda *a: saved.set()):
+            writer = WriteBehind(cache, interval=60, max_bytes=10)
+            writer.append("0123456789")
+            assert saved.wait(2)
+            writer.close()
+
+    def test_interval_flush(self, cache):
+        """Test pending lines are flushed on the interval"""
+        saved = threading.Event()
+        with (
+            patch.object(TextCache, "save", side_effect=lambda *a: saved.set()),
+            WriteBehind(cache, interval=0.01) as writer,
+        ):
+            writer.append("line1")
+            assert saved.wait(2)
+
+    def test_context_manager_final_flush(self, cache):
+        """Test leaving the context seals pending lines and stops the thread"""
+        with patch.object(TextCache, "save") as mock_save:
+            with WriteBehind(cache, interval=60) as writer:
+                writer.append("line1")
+            mock_save.assert_called_once()
+            assert not writer._thread.is_alive()
+
+            with pytest.raises(RuntimeError, match="closed"):
+                writer.append("late")
+
+    def test_flush_without_appends(self, cache):
+        """Test nothing is saved when nothing was appended"""
+        with patch.object(TextCache, "save") as mock_save:
+            WriteBehind(cache, interval=60).close()
+            mock_save.assert_not_called()
+
+    def test_appends_through_cache_are_sealed(self, cache, fake_sops_binary):
+        """Test lines appended to the cache directly are saved on close"""
+        writer = WriteBehind(cache, interval=60)
+        cache.append("line1")
+        writer.append("line2")
+        writer.close()
+        assert not cache.is_dirty
+
+        cache.append("line3")
+        writer.flush()
+        PLAINTEXT_CACHE.clear()
+        assert TextCache(cache.sops_path).data == "line1\nline2\nline3"
+
+    def test_background_error_surfaces(self, cache):
+        """Test a failed background save is raised to the caller"""
+        failed = threading.Event()
+
+        def failing_save(*args):
+            failed.set()
+            raise OSError("disk full")
+
+        with patch.object(TextCache, "save", side_effect=failing_save):
+            writer = WriteBehind(cache, interval=60, max_lines=1)
+            writer.append("line1")
+            assert failed.wait(2)
+            writer._closed.set()
+            writer._wake.set()
+            writer._thread.join()
+            with pytest.raises(OSError, match="disk full"):
+                writer.append("line2")
+            assert writer.pending_lines >= 1
+
+        with patch.object(TextCache, "save") as mock_save:
+            writer.close()
+            mock_save.assert_called_once()